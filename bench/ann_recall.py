@@ -0,0 +1,98 @@
+"""
+Recall@k vs latency of the IVF retriever against the exact backend.
+
+Runs on a synthetic clustered corpus, no model or DB needed:
+
+    python bench/ann_recall.py --n 100000 --dim 1024 --nlist 256
+"""
+# modules
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vector_index import VectorIndex
+from retriever import ExactRetriever, IVFRetriever
+
+
+def make_corpus(n, dim, n_topics, seed=0):
+    """Vectors drawn around random topic centres, like real embeddings."""
+    rng = np.random.default_rng(seed)
+    topics = rng.normal(size=(n_topics, dim)).astype(np.float32)
+    labels = rng.integers(0, n_topics, size=n)
+    vectors = topics[labels] + 1.5 * rng.normal(size=(n, dim)).astype(np.float32)
+    return vectors
+
+
+def timed_search(backend, queries, top_k):
+    results, latencies = [], []
+    for q in queries:
+        start = time.perf_counter()
+        ids, _ = backend.search(q, top_k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append(ids)
+    return results, np.array(latencies)
+
+
+def recall(approx, exact):
+    hits = [len(np.intersect1d(a, e)) / len(e) for a, e in zip(approx, exact)]
+    return float(np.mean(hits))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--n", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--nlist", type=int, default=256)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32, 64])
+    parser.add_argument("--top-k", type=int, nargs="+", default=[3, 10])
+    parser.add_argument("--output", default=None, help="write results as JSON")
+    args = parser.parse_args()
+
+    print(f"corpus: {args.n} x {args.dim}, nlist={args.nlist}")
+    vectors = make_corpus(args.n + args.queries, args.dim, n_topics=args.nlist // 2)
+    queries = vectors[args.n:]
+
+    index = VectorIndex()
+    index.add(np.arange(args.n), vectors[:args.n])
+
+    exact = ExactRetriever(index)
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        ivf = IVFRetriever(index, path=os.path.join(tmp, "bench.ivf.npz"), nlist=args.nlist)
+        train_s = time.perf_counter() - start
+    print(f"IVF training: {train_s:.1f}s")
+
+    report = []
+    for top_k in args.top_k:
+        truth, exact_ms = timed_search(exact, queries, top_k)
+        report.append({"backend": "exact", "top_k": top_k, "nprobe": None, "recall": 1.0,
+                       "p50_ms": float(np.percentile(exact_ms, 50)),
+                       "p95_ms": float(np.percentile(exact_ms, 95))})
+        for nprobe in args.nprobe:
+            ivf.nprobe = nprobe
+            found, ivf_ms = timed_search(ivf, queries, top_k)
+            report.append({"backend": "ivf", "top_k": top_k, "nprobe": nprobe,
+                           "recall": recall(found, truth),
+                           "p50_ms": float(np.percentile(ivf_ms, 50)),
+                           "p95_ms": float(np.percentile(ivf_ms, 95))})
+
+    print(f"\n| backend | top_k | nprobe | recall@k | p50 ms | p95 ms |")
+    print(f"|---|---|---|---|---|---|")
+    for row in report:
+        print(f"| {row['backend']} | {row['top_k']} | {row['nprobe'] or '-'} | "
+              f"{row['recall']:.3f} | {row['p50_ms']:.2f} | {row['p95_ms']:.2f} |")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "train_s": train_s, "results": report}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
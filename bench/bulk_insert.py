@@ -0,0 +1,67 @@
+"""
+Rows/sec of database.save_document against the old per-row insert loop.
+
+    python bench/bulk_insert.py --chunks 10000 --dim 1024
+"""
+# modules
+import os
+import sys
+import time
+import argparse
+import sqlite3
+import tempfile
+import numpy as np
+
+# set BENCH_DIR to benchmark on a specific disk
+BENCH_DIR = tempfile.mkdtemp(prefix="rag-bench-", dir=os.getenv("BENCH_DIR"))
+os.environ["DB_PATH"] = os.path.join(BENCH_DIR, "bench.db")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+
+
+def legacy_insert(db_path, chunks, vectors):
+    """The previous save_chunks: two execute calls per chunk + lastrowid, BLOB vectors."""
+    start = time.perf_counter()
+    with sqlite3.connect(db_path) as conn:
+        cur = conn.cursor()
+        cur.execute("CREATE TABLE IF NOT EXISTS documents (id INTEGER PRIMARY KEY AUTOINCREMENT, file_path TEXT UNIQUE)")
+        cur.execute("CREATE TABLE IF NOT EXISTS chunks (id INTEGER PRIMARY KEY AUTOINCREMENT, document_id INTEGER, chunk_text TEXT)")
+        cur.execute("CREATE TABLE IF NOT EXISTS embeddings (id INTEGER PRIMARY KEY AUTOINCREMENT, chunk_id INTEGER, vector BLOB)")
+    conn = sqlite3.connect(db_path)
+    cur = conn.cursor()
+    cur.execute("INSERT OR IGNORE INTO documents (file_path) VALUES (?)", ("bench.txt",))
+    conn.commit()
+    cur.execute("SELECT id FROM documents WHERE file_path=?", ("bench.txt",))
+    document_id = cur.fetchone()[0]
+    conn.close()
+    with sqlite3.connect(db_path) as conn:
+        cur = conn.cursor()
+        for chunk, vector in zip(chunks, vectors):
+            cur.execute("INSERT INTO chunks (document_id, chunk_text) VALUES (?, ?)", (document_id, chunk))
+            cur.execute("INSERT INTO embeddings (chunk_id, vector) VALUES (?, ?)",
+                        (cur.lastrowid, vector.astype(np.float32).tobytes()))
+    return len(chunks) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=10000)
+    parser.add_argument("--dim", type=int, default=1024)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    chunks = [" ".join(f"word{j}" for j in rng.integers(0, 5000, 150)) for _ in range(args.chunks)]
+    vectors = rng.normal(size=(args.chunks, args.dim)).astype(np.float32)
+
+    legacy_rate = legacy_insert(os.path.join(BENCH_DIR, "legacy.db"), chunks, vectors)
+    database.init_db()
+    _, _, stats = database.save_document("bench.txt", chunks, vectors)
+
+    print(f"{args.chunks} chunks x {args.dim} dims")
+    print(f"legacy per-row insert: {legacy_rate:10.0f} rows/s")
+    print(f"bulk save_document:    {stats['rows_per_sec']:10.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Latency of N concurrent chat sessions against the app's query path, with a stubbed LLM.
+
+Uses the real embedder, retriever and database (DB_PATH) but LLM_BACKEND=fake,
+so only the app's own queueing and blocking work is measured:
+
+    python bench/load_test.py --sessions 32 --turns 5 --mode both
+"""
+# modules
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+QUESTIONS = [
+    "What is this document about?",
+    "Summarize the main points.",
+    "Which students are enrolled?",
+    "What are the key dates mentioned?",
+    "List the courses and their instructors.",
+    "Who is responsible for the project?",
+]
+
+
+def question(mode, session, turn):
+    # unique per run/session/turn so the caches don't short-circuit the run
+    return f"{QUESTIONS[(session + turn) % len(QUESTIONS)]} ({mode} session {session}, turn {turn})"
+
+
+def percentiles(values):
+    values = np.array(values) * 1000
+    return {f"p{p}_ms": float(np.percentile(values, p)) for p in (50, 95, 99)}
+
+
+def report(mode, sessions, first_tokens, totals, elapsed):
+    result = {"mode": mode, "sessions": sessions, "requests": len(totals),
+              "requests_per_s": len(totals) / elapsed,
+              "first_token": percentiles(first_tokens), "total": percentiles(totals)}
+    print(f"{mode:>5}: {len(totals)} requests in {elapsed:.1f}s ({result['requests_per_s']:.1f}/s)")
+    for name in ("first_token", "total"):
+        p = result[name]
+        print(f"       {name:<12} p50 {p['p50_ms']:8.1f} ms  p95 {p['p95_ms']:8.1f} ms  p99 {p['p99_ms']:8.1f} ms")
+    return result
+
+
+# ------------------------
+# async path (ask_gemini_async, as served by rag_ui)
+# ------------------------
+async def async_session(main, session, turns, think, first_tokens, totals):
+    for turn in range(turns):
+        start = time.perf_counter()
+        first = None
+        async for _ in main.ask_gemini_async(question("async", session, turn)):
+            if first is None:
+                first = time.perf_counter() - start
+        totals.append(time.perf_counter() - start)
+        first_tokens.append(first)
+        await asyncio.sleep(think)
+
+
+async def run_async(main, sessions, turns, think):
+    first_tokens, totals = [], []
+    start = time.perf_counter()
+    await asyncio.gather(*(async_session(main, s, turns, think, first_tokens, totals) for s in range(sessions)))
+    return report("async", sessions, first_tokens, totals, time.perf_counter() - start)
+
+
+# ------------------------
+# sync path (ask_gemini on a fixed pool of worker threads, like sync Gradio handlers)
+# ------------------------
+def sync_handler(main, text):
+    first = None
+    for _ in main.ask_gemini(text):
+        if first is None:
+            first = time.perf_counter()
+    return first
+
+
+def sync_session(main, workers, session, turns, think, first_tokens, totals):
+    # time spent waiting for a free worker counts, as it would for a user
+    for turn in range(turns):
+        start = time.perf_counter()
+        first = workers.submit(sync_handler, main, question("sync", session, turn)).result()
+        totals.append(time.perf_counter() - start)
+        first_tokens.append(first - start)
+        time.sleep(think)
+
+
+def run_sync(main, sessions, turns, think, threads):
+    first_tokens, totals = [], []
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as workers, ThreadPoolExecutor(max_workers=sessions) as clients:
+        futures = [clients.submit(sync_session, main, workers, s, turns, think, first_tokens, totals)
+                   for s in range(sessions)]
+        for future in futures:
+            future.result()
+    return report("sync", sessions, first_tokens, totals, time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=32)
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--think", type=float, default=0.0, help="seconds between a session's questions")
+    parser.add_argument("--first-token-delay", type=float, default=0.5, help="fake LLM time to first token")
+    parser.add_argument("--token-delay", type=float, default=0.02, help="fake LLM delay between tokens")
+    parser.add_argument("--mode", choices=["async", "sync", "both"], default="both")
+    parser.add_argument("--threads", type=int, default=None,
+                        help="worker threads for the sync path (default: one per session)")
+    parser.add_argument("--output", default=None, help="write results as JSON")
+    args = parser.parse_args()
+
+    # stubbed LLM, and no answer cache so every request reaches it
+    os.environ["LLM_BACKEND"] = "fake"
+    os.environ.setdefault("ANSWER_CACHE_SIZE", "0")
+    import main as app
+    from llm import FakeLLM
+    from concurrency import get_stage_stats
+    app.gemini = FakeLLM(first_token_delay=args.first_token_delay, token_delay=args.token_delay)
+
+    # warm up the embedder and retriever outside the measurement
+    app.ask_gemini_text("warm up")
+
+    results = []
+    if args.mode in ("sync", "both"):
+        results.append(run_sync(app, args.sessions, args.turns, args.think, args.threads or args.sessions))
+    if args.mode in ("async", "both"):
+        results.append(asyncio.run(run_async(app, args.sessions, args.turns, args.think)))
+        print("stages:", json.dumps(get_stage_stats(), indent=2))
+    print("embedding service:", json.dumps(app.embedder.stats(), indent=2))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Startup time and memory of the app's import path: two eager models vs the shared lazy model.
+
+Each scenario runs in a fresh interpreter and reports import time, time until
+the first query vector is ready, and peak RSS:
+
+    python bench/startup.py                      # legacy, lazy, warm-up
+    python bench/startup.py --onnx onnx/model_qint8_avx512.onnx
+"""
+# modules
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# runs in the child; SCENARIO is substituted before launch
+CHILD = r"""
+import sys, time, json, resource
+sys.path.insert(0, ROOT)
+start = time.perf_counter()
+if SCENARIO == "legacy":
+    # what main.py + ingest.py did at import before the model registry:
+    # init_db as a side effect and one SentenceTransformer per module
+    from sentence_transformers import SentenceTransformer
+    import database, retriever
+    from config import MODEL_NAME
+    database.init_db()
+    ingest_model = SentenceTransformer(MODEL_NAME)
+    embedder = SentenceTransformer(MODEL_NAME)
+    retriever.get_retriever()
+    import_s = time.perf_counter() - start
+    embed = lambda text: embedder.encode(text, convert_to_numpy=True)
+else:
+    import database
+    database.init_db()
+    import main, ingest
+    import_s = time.perf_counter() - start
+    if SCENARIO == "warm":
+        main.warm_up().join()
+    embed = main.embed_query
+ready_s = time.perf_counter() - start
+embed("How many students are enrolled?")
+first_query_s = time.perf_counter() - start
+peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({"import_s": import_s, "ready_s": ready_s, "first_query_s": first_query_s,
+                  "peak_rss_mb": peak_kb / (1024 * 1024 if sys.platform == "darwin" else 1024)}))
+"""
+
+
+def run(scenario, env):
+    code = CHILD.replace("ROOT", repr(ROOT)).replace("SCENARIO", repr(scenario))
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True)
+    if out.returncode != 0:
+        raise RuntimeError(f"{scenario} failed:\n{out.stderr}")
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--db", default=None, help="DB_PATH to use (default: an empty temp database)")
+    parser.add_argument("--onnx", default=None, metavar="FILE",
+                        help="also run the lazy path on the ONNX backend with this model file")
+    parser.add_argument("--output", default=None, help="write results as JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, DB_PATH=args.db or os.path.join(tmp, "startup.db"), LLM_BACKEND="fake")
+        scenarios = [("legacy", "legacy", env), ("lazy", "lazy", env), ("warm-up", "warm", env)]
+        if args.onnx:
+            scenarios.append(("onnx", "warm", dict(env, EMBED_BACKEND="onnx", EMBED_ONNX_FILE=args.onnx)))
+
+        report = []
+        print(f"{'scenario':<10} {'import':>9} {'ready':>9} {'1st query':>10} {'peak RSS':>10}")
+        for name, scenario, scenario_env in scenarios:
+            result = dict(run(scenario, scenario_env), scenario=name)
+            report.append(result)
+            print(f"{name:<10} {result['import_s']:8.2f}s {result['ready_s']:8.2f}s "
+                  f"{result['first_query_s']:9.2f}s {result['peak_rss_mb']:8.0f}MB")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
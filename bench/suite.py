@@ -0,0 +1,379 @@
+"""
+Offline benchmark suite: ingest throughput, DB load, search latency and end-to-end ask_gemini latency.
+
+Runs without network access on generated data: PDF / DOCX / PPTX / CSV / TXT
+fixtures, corpora of random vectors and text, generated tables behind the
+SQLite stand-in for SQL Server, and the fake LLM for Gemini. The embedding
+model is replaced by a hashing embedder of the same dimension (--real-model
+keeps the configured model, which must then be in the local cache).
+Results go to a JSON file; --baseline prints the change against an earlier run:
+
+    python bench/suite.py                                   # 10k and 100k chunk corpora
+    python bench/suite.py --sizes 10000 100000 1000000 --baseline bench/results/<earlier run>.json
+"""
+# modules
+import os
+import sys
+import json
+import time
+import shutil
+import sqlite3
+import argparse
+import platform
+import tempfile
+import subprocess
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, "bench", "results")
+
+# everything the app writes goes to a scratch dir (set BENCH_DIR to benchmark on a specific disk)
+BENCH_DIR = tempfile.mkdtemp(prefix="rag-bench-", dir=os.getenv("BENCH_DIR"))
+os.environ["DB_PATH"] = os.path.join(BENCH_DIR, "bench.db")
+os.environ["SQL_BACKEND"] = "sqlite"
+os.environ["SQL_SQLITE_PATH"] = os.path.join(BENCH_DIR, "university.db")
+os.environ["LLM_BACKEND"] = "fake"
+# every question should reach the LLM
+os.environ.setdefault("ANSWER_CACHE_SIZE", "0")
+sys.path.insert(0, ROOT)
+
+import config
+import models
+import database
+import retriever
+
+TOP_K = [1, 3, 10, 50]
+
+
+def percentiles(values):
+    values = np.array(values) * 1000
+    return {f"p{p}_ms": float(np.percentile(values, p)) for p in (50, 95, 99)}
+
+
+# ------------------------
+# Generated text, tables and documents
+# ------------------------
+class TextGenerator:
+    def __init__(self, seed=0, vocab=20000):
+        self.rng = np.random.default_rng(seed)
+        letters = np.array(list("abcdefghijklmnopqrstuvwxyz"))
+        lengths = self.rng.integers(3, 10, size=vocab)
+        self.words = np.array(["".join(self.rng.choice(letters, n)) for n in lengths])
+
+    def sentence(self, words=12):
+        sentence = " ".join(self.rng.choice(self.words, words))
+        return sentence.capitalize() + "."
+
+    def paragraph(self, sentences=6):
+        return " ".join(self.sentence(int(self.rng.integers(8, 17))) for _ in range(sentences))
+
+    def chunks(self, n, words=64):
+        picked = self.rng.choice(self.words, size=(n, words))
+        return [" ".join(row) for row in picked]
+
+
+def make_sql_tables(path, rows, text):
+    """Students and Courses tables for the SQLite stand-in of SQL Server."""
+    rng = text.rng
+    majors = ["Computer Science", "Mathematics", "Physics", "Biology", "History", "Economics"]
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE Students (StudentID INTEGER PRIMARY KEY, Name TEXT, Major TEXT, Year INTEGER, GPA REAL)")
+        conn.execute("CREATE TABLE Courses (CourseID INTEGER PRIMARY KEY, Title TEXT, Instructor TEXT, Credits INTEGER)")
+        conn.executemany("INSERT INTO Students VALUES (?, ?, ?, ?, ?)", [
+            (i, " ".join(rng.choice(text.words, 2)).title(), majors[i % len(majors)],
+             int(rng.integers(1, 5)), round(float(rng.uniform(2.0, 4.0)), 2))
+            for i in range(1, rows + 1)])
+        conn.executemany("INSERT INTO Courses VALUES (?, ?, ?, ?)", [
+            (i, text.sentence(4).rstrip("."), " ".join(rng.choice(text.words, 2)).title(), int(rng.integers(1, 5)))
+            for i in range(1, rows // 10 + 2)])
+
+
+def _pdf_escape(line):
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path, pages):
+    """A plain-text PDF with one page per list of lines, written by hand (no PDF library needed)."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None,
+               "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for lines in pages:
+        stream = "BT /F1 9 Tf 11 TL 40 800 Td " + " ".join(f"({_pdf_escape(line)}) '" for line in lines) + " ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode("latin-1")
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1")
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def _lines(paragraph, width=110):
+    lines, line = [], ""
+    for word in paragraph.split():
+        if line and len(line) + len(word) >= width:
+            lines.append(line)
+            line = ""
+        line = f"{line} {word}" if line else word
+    return lines + [line] if line else lines
+
+
+def make_fixtures(directory, pages, csv_rows, text):
+    """One generated file per supported type, each about `pages` pages (`csv_rows` rows for the CSV)."""
+    import docx
+    import pandas as pd
+    from pptx import Presentation
+    from pptx.util import Inches
+
+    os.makedirs(directory, exist_ok=True)
+    fixtures = {}
+
+    path = os.path.join(directory, "fixture.pdf")
+    write_pdf(path, [[line for _ in range(6) for line in _lines(text.paragraph())][:70] for _ in range(pages)])
+    fixtures["pdf"] = path
+
+    path = os.path.join(directory, "fixture.docx")
+    document = docx.Document()
+    for _ in range(pages * 6):
+        document.add_paragraph(text.paragraph())
+    document.save(path)
+    fixtures["docx"] = path
+
+    path = os.path.join(directory, "fixture.pptx")
+    presentation = Presentation()
+    for _ in range(pages):
+        slide = presentation.slides.add_slide(presentation.slide_layouts[6])
+        frame = slide.shapes.add_textbox(Inches(0.5), Inches(0.5), Inches(9), Inches(6)).text_frame
+        frame.text = text.sentence(6)
+        for _ in range(5):
+            frame.add_paragraph().text = text.sentence(int(text.rng.integers(8, 17)))
+    presentation.save(path)
+    fixtures["pptx"] = path
+
+    path = os.path.join(directory, "fixture.csv")
+    rng = text.rng
+    pd.DataFrame({
+        "id": np.arange(1, csv_rows + 1),
+        "name": [" ".join(pair) for pair in rng.choice(text.words, size=(csv_rows, 2))],
+        "category": rng.choice(text.words[:50], csv_rows),
+        "amount": rng.uniform(0, 1000, csv_rows).round(2),
+        "note": [" ".join(row) for row in rng.choice(text.words, size=(csv_rows, 8))],
+    }).to_csv(path, index=False)
+    fixtures["csv"] = path
+
+    path = os.path.join(directory, "fixture.txt")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n\n".join(text.paragraph() for _ in range(pages * 6)))
+    fixtures["txt"] = path
+    return fixtures
+
+
+# ------------------------
+# Benchmarks
+# ------------------------
+def bench_ingest(fixtures, chunk_size):
+    """Seconds, MB/s and chunks/s of ingest_file per file type, on an empty database."""
+    import ingest
+    results = {}
+    for kind, path in fixtures.items():
+        start = time.perf_counter()
+        message = ingest.ingest_file(path, chunk_size)
+        seconds = time.perf_counter() - start
+        chunks = next((d["chunks"] for d in database.list_documents() if d["file_path"] == path), 0)
+        size_mb = os.path.getsize(path) / 1e6
+        results[kind] = {"size_mb": size_mb, "chunks": chunks, "seconds": seconds,
+                         "mb_per_s": size_mb / seconds, "chunks_per_s": chunks / seconds}
+        print(f"  ingest {kind:<5} {size_mb:7.2f} MB  {chunks:6d} chunks  {seconds:7.2f}s  "
+              f"{chunks / seconds:8.0f} chunks/s   {message if not chunks else ''}")
+    return results
+
+
+def write_corpus(size, dim, text, batch=10000, n_topics=128):
+    """`size` chunks of random text with vectors drawn around random topic centres, saved in documents of `batch`."""
+    rng = text.rng
+    topics = rng.normal(size=(n_topics, dim)).astype(np.float32)
+    seconds = 0.0
+    for number, start in enumerate(range(0, size, batch)):
+        n = min(batch, size - start)
+        chunks = text.chunks(n)
+        vectors = topics[rng.integers(0, n_topics, n)] + 1.5 * rng.normal(size=(n, dim)).astype(np.float32)
+        started = time.perf_counter()
+        database.save_document(f"bench/corpus-{size}-{number}.txt", chunks, vectors)
+        seconds += time.perf_counter() - started
+    return topics, {"write_s": seconds, "rows_per_s": size / seconds}
+
+
+def bench_load():
+    """Cold load of the vector index + retriever (IVF training included), then a reload as after a restart."""
+    result = {}
+    for name in ("load_s", "reload_s"):
+        database.invalidate_vector_index()
+        start = time.perf_counter()
+        retriever.get_retriever()
+        result[name] = time.perf_counter() - start
+    return result
+
+
+def bench_search(app, topics, text, queries, top_ks):
+    """search_context latency (retrieval + chunk fetch) per top_k, for questions near the corpus topics."""
+    rng = text.rng
+    q_vecs = topics[rng.integers(0, len(topics), queries)] + 1.5 * rng.normal(size=(queries, topics.shape[1]))
+    q_vecs = (q_vecs / np.linalg.norm(q_vecs, axis=1, keepdims=True)).astype(np.float32)
+    q_texts = [text.sentence(8) for _ in range(queries)]
+    app.search_context(q_texts[0], top_ks[0], q_vecs[0])  # first call outside the measurement
+    results = {}
+    for top_k in top_ks:
+        latencies = []
+        for q_text, q_vec in zip(q_texts, q_vecs):
+            start = time.perf_counter()
+            app.search_context(q_text, top_k, q_vec)
+            latencies.append(time.perf_counter() - start)
+        results[f"top_k={top_k}"] = percentiles(latencies)
+    return results
+
+
+def bench_ask(app, text, questions):
+    """Time to first piece and total time of ask_gemini (fake LLM, SQLite tables), one question at a time."""
+    app.ask_gemini_text("warm up")  # table snapshots and row vectors are built here
+    first_pieces, totals = [], []
+    for i in range(questions):
+        start = time.perf_counter()
+        first = None
+        for _ in app.ask_gemini(f"{text.sentence(8)} ({i})"):
+            if first is None:
+                first = time.perf_counter() - start
+        totals.append(time.perf_counter() - start)
+        first_pieces.append(first)
+    return {"first_token": percentiles(first_pieces), "total": percentiles(totals)}
+
+
+# ------------------------
+# Results
+# ------------------------
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True)
+        return out.stdout.strip() or None
+    except OSError:
+        return None
+
+
+def flatten(tree, prefix=""):
+    flat = {}
+    for key, value in tree.items():
+        name = f"{prefix}.{key}" if prefix else str(key)
+        if isinstance(value, dict):
+            flat.update(flatten(value, name))
+        elif isinstance(value, (int, float)):
+            flat[name] = value
+    return flat
+
+
+def compare(baseline, results):
+    """Print every timing / rate present in both runs with its relative change."""
+    old = flatten({key: baseline.get(key, {}) for key in ("ingest", "corpus")})
+    new = flatten({key: results.get(key, {}) for key in ("ingest", "corpus")})
+    print(f"\nvs baseline {baseline.get('commit')} ({baseline.get('started_at')}):")
+    for key, value in new.items():
+        if key in old and old[key] and key.endswith(("_ms", "_s", "per_s")):
+            change = (value - old[key]) / old[key] * 100
+            print(f"  {key:<55} {old[key]:12.2f} -> {value:12.2f}  {change:+7.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000], help="corpus sizes (chunks)")
+    parser.add_argument("--dim", type=int, default=1024, help="vector size of the offline embedder")
+    parser.add_argument("--top-k", type=int, nargs="+", default=TOP_K)
+    parser.add_argument("--queries", type=int, default=200, help="search queries per top_k")
+    parser.add_argument("--questions", type=int, default=50, help="ask_gemini calls per corpus")
+    parser.add_argument("--pages", type=int, default=50, help="pages (slides, paragraph groups) per fixture")
+    parser.add_argument("--csv-rows", type=int, default=20000)
+    parser.add_argument("--sql-rows", type=int, default=500, help="rows of the generated Students table")
+    parser.add_argument("--first-token-delay", type=float, default=0.0, help="fake LLM time to first token")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="fake LLM delay between tokens")
+    parser.add_argument("--skip", nargs="+", default=[], choices=["ingest", "corpus"])
+    parser.add_argument("--real-model", action="store_true", help="use the configured embedding model")
+    parser.add_argument("--output", default=None,
+                        help="results JSON (default: bench/results/<date>-<commit>.json)")
+    parser.add_argument("--baseline", default=None, help="earlier results JSON to compare against")
+    parser.add_argument("--keep", action="store_true", help=f"keep the scratch dir ({BENCH_DIR})")
+    args = parser.parse_args()
+
+    if not args.real_model:
+        models.use_offline_models(args.dim)
+    import main as app
+    from llm import FakeLLM
+    app.gemini = FakeLLM(first_token_delay=args.first_token_delay, token_delay=args.token_delay)
+
+    text = TextGenerator()
+    make_sql_tables(os.environ["SQL_SQLITE_PATH"], args.sql_rows, text)
+    database.init_db()
+    dim = args.dim if not args.real_model else len(app.embed_query("dimension"))
+
+    results = {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": git_commit(),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "settings": {"embedder": config.MODEL_NAME if args.real_model else "hash", "dim": dim,
+                     "retriever": config.RETRIEVER, "retrieval_mode": config.RETRIEVAL_MODE,
+                     "precision": config.EMBEDDING_PRECISION, "chunk_size": config.CHUNK_SIZE,
+                     "sql_row_retrieval": config.SQL_ROW_RETRIEVAL, "prompt_token_budget": config.PROMPT_TOKEN_BUDGET,
+                     "rerank_model": config.RERANK_MODEL,
+                     **{key: value for key, value in vars(args).items() if key not in ("output", "baseline", "keep")}},
+        "ingest": {},
+        "corpus": {},
+    }
+    try:
+        if "ingest" not in args.skip:
+            print("ingest (empty database):")
+            fixtures = make_fixtures(os.path.join(BENCH_DIR, "fixtures"), args.pages, args.csv_rows, text)
+            results["ingest"] = bench_ingest(fixtures, config.CHUNK_SIZE)
+
+        if "corpus" not in args.skip:
+            for size in args.sizes:
+                database.clear_all()
+                print(f"corpus of {size} chunks x {dim} dims:")
+                topics, result = write_corpus(size, dim, text)
+                result.update(bench_load())
+                print(f"  write {result['write_s']:.1f}s ({result['rows_per_s']:.0f} rows/s), "
+                      f"load {result['load_s']:.2f}s, reload {result['reload_s']:.2f}s")
+                result["search"] = bench_search(app, topics, text, args.queries, args.top_k)
+                for top_k, p in result["search"].items():
+                    print(f"  search {top_k:<9} p50 {p['p50_ms']:8.2f} ms  p95 {p['p95_ms']:8.2f} ms  "
+                          f"p99 {p['p99_ms']:8.2f} ms")
+                result["ask"] = bench_ask(app, text, args.questions)
+                for name, p in result["ask"].items():
+                    print(f"  ask    {name:<11} p50 {p['p50_ms']:8.2f} ms  p95 {p['p95_ms']:8.2f} ms  "
+                          f"p99 {p['p99_ms']:8.2f} ms")
+                results["corpus"][str(size)] = result
+    finally:
+        if not args.keep:
+            shutil.rmtree(BENCH_DIR, ignore_errors=True)
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{results['commit'] or 'nogit'}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nresults: {output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            compare(json.load(f), results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+# modules
+import re
+import math
+from collections import Counter, defaultdict
+import numpy as np
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower())
+
+
+# ------------------------
+# In-memory BM25
+# ------------------------
+class BM25Index:
+    """Okapi BM25 over a list of short texts (e.g. rendered table rows)."""
+
+    def __init__(self, texts, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.n_docs = len(texts)
+        postings = defaultdict(list)
+        lengths = np.zeros(self.n_docs, dtype=np.float32)
+        for doc, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            lengths[doc] = sum(counts.values())
+            for term, tf in counts.items():
+                postings[term].append((doc, tf))
+        avg_len = float(lengths.mean()) if self.n_docs else 0.0
+        self._norm = k1 * (1 - b + b * lengths / (avg_len or 1.0))
+        self._postings = {
+            term: (np.array([d for d, _ in p], dtype=np.int64), np.array([tf for _, tf in p], dtype=np.float32))
+            for term, p in postings.items()
+        }
+
+    def scores(self, query):
+        scores = np.zeros(self.n_docs, dtype=np.float32)
+        for term in set(tokenize(query)):
+            if term not in self._postings:
+                continue
+            docs, tf = self._postings[term]
+            idf = math.log(1 + (self.n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            scores[docs] += idf * tf * (self.k1 + 1) / (tf + self._norm[docs])
+        return scores
+
+    def search(self, query, top_k=10):
+        """Return (doc indices, scores) of the best matches, best first (zero scores dropped)."""
+        scores = self.scores(query)
+        hits = np.flatnonzero(scores > 0)
+        order = hits[np.argsort(-scores[hits])][:top_k]
+        return order, scores[order]
+
+
+# ------------------------
+# Rank fusion
+# ------------------------
+def reciprocal_rank_fusion(rankings, k=60, top_k=None, with_scores=False):
+    """Fuse ranked id lists: score(id) = sum 1 / (k + rank). Returns ids best first (and their scores)."""
+    fused = defaultdict(float)
+    for ranking in rankings:
+        for rank, item in enumerate(ranking):
+            fused[item] += 1.0 / (k + rank + 1)
+    ordered = sorted(fused, key=fused.get, reverse=True)
+    ordered = ordered[:top_k] if top_k else ordered
+    if with_scores:
+        return ordered, [fused[item] for item in ordered]
+    return ordered
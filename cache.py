@@ -0,0 +1,124 @@
+# modules
+import re
+import time
+import threading
+from collections import OrderedDict
+from vector_index import normalize
+
+# every cache registers itself here so hit/miss counters can be reported together
+CACHES = {}
+
+
+def normalize_query(text):
+    """Cache key for a question: case- and whitespace-insensitive."""
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+# ------------------------
+# LRU with TTL
+# ------------------------
+class LRUCache:
+    """Thread-safe LRU map with an optional time-to-live per entry."""
+
+    def __init__(self, name, max_size=1024, ttl=None, register=True):
+        self.name = name
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (value, stored_at)
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expired": 0}
+        if register:
+            CACHES[name] = self
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and self.ttl is not None and time.monotonic() - item[1] > self.ttl:
+                del self._data[key]
+                self._stats["expired"] += 1
+                item = None
+            if item is None:
+                self._stats["misses"] += 1
+                return default
+            self._data.move_to_end(key)
+            self._stats["hits"] += 1
+            return item[0]
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic())
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, size=len(self._data), max_size=self.max_size)
+
+
+# ------------------------
+# Semantic answer cache
+# ------------------------
+class SemanticAnswerCache:
+    """
+    Answers keyed on the retrieved context (chunk ids + structured rows) and
+    matched by query-embedding similarity, so a rephrased question that
+    pulls the same context reuses the answer. Entries are dropped when the
+    corpus version changes (documents ingested or deleted).
+    """
+    # paraphrases remembered per retrieved context
+    max_per_context = 8
+
+    def __init__(self, name, max_size=256, ttl=None, threshold=0.95):
+        self.name = name
+        self.threshold = threshold
+        self._entries = LRUCache(name, max_size, ttl, register=False)
+        self._version = None
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "invalidations": 0}
+        CACHES[name] = self
+
+    def _check_version(self, version):
+        if version != self._version:
+            if self._version is not None:
+                self._stats["invalidations"] += 1
+            self._entries.clear()
+            self._version = version
+
+    def get(self, query_vector, context_key, version=None):
+        q = normalize(query_vector).reshape(-1)
+        with self._lock:
+            self._check_version(version)
+            candidates = self._entries.get(context_key) or []
+            for vector, answer in candidates:
+                if float(vector @ q) >= self.threshold:
+                    self._stats["hits"] += 1
+                    return answer
+            self._stats["misses"] += 1
+            return None
+
+    def put(self, query_vector, context_key, answer, version=None):
+        q = normalize(query_vector).reshape(-1)
+        with self._lock:
+            self._check_version(version)
+            candidates = self._entries.get(context_key) or []
+            self._entries.put(context_key, candidates[-(self.max_per_context - 1):] + [(q, answer)])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            entries = self._entries.stats()
+            return dict(self._stats, size=entries["size"], max_size=entries["max_size"])
+
+
+def get_cache_stats():
+    """Counters of every registered cache, keyed by cache name."""
+    return {name: cache.stats() for name, cache in CACHES.items()}
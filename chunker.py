@@ -0,0 +1,144 @@
+# modules
+import re
+from collections import namedtuple
+from models import tokenizer
+from config import CHUNK_SIZE, CHUNK_OVERLAP
+
+SENTENCE_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+
+# a sentence (or table row) with its token count and source location
+Unit = namedtuple("Unit", "text tokens location")
+
+
+def count_tokens(texts):
+    """Token counts of `texts` with the embedding model's tokenizer (no special tokens)."""
+    if not texts:
+        return []
+    return [len(ids) for ids in tokenizer.get()(list(texts), add_special_tokens=False)["input_ids"]]
+
+
+def truncate_tokens(text, max_tokens, count=count_tokens):
+    """`text` cut (at a word boundary) to at most `max_tokens` tokens, and its token count."""
+    tokens = count([text])[0]
+    words = text.split()
+    while tokens > max_tokens and words:
+        # tokens per word is near constant within one text, so this takes one or two rounds
+        words = words[:min(len(words) - 1, len(words) * max_tokens // tokens)]
+        text = " ".join(words)
+        tokens = count([text])[0]
+    return text, tokens
+
+
+def split_sentences(text):
+    return [s.strip() for s in SENTENCE_RE.split(text) if s and s.strip()]
+
+
+def _boundary(location):
+    """Chunks never span two pages or two slides."""
+    for key in ("page", "slide"):
+        if key in location:
+            return key, location[key]
+    return None
+
+
+# ------------------------
+# Token-aware chunker
+# ------------------------
+class TokenChunker:
+    """
+    Packs whole sentences (whole rows for tables) into chunks of at most
+    `max_tokens` model tokens, repeating up to `overlap` tokens of trailing
+    sentences at the start of the next chunk. Page and slide boundaries are
+    never crossed; a sentence longer than `max_tokens` is cut into word
+    windows. A chunk that would add fewer than `min_tokens` new tokens at
+    the end of a page (or file) is folded into the chunk before it.
+    """
+
+    def __init__(self, max_tokens=CHUNK_SIZE, overlap=CHUNK_OVERLAP, min_tokens=None, count=count_tokens):
+        self.max_tokens = max_tokens
+        self.overlap = min(overlap, max_tokens // 2)
+        self.min_tokens = max_tokens // 8 if min_tokens is None else min_tokens
+        self.count = count
+
+    def _units(self, text, location):
+        if "row" in location:
+            # a batch of table rows, one per line: rows stay whole (unless too long)
+            first = location["row"]
+            pieces = [(row, {"row": first + i}) for i, row in enumerate(text.split("\n")) if row.strip()]
+        else:
+            pieces = [(sentence, location) for sentence in split_sentences(text)]
+        counts = self.count([piece for piece, _ in pieces])
+        for (piece, piece_location), tokens in zip(pieces, counts):
+            if tokens <= self.max_tokens:
+                yield Unit(piece, tokens, piece_location)
+                continue
+            words = piece.split()
+            step = max(1, len(words) * self.max_tokens // tokens)
+            windows = [" ".join(words[i:i + step]) for i in range(0, len(words), step)]
+            for window, window_tokens in zip(windows, self.count(windows)):
+                yield Unit(window, window_tokens, piece_location)
+
+    def _chunk(self, units):
+        location = {}
+        first = units[0].location
+        boundary = _boundary(first)
+        if boundary:
+            location[boundary[0]] = boundary[1]
+        rows = [u.location["row"] for u in units if "row" in u.location]
+        if rows:
+            location["row_start"], location["row_end"] = min(rows), max(rows)
+        return " ".join(u.text for u in units), location
+
+    def _finish(self, held, units, carried):
+        """Emit the end of a page/file: the held chunk plus what is left."""
+        new = units[carried:]
+        if new and held is not None and sum(u.tokens for u in new) < self.min_tokens:
+            yield self._chunk(held + new)
+            return
+        if held is not None:
+            yield self._chunk(held)
+        if new:
+            yield self._chunk(units)
+
+    def chunks(self, segments):
+        """Yield (text, location) chunks from (text, location) segments."""
+        held = None  # last full chunk, kept back in case a tiny one follows
+        units, tokens, carried = [], 0, 0  # carried: leading overlap units
+        group = None
+        for text, location in segments:
+            boundary = _boundary(location)
+            if boundary != group:
+                yield from self._finish(held, units, carried)
+                held, units, tokens, carried = None, [], 0, 0
+                group = boundary
+            for unit in self._units(text, location):
+                if len(units) > carried and tokens + unit.tokens > self.max_tokens:
+                    if held is not None:
+                        yield self._chunk(held)
+                    held = units
+                    # trailing sentences repeat at the start of the next chunk
+                    units, tokens = [], 0
+                    for previous in reversed(held):
+                        if tokens + previous.tokens > self.overlap:
+                            break
+                        units.insert(0, previous)
+                        tokens += previous.tokens
+                    while units and tokens + unit.tokens > self.max_tokens:
+                        tokens -= units.pop(0).tokens
+                    carried = len(units)
+                units.append(unit)
+                tokens += unit.tokens
+        yield from self._finish(held, units, carried)
+
+
+def chunk_batches(segments, max_tokens=CHUNK_SIZE, overlap=CHUNK_OVERLAP, batch_size=256):
+    """Stream (texts, locations) lists of up to `batch_size` chunks from (text, location) segments."""
+    texts, locations = [], []
+    for text, location in TokenChunker(max_tokens, overlap).chunks(segments):
+        texts.append(text)
+        locations.append(location)
+        if len(texts) == batch_size:
+            yield texts, locations
+            texts, locations = [], []
+    if texts:
+        yield texts, locations
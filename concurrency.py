@@ -0,0 +1,84 @@
+# modules
+import time
+import asyncio
+import threading
+import functools
+import weakref
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+from metrics import in_context
+
+# every stage registers itself here so its counters can be reported together
+STAGES = {}
+
+
+# ------------------------
+# Bounded async stage
+# ------------------------
+class Stage:
+    """
+    One kind of blocking work on the async request path (embedding, DB,
+    LLM, audio). At most `limit` calls run at once; the rest wait on an
+    asyncio semaphore instead of piling up in the executor. Blocking
+    functions run on the stage's own `workers` threads; pure async work
+    (the streamed LLM call) only takes a slot.
+    """
+
+    def __init__(self, name, limit, workers=None):
+        self.name = name
+        self.limit = limit
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name) if workers else None
+        # asyncio semaphores belong to one event loop; keep one per loop
+        self._semaphores = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "running": 0, "waiting": 0, "wait_seconds": 0.0, "busy_seconds": 0.0}
+        STAGES[name] = self
+
+    def _semaphore(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            semaphore = self._semaphores.get(loop)
+            if semaphore is None:
+                semaphore = self._semaphores[loop] = asyncio.Semaphore(self.limit)
+        return semaphore
+
+    @asynccontextmanager
+    async def slot(self):
+        """Hold one of the stage's `limit` slots."""
+        semaphore = self._semaphore()
+        start = time.monotonic()
+        with self._lock:
+            self._stats["waiting"] += 1
+        try:
+            await semaphore.acquire()
+        finally:
+            with self._lock:
+                self._stats["waiting"] -= 1
+        acquired = time.monotonic()
+        with self._lock:
+            self._stats["calls"] += 1
+            self._stats["running"] += 1
+            self._stats["wait_seconds"] += acquired - start
+        try:
+            yield
+        finally:
+            semaphore.release()
+            with self._lock:
+                self._stats["running"] -= 1
+                self._stats["busy_seconds"] += time.monotonic() - acquired
+
+    async def run(self, fn, *args, **kwargs):
+        """Run blocking `fn` on the stage's threads once a slot is free."""
+        async with self.slot():
+            loop = asyncio.get_running_loop()
+            # the caller's context (e.g. its request trace) carries over to the thread
+            return await loop.run_in_executor(self.executor, in_context(functools.partial(fn, *args, **kwargs)))
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, limit=self.limit)
+
+
+def get_stage_stats():
+    """Counters of every registered stage, keyed by stage name."""
+    return {name: stage.stats() for name, stage in STAGES.items()}
@@ -12,7 +12,117 @@ DB_PATH = os.getenv("DB_PATH", "DataBase.db")
 
 # Embedding model
 MODEL_NAME = "BAAI/bge-m3"
+# "torch" or "onnx" (EMBED_ONNX_FILE picks e.g. a quantized export such as onnx/model_qint8_avx512.onnx)
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "torch")
+EMBED_ONNX_FILE = os.getenv("EMBED_ONNX_FILE") or None
+# load the model in the background at app start (otherwise on the first query)
+EMBED_WARMUP = os.getenv("EMBED_WARMUP", "1") == "1"
 
-# Chunk size default
-CHUNK_SIZE = 200
+# Chunk size default, in model tokens; consecutive chunks share up to CHUNK_OVERLAP tokens
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "512"))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "64"))
 
+
+# Retriever backend: "exact" (brute force) or "ivf" (approximate)
+RETRIEVER = os.getenv("RETRIEVER", "exact")
+IVF_NLIST = int(os.getenv("IVF_NLIST", "256"))
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", "16"))
+
+# Chunk retrieval: "dense" (vectors only), "hybrid" (FTS5 BM25 + dense, fused with RRF)
+# or "bm25_prefilter" (dense scoring over the top BM25_PREFILTER_CANDIDATES keyword matches)
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "dense")
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "50"))
+BM25_PREFILTER_CANDIDATES = int(os.getenv("BM25_PREFILTER_CANDIDATES", "2000"))
+
+# Embedding precision for the in-RAM search codes: float32 | float16 | int8 | binary
+# (float32 vectors stay on disk for exact re-scoring of the top COARSE_CANDIDATES)
+EMBEDDING_PRECISION = os.getenv("EMBEDDING_PRECISION", "float32")
+COARSE_CANDIDATES = int(os.getenv("COARSE_CANDIDATES", "100"))
+
+# Structured data source: "sqlserver" or "sqlite" (local stand-in for testing)
+SQL_BACKEND = os.getenv("SQL_BACKEND", "sqlserver")
+SQL_SQLITE_PATH = os.getenv("SQL_SQLITE_PATH", "university.db")
+
+# Seconds a table snapshot is served before checking the table for changes
+SQL_CONTEXT_TTL = float(os.getenv("SQL_CONTEXT_TTL", "300"))
+
+# Table rows sent to the prompt: "dense", "bm25", "hybrid" (top-k rows) or "all" (every row)
+SQL_ROW_RETRIEVAL = os.getenv("SQL_ROW_RETRIEVAL", "dense")
+SQL_TOP_K_ROWS = int(os.getenv("SQL_TOP_K_ROWS", "20"))
+
+# SQL Server connection pool
+SQL_POOL_SIZE = int(os.getenv("SQL_POOL_SIZE", "8"))
+SQL_POOL_TIMEOUT = float(os.getenv("SQL_POOL_TIMEOUT", "30"))
+SQL_POOL_IDLE_TIMEOUT = float(os.getenv("SQL_POOL_IDLE_TIMEOUT", "300"))
+
+# Ingest pipeline: reader/OCR processes, cross-file embedding batch, queue bound (files)
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "32"))
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "8"))
+# Streaming readers: spreadsheet rows read per batch, chunks per pipeline message
+READ_BATCH_ROWS = int(os.getenv("READ_BATCH_ROWS", "5000"))
+INGEST_CHUNK_BATCH = int(os.getenv("INGEST_CHUNK_BATCH", "256"))
+# OCR (images and scanned PDF pages): pages OCR'd at once per file, language, PDF render
+# resolution, longest image side after downscaling, Otsu binarization, page text cache file.
+# A PDF page with fewer than OCR_MIN_TEXT_CHARS of extractable text and an image is OCR'd
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+OCR_LANG = os.getenv("OCR_LANG", "eng")
+OCR_DPI = int(os.getenv("OCR_DPI", "200"))
+OCR_MAX_SIDE = int(os.getenv("OCR_MAX_SIDE", "2400"))
+OCR_BINARIZE = os.getenv("OCR_BINARIZE", "1") == "1"
+OCR_MIN_TEXT_CHARS = int(os.getenv("OCR_MIN_TEXT_CHARS", "20"))
+OCR_CACHE_PATH = os.getenv("OCR_CACHE_PATH", "ocr_cache.db")
+# Background ingest jobs: UI status poll interval (seconds), recent jobs shown
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "2"))
+JOB_HISTORY = int(os.getenv("JOB_HISTORY", "5"))
+
+# Compaction: rewrite vectors / VACUUM once this share of vector rows or DB pages is dead,
+# checked every COMPACT_INTERVAL seconds by the app (0 = never)
+COMPACT_DEAD_RATIO = float(os.getenv("COMPACT_DEAD_RATIO", "0.2"))
+COMPACT_INTERVAL = float(os.getenv("COMPACT_INTERVAL", "3600"))
+
+# Caches: query text -> query vector, and semantic answer cache
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "1024"))
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "86400"))
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "256"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+
+# LLM: "gemini" or "fake" (local streaming stub for tests, no network)
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.0-flash")
+
+# Prompt context: token budget for the whole prompt, filled section by section in
+# CONTEXT_PRIORITY order; up to CONTEXT_MAX_CHUNKS chunks after dropping near-duplicates
+# (cosine >= CONTEXT_DEDUP_THRESHOLD), table rows cut to CONTEXT_MAX_ROW_TOKENS
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "4000"))
+CONTEXT_PRIORITY = os.getenv("CONTEXT_PRIORITY", "documents,rows")
+CONTEXT_MAX_CHUNKS = int(os.getenv("CONTEXT_MAX_CHUNKS", "3"))
+CONTEXT_MAX_ROW_TOKENS = int(os.getenv("CONTEXT_MAX_ROW_TOKENS", "96"))
+CONTEXT_DEDUP_THRESHOLD = float(os.getenv("CONTEXT_DEDUP_THRESHOLD", "0.95"))
+
+# Re-ranking (off unless RERANK_MODEL is set, e.g. cross-encoder/ms-marco-MiniLM-L-6-v2): the top
+# RERANK_CANDIDATES dense matches are scored by a CPU cross-encoder in batches of RERANK_BATCH_SIZE;
+# past RERANK_BUDGET_MS the dense order is kept. Scores are cached per (question, chunk)
+RERANK_MODEL = os.getenv("RERANK_MODEL") or None
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "20"))
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "16"))
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", "300"))
+RERANK_CACHE_SIZE = int(os.getenv("RERANK_CACHE_SIZE", "4096"))
+
+# Async request path: threads and concurrent calls per stage, and the Gradio queue
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "64"))
+DB_WORKERS = int(os.getenv("DB_WORKERS", "8"))
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "16"))
+GRADIO_CONCURRENCY_LIMIT = int(os.getenv("GRADIO_CONCURRENCY_LIMIT", "32"))
+GRADIO_MAX_QUEUE_SIZE = int(os.getenv("GRADIO_MAX_QUEUE_SIZE", "128"))
+
+# Embedding service: queries arriving within EMBED_MAX_WAIT_MS share one forward pass
+EMBED_MAX_BATCH = int(os.getenv("EMBED_MAX_BATCH", "32"))
+EMBED_MAX_WAIT_MS = float(os.getenv("EMBED_MAX_WAIT_MS", "5"))
+
+# Instrumentation: Prometheus /metrics port next to the app (0 = off), and an optional
+# JSONL file with one trace (per-stage spans) per chat request
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9464"))
+TRACE_PATH = os.getenv("TRACE_PATH", "")
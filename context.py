@@ -0,0 +1,140 @@
+# modules
+import threading
+import numpy as np
+from chunker import count_tokens, truncate_tokens
+from config import (
+    PROMPT_TOKEN_BUDGET, CONTEXT_PRIORITY, CONTEXT_MAX_CHUNKS,
+    CONTEXT_MAX_ROW_TOKENS, CONTEXT_DEDUP_THRESHOLD,
+)
+
+# prompt sections the budget is shared between, in CONTEXT_PRIORITY order
+SECTIONS = ("documents", "rows")
+
+# a chunk cut to fit the budget must keep at least this many tokens (otherwise it is dropped)
+MIN_TRUNCATED_TOKENS = 32
+
+
+def drop_near_duplicates(vectors, threshold):
+    """Indices of the rows to keep: a row is dropped if its cosine to an earlier kept row is >= threshold."""
+    kept = []
+    for i, vector in enumerate(vectors):
+        if kept and float(np.max(vectors[kept] @ vector)) >= threshold:
+            continue
+        kept.append(i)
+    return kept
+
+
+# ------------------------
+# Prompt context budgeter
+# ------------------------
+class ContextBudgeter:
+    """
+    Fits retrieved document chunks and table rows into a prompt of at most
+    `budget` tokens (counted with the embedding model's tokenizer, an
+    estimate of the LLM's count). The fixed part (system prompt, template,
+    question) is counted first; the rest of the budget is filled section by
+    section in `priority` order, best-ranked items first. Chunks that are
+    near-duplicates of a better chunk (by stored embedding) are dropped,
+    table rows are cut to `max_row_tokens`, and the last chunk that does not
+    fit whole is cut to the remaining budget.
+    """
+
+    def __init__(self, budget=PROMPT_TOKEN_BUDGET, priority=CONTEXT_PRIORITY, max_chunks=CONTEXT_MAX_CHUNKS,
+                 max_row_tokens=CONTEXT_MAX_ROW_TOKENS, dedup_threshold=CONTEXT_DEDUP_THRESHOLD,
+                 count=count_tokens):
+        priority = [section.strip() for section in priority.split(",")] if isinstance(priority, str) else priority
+        if sorted(priority) != sorted(SECTIONS):
+            raise ValueError(f"Context priority must order {list(SECTIONS)}, got {priority}")
+        self.budget = budget
+        self.priority = priority
+        self.max_chunks = max_chunks
+        self.max_row_tokens = max_row_tokens
+        self.dedup_threshold = dedup_threshold
+        self.count = count
+        self._lock = threading.Lock()
+        self._last = None
+        self._totals = {"requests": 0, "total_tokens": 0, "max_total_tokens": 0,
+                        "chunks_duplicate": 0, "chunks_over_budget": 0,
+                        "rows_truncated": 0, "rows_over_budget": 0}
+
+    def _documents(self, chunks, vectors, remaining, stats):
+        order = list(range(len(chunks)))
+        if vectors is not None and len(vectors) == len(chunks) and self.dedup_threshold < 1:
+            order = drop_near_duplicates(np.asarray(vectors, dtype=np.float32), self.dedup_threshold)
+        stats["chunks_duplicate"] = len(chunks) - len(order)
+        # candidates past max_chunks only stand in for dropped duplicates
+        stats["chunks_spare"] = max(0, len(order) - self.max_chunks)
+        order = order[:self.max_chunks]
+        kept = []
+        for i, tokens in zip(order, self.count([chunks[i] for i in order])):
+            if tokens <= remaining:
+                kept.append(chunks[i])
+                remaining -= tokens
+            elif remaining >= MIN_TRUNCATED_TOKENS:
+                text, tokens = truncate_tokens(chunks[i], remaining, self.count)
+                kept.append(text)
+                remaining -= tokens
+        stats["chunks_kept"] = len(kept)
+        stats["chunks_over_budget"] = len(order) - len(kept)
+        return kept, remaining
+
+    def _rows(self, rows, remaining, stats, block=64):
+        kept = []
+        truncated = 0
+        # rows are counted a block at a time, so a long "all rows" list is not tokenized past the budget
+        for start in range(0, len(rows), block):
+            if remaining <= 0:
+                break
+            batch = rows[start:start + block]
+            for row, tokens in zip(batch, self.count(batch)):
+                if tokens > self.max_row_tokens:
+                    row, tokens = truncate_tokens(row, self.max_row_tokens, self.count)
+                    truncated += 1
+                if tokens <= remaining:
+                    kept.append(row)
+                    remaining -= tokens
+        stats["rows_kept"] = len(kept)
+        stats["rows_truncated"] = truncated
+        stats["rows_over_budget"] = len(rows) - len(kept)
+        return kept, remaining
+
+    def fit(self, fixed, chunks, rows, vectors=None):
+        """
+        Select the context for one prompt. `fixed` is the text that always
+        goes in (e.g. the prompt built with empty context); `chunks` and
+        `rows` are in rank order and `vectors[i]` is chunk i's normalized
+        embedding. Returns (chunks, rows, stats).
+        """
+        fixed_tokens = self.count([fixed])[0] if fixed else 0
+        remaining = self.budget - fixed_tokens
+        stats = {"budget": self.budget, "fixed_tokens": fixed_tokens,
+                 "chunks_in": len(chunks), "rows_in": len(rows)}
+        selected = {}
+        for section in self.priority:
+            before = max(remaining, 0)
+            if section == "documents":
+                selected[section], remaining = self._documents(chunks, vectors, before, stats)
+            else:
+                selected[section], remaining = self._rows(rows, before, stats)
+            stats[f"{section}_tokens"] = before - remaining
+        stats["total_tokens"] = fixed_tokens + stats["documents_tokens"] + stats["rows_tokens"]
+        self._record(stats)
+        return selected["documents"], selected["rows"], stats
+
+    def _record(self, stats):
+        with self._lock:
+            self._last = stats
+            totals = self._totals
+            totals["requests"] += 1
+            totals["total_tokens"] += stats["total_tokens"]
+            totals["max_total_tokens"] = max(totals["max_total_tokens"], stats["total_tokens"])
+            for key in ("chunks_duplicate", "chunks_over_budget", "rows_truncated", "rows_over_budget"):
+                totals[key] += stats[key]
+
+    def stats(self):
+        """Totals over all requests, plus the last request's breakdown."""
+        with self._lock:
+            totals = dict(self._totals)
+            totals["avg_total_tokens"] = totals["total_tokens"] / totals["requests"] if totals["requests"] else 0.0
+            totals["last"] = dict(self._last) if self._last else None
+        return totals
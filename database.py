@@ -1,21 +1,70 @@
 # modules
+import os
+import glob
+import time
+import uuid
+import hashlib
 import sqlite3
-from config import DB_PATH
+from config import DB_PATH, EMBEDDING_PRECISION, COARSE_CANDIDATES, COMPACT_DEAD_RATIO, COMPACT_INTERVAL
 import numpy as np
 import json
+import threading
+from pool import ThreadLocalConnections
+from vector_index import VectorIndex, MappedVectorIndex
+from vector_store import VectorStore
+from quantize import get_codec
+from bm25 import tokenize
+from metrics import timed
 
-# connection helper
+# vectors live in an append-only float32 file next to the DB
+# (compaction writes a new file; meta 'vector_file' names the current one)
+VECTORS_PATH = os.path.splitext(DB_PATH)[0] + ".vectors.f32"
+
+# memory-mapped vector store and the index over it (kept in sync by save_chunks)
+_vector_store = None
+_vector_store_lock = threading.Lock()
+_vector_index = None
+_vector_index_lock = threading.Lock()
+
+# one writer at a time in this process: vector appends and compaction must not interleave
+_write_lock = threading.RLock()
+
+# bumped on every write/delete so caches of answers can tell the corpus changed
+_corpus_version = 0
+
+# where a chunk came from in its file (see readers / chunker)
+LOCATION_COLUMNS = ("page", "slide", "row_start", "row_end")
+
+# whether the chunks_fts table exists (None = not checked yet)
+_has_fts = None
+
+def _connect():
+    conn = sqlite3.connect(DB_PATH)
+    # safe with WAL and much cheaper than FULL for bulk writes
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+# one SQLite connection per thread, reused across operations
+_connections = ThreadLocalConnections("sqlite", _connect)
+
+# connection helper (do not close the returned connection; `with` commits/rolls back)
 def get_connection():
-    return sqlite3.connect(DB_PATH)
+    return _connections.get()
+
+# close the calling thread's connection (before a short-lived thread exits, or at shutdown)
+def close_connection():
+    _connections.close()
 
 # initialize database
 def init_db():
     with get_connection() as conn:
         cur = conn.cursor()
+        cur.execute("PRAGMA journal_mode=WAL")
         cur.execute("""
         CREATE TABLE IF NOT EXISTS documents (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
-            file_path TEXT UNIQUE
+            file_path TEXT UNIQUE,
+            content_hash TEXT
         )
         """)
         cur.execute("""
@@ -23,66 +72,730 @@ def init_db():
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             document_id INTEGER,
             chunk_text TEXT,
+            vec_row INTEGER,
+            chunk_hash TEXT,
+            page INTEGER,
+            slide INTEGER,
+            row_start INTEGER,
+            row_end INTEGER,
             FOREIGN KEY(document_id) REFERENCES documents(id)
         )
         """)
         cur.execute("""
-        CREATE TABLE IF NOT EXISTS embeddings (
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+        """)
+        # background ingest jobs (see jobs.py): one row per job and per file in it
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS jobs (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
-            chunk_id INTEGER,
-            vector BLOB,
-            FOREIGN KEY(chunk_id) REFERENCES chunks(id)
+            status TEXT,
+            chunk_size INTEGER,
+            created_at REAL,
+            started_at REAL,
+            finished_at REAL
         )
         """)
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS job_files (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            job_id INTEGER,
+            file_path TEXT,
+            status TEXT,
+            chunks INTEGER,
+            embedded INTEGER,
+            seconds REAL,
+            message TEXT,
+            FOREIGN KEY(job_id) REFERENCES jobs(id)
+        )
+        """)
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_job_files_job ON job_files(job_id)")
+        _add_column(cur, "documents", "content_hash", "TEXT")
+        _add_column(cur, "chunks", "vec_row", "INTEGER")
+        _add_column(cur, "chunks", "chunk_hash", "TEXT")
+        # source location of each chunk (NULL when unknown)
+        for column in LOCATION_COLUMNS:
+            _add_column(cur, "chunks", column, "INTEGER")
         cur.execute("CREATE INDEX IF NOT EXISTS idx_chunks_doc ON chunks(document_id)")
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_chunk ON embeddings(chunk_id)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_chunks_vec_row ON chunks(vec_row)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_chunks_hash ON chunks(chunk_hash)")
+        _create_fts(cur)
+    migrate_embeddings()
+    backfill_chunk_hashes()
+    _remove_stale_vector_files()
+
+# add a column to an existing table (older DBs)
+def _add_column(cur, table, column, column_type):
+    columns = [row[1] for row in cur.execute(f"PRAGMA table_info({table})")]
+    if column not in columns:
+        cur.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+
+# full-text (FTS5) index mirroring chunks.chunk_text; written by _insert_chunks / _delete_chunks
+# (one set-based statement per write: row triggers make FTS5 flush on every row, ~7x slower)
+def _create_fts(cur):
+    global _has_fts
+    cur.execute("SELECT 1 FROM sqlite_master WHERE name = 'chunks_fts'")
+    exists = cur.fetchone() is not None
+    try:
+        cur.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts
+        USING fts5(chunk_text, content='chunks', content_rowid='id')
+        """)
+    except sqlite3.OperationalError as e:
+        print(f"[DB Error] FTS5 unavailable, keyword search disabled: {e}")
+        _has_fts = False
+        return
+    # index chunks saved before the FTS table existed
+    if not exists:
+        cur.execute("INSERT INTO chunks_fts (chunks_fts) VALUES ('rebuild')")
+    _has_fts = True
+
+def _fts_enabled(cur):
+    global _has_fts
+    if _has_fts is None:
+        cur.execute("SELECT 1 FROM sqlite_master WHERE name = 'chunks_fts'")
+        _has_fts = cur.fetchone() is not None
+    return _has_fts
+
+# content hashes
+def hash_text(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def hash_file(file_path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+# hash chunks saved before chunk hashing existed
+def backfill_chunk_hashes(batch_size=4096):
+    while True:
+        with get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT id, chunk_text FROM chunks WHERE chunk_hash IS NULL LIMIT ?", (batch_size,))
+            rows = cur.fetchall()
+            if not rows:
+                return
+            cur.executemany(
+                "UPDATE chunks SET chunk_hash = ? WHERE id = ?",
+                [(hash_text(text or ""), chunk_id) for chunk_id, text in rows]
+            )
 
-# save chunks + embeddings in bulk
-def save_chunks(document_id, chunks, vectors):
+# move legacy per-row embedding BLOBs into the vector store
+def migrate_embeddings(batch_size=4096):
     with get_connection() as conn:
         cur = conn.cursor()
-        for chunk, vector in zip(chunks, vectors):
-            cur.execute("INSERT INTO chunks (document_id, chunk_text) VALUES (?, ?)", (document_id, chunk))
-            chunk_id = cur.lastrowid
+        cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='embeddings'")
+        if not cur.fetchone():
+            return
+        cur.execute("SELECT vector FROM embeddings LIMIT 1")
+        first = cur.fetchone()
+    if first:
+        store = get_vector_store(len(first[0]) // 4)
+        while True:
+            with get_connection() as conn:
+                cur = conn.cursor()
+                cur.execute("""
+                    SELECT e.chunk_id, e.vector
+                    FROM embeddings e
+                    JOIN chunks c ON c.id = e.chunk_id
+                    WHERE c.vec_row IS NULL
+                    ORDER BY e.chunk_id
+                    LIMIT ?
+                """, (batch_size,))
+                rows = cur.fetchall()
+                if not rows:
+                    break
+                vectors = np.frombuffer(b"".join(vec for _, vec in rows), dtype=np.float32)
+                vec_rows = store.append(vectors.reshape(len(rows), -1))
+                cur.executemany(
+                    "UPDATE chunks SET vec_row = ? WHERE id = ?",
+                    [(int(r), chunk_id) for r, (chunk_id, _) in zip(vec_rows, rows)]
+                )
+    with get_connection() as conn:
+        conn.execute("DROP TABLE embeddings")
+    invalidate_vector_index()
+
+# meta key/value helpers
+def _get_meta(cur, key):
+    row = cur.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+def _set_meta(cur, key, value):
+    cur.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+# path of the current vector file
+def _vectors_path(cur):
+    name = _get_meta(cur, "vector_file")
+    return os.path.join(os.path.dirname(VECTORS_PATH), name) if name else VECTORS_PATH
+
+# shared vector store; created on first save (dim is recorded in `meta`)
+def get_vector_store(dim=None):
+    global _vector_store
+    if _vector_store is not None:
+        return _vector_store
+    # two store objects on one file would hand out the same rows
+    with _vector_store_lock:
+        if _vector_store is not None:
+            return _vector_store
+        with get_connection() as conn:
+            cur = conn.cursor()
+            row = _get_meta(cur, "vector_dim")
+            if row:
+                dim = int(row)
+            elif dim is None:
+                return None
+            else:
+                _set_meta(cur, "vector_dim", dim)
+                _set_meta(cur, "vector_file", os.path.basename(VECTORS_PATH))
+                # a vector file left over from another DB would misalign vec_row
+                if os.path.exists(VECTORS_PATH):
+                    os.remove(VECTORS_PATH)
+            # identifies the file's rows for saved ANN indexes; changes when the file is rewritten
+            generation = _get_meta(cur, "vector_generation") if row else None
+            if generation is None:
+                generation = uuid.uuid4().hex
+                _set_meta(cur, "vector_generation", generation)
+            path = _vectors_path(cur)
+        _vector_store = VectorStore(path, dim, codec=get_codec(EMBEDDING_PRECISION), generation=generation)
+    return _vector_store
+
+# next free id of an AUTOINCREMENT table (ids are never reused)
+def _next_id(cur, table):
+    cur.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (table,))
+    row = cur.fetchone()
+    cur.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}")
+    return max(row[0] if row else 0, cur.fetchone()[0]) + 1
+
+# insert the document row if needed and return its id
+def _upsert_document(cur, file_path, content_hash=None):
+    cur.execute("INSERT OR IGNORE INTO documents (file_path) VALUES (?)", (file_path,))
+    if content_hash is not None:
+        cur.execute("UPDATE documents SET content_hash = ? WHERE file_path = ?", (content_hash, file_path))
+    cur.execute("SELECT id FROM documents WHERE file_path = ?", (file_path,))
+    return cur.fetchone()[0]
+
+# one executemany with pre-assigned ids instead of a round trip per chunk
+def _insert_chunks(cur, document_id, chunks, vec_rows, chunk_hashes, locations=None):
+    first_id = _next_id(cur, "chunks")
+    chunk_ids = list(range(first_id, first_id + len(chunks)))
+    locations = locations or [{}] * len(chunks)
+    cur.executemany(
+        "INSERT INTO chunks (id, document_id, chunk_text, vec_row, chunk_hash, page, slide, row_start, row_end) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        [(chunk_id, document_id, chunk, int(vec_row), chunk_hash, *(loc.get(c) for c in LOCATION_COLUMNS))
+         for chunk_id, chunk, vec_row, chunk_hash, loc in zip(chunk_ids, chunks, vec_rows, chunk_hashes, locations)]
+    )
+    if _fts_enabled(cur):
+        cur.execute(
+            "INSERT INTO chunks_fts (rowid, chunk_text) SELECT id, chunk_text FROM chunks WHERE id >= ? AND id < ?",
+            (first_id, first_id + len(chunks))
+        )
+    return chunk_ids
+
+# delete chunks matching `where`, removing them from the FTS index first
+def _delete_chunks(cur, where, params):
+    if _fts_enabled(cur):
+        cur.execute(
+            f"INSERT INTO chunks_fts (chunks_fts, rowid, chunk_text) SELECT 'delete', id, chunk_text FROM chunks WHERE {where}",
+            params
+        )
+    cur.execute(f"DELETE FROM chunks WHERE {where}", params)
+
+# stored vector row for each known chunk hash
+def get_vec_rows_by_hash(chunk_hashes):
+    chunk_hashes = list(set(chunk_hashes))
+    found = {}
+    with get_connection() as conn:
+        cur = conn.cursor()
+        for start in range(0, len(chunk_hashes), 500):
+            batch = chunk_hashes[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
             cur.execute(
-                "INSERT INTO embeddings (chunk_id, vector) VALUES (?, ?)",
-                (chunk_id, vector.astype(np.float32).tobytes())
+                f"SELECT chunk_hash, MIN(vec_row) FROM chunks "
+                f"WHERE vec_row IS NOT NULL AND chunk_hash IN ({placeholders}) GROUP BY chunk_hash",
+                batch
             )
+            found.update(cur.fetchall())
+    return found
+
+
+# stored content hash of a document (None if unknown)
+def get_document_hash(file_path):
+    with get_connection() as conn:
+        row = conn.execute("SELECT content_hash FROM documents WHERE file_path = ?", (file_path,)).fetchone()
+    return row[0] if row else None
+
+# point index rows at a live chunk (or tombstone them) after chunks changed
+def _sync_index_rows(vec_rows):
+    index = _vector_index
+    if index is None or not len(vec_rows):
+        return
+    if not (isinstance(index, MappedVectorIndex) and index.store is _vector_store):
+        invalidate_vector_index()
+        return
+    vec_rows = sorted(set(int(r) for r in vec_rows))
+    owners = {}
+    with get_connection() as conn:
+        cur = conn.cursor()
+        for start in range(0, len(vec_rows), 500):
+            batch = vec_rows[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            cur.execute(f"SELECT vec_row, MIN(id) FROM chunks WHERE vec_row IN ({placeholders}) GROUP BY vec_row", batch)
+            owners.update(cur.fetchall())
+    index.set_rows(vec_rows, [owners.get(r, -1) for r in vec_rows])
+
+# bulk write: new vectors to the store, then document + chunks in one transaction
+@timed("db.save")
+def _bulk_write(file_path, document_id, chunks, vectors, content_hash=None, chunk_hashes=None, replace=False,
+                locations=None):
+    with _write_lock:
+        return _bulk_write_locked(file_path, document_id, chunks, vectors, content_hash, chunk_hashes, replace,
+                                  locations)
+
+def _bulk_write_locked(file_path, document_id, chunks, vectors, content_hash, chunk_hashes, replace, locations):
+    start = time.perf_counter()
+    chunk_hashes = list(chunk_hashes) if chunk_hashes is not None else [hash_text(c) for c in chunks]
+
+    # identical chunks (in this file or any other document) share one stored vector
+    row_of = get_vec_rows_by_hash(chunk_hashes) if chunks else {}
+    new_idx = {}
+    for i, chunk_hash in enumerate(chunk_hashes):
+        if chunk_hash not in row_of and chunk_hash not in new_idx:
+            if vectors is None or vectors[i] is None:
+                raise ValueError(f"No vector for new chunk {i} of {file_path or document_id}")
+            new_idx[chunk_hash] = i
+    embedded = len(new_idx)
+    if new_idx:
+        new_vectors = np.asarray([vectors[i] for i in new_idx.values()], dtype=np.float32)
+        # vectors first: rows nobody points at are harmless if the transaction fails
+        appended = get_vector_store(new_vectors.shape[1]).append(new_vectors)
+        row_of.update(zip(new_idx, appended))
+    vec_rows = [row_of[h] for h in chunk_hashes]
+
+    conn = get_connection()
+    old_rows = []
+    try:
+        cur = conn.cursor()
+        cur.execute("BEGIN IMMEDIATE")
+        if document_id is None:
+            document_id = _upsert_document(cur, file_path, content_hash)
+        if replace:
+            cur.execute("SELECT vec_row FROM chunks WHERE document_id = ? AND vec_row IS NOT NULL", (document_id,))
+            old_rows = [r for (r,) in cur.fetchall()]
+            _delete_chunks(cur, "document_id = ?", (document_id,))
+        chunk_ids = _insert_chunks(cur, document_id, chunks, vec_rows, chunk_hashes, locations) if len(chunks) else []
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
 
-# get all chunks and vectors
+    # keep the loaded index in sync instead of reloading it
+    _sync_index_rows(old_rows + vec_rows)
+    _bump_corpus_version()
+
+    seconds = time.perf_counter() - start
+    rows = len(chunk_ids)
+    stats = {"rows": rows, "embedded": embedded, "seconds": seconds,
+             "rows_per_sec": rows / seconds if seconds else 0.0}
+    return document_id, chunk_ids, stats
+
+# save (or replace) a document with its chunks + embeddings atomically
+def save_document(file_path, chunks, vectors, content_hash=None, chunk_hashes=None, locations=None, replace=True):
+    """
+    Replaces the document's previous chunks (appends to them with
+    replace=False, for files saved in several batches). `vectors[i]` may be
+    None when chunk i's hash is already stored (its vector is shared, not
+    re-embedded). `locations[i]` is chunk i's {"page", "slide", "row_start",
+    "row_end"} (any subset). `content_hash` is only recorded when given, so
+    a batched save sets it with its last batch. Returns (document_id,
+    chunk_ids, stats); stats has rows, embedded, seconds and rows_per_sec.
+    """
+    return _bulk_write(file_path, None, chunks, vectors, content_hash, chunk_hashes, replace=replace,
+                       locations=locations)
+
+# save chunks + embeddings in bulk (appended to the document's chunks)
+def save_chunks(document_id, chunks, vectors, locations=None):
+    _, chunk_ids, _ = _bulk_write(None, document_id, chunks, vectors, locations=locations)
+    return chunk_ids
+
+# get all chunks and vectors (vectors are a zero-copy memmap when rows are contiguous)
+@timed("db.get_chunks_and_vectors")
 def get_chunks_and_vectors():
     with get_connection() as conn:
         cur = conn.cursor()
-        cur.execute("""
-            SELECT c.chunk_text, e.vector
-            FROM chunks c
-            JOIN embeddings e ON c.id = e.chunk_id
-        """)
+        cur.execute("SELECT chunk_text, vec_row FROM chunks WHERE vec_row IS NOT NULL ORDER BY vec_row")
         rows = cur.fetchall()
 
+    store = get_vector_store()
+    if not rows or store is None:
+        return [], np.array([])
     chunks = [text for text, _ in rows]
-    vectors = [np.frombuffer(vec, dtype=np.float32) for _, vec in rows]
-    return chunks, np.vstack(vectors) if vectors else np.array([])
+    vec_rows = np.array([vec_row for _, vec_row in rows], dtype=np.int64)
+    matrix = store.matrix()
+    if np.array_equal(vec_rows, np.arange(len(vec_rows))):
+        return chunks, matrix[:len(vec_rows)]
+    return chunks, matrix[vec_rows]
+
+# get chunk texts by id (keeps the order of `chunk_ids`)
+@timed("db.get_chunks")
+def get_chunks_by_ids(chunk_ids):
+    chunk_ids = [int(i) for i in chunk_ids]
+    if not chunk_ids:
+        return []
+    placeholders = ",".join("?" * len(chunk_ids))
+    with get_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(f"SELECT id, chunk_text FROM chunks WHERE id IN ({placeholders})", chunk_ids)
+        texts = dict(cur.fetchall())
+    return [texts[i] for i in chunk_ids if i in texts]
+
+# (found ids, chunk texts, stored normalized vectors) by id, in the order of `chunk_ids`
+@timed("db.get_chunks")
+def get_chunks_with_vectors(chunk_ids):
+    chunk_ids = [int(i) for i in chunk_ids]
+    store = get_vector_store()
+    if not chunk_ids or store is None:
+        return [], [], np.empty((0, 0), dtype=np.float32)
+    placeholders = ",".join("?" * len(chunk_ids))
+    with get_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(f"SELECT id, chunk_text, vec_row FROM chunks WHERE id IN ({placeholders})", chunk_ids)
+        found = {chunk_id: (text, vec_row) for chunk_id, text, vec_row in cur.fetchall() if vec_row is not None}
+    found_ids = [i for i in chunk_ids if i in found]
+    if not found_ids:
+        return [], [], np.empty((0, store.dim), dtype=np.float32)
+    vectors = np.asarray(store.matrix()[np.array([found[i][1] for i in found_ids], dtype=np.int64)])
+    return found_ids, [found[i][0] for i in found_ids], vectors
+
+# BM25 keyword matches as (chunk_id, vec_row), best first ([] without FTS5)
+@timed("db.search_fts")
+def search_fts(query, top_k=50):
+    terms = list(dict.fromkeys(tokenize(query)))
+    if not terms:
+        return []
+    # any term may match; quoting keeps FTS5 operators in the question literal
+    match = " OR ".join(f'"{term}"' for term in terms)
+    try:
+        with get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("""
+                SELECT c.id, c.vec_row
+                FROM chunks_fts f
+                JOIN chunks c ON c.id = f.rowid
+                WHERE chunks_fts MATCH ? AND c.vec_row IS NOT NULL
+                ORDER BY f.rank
+                LIMIT ?
+            """, (match, top_k))
+            return cur.fetchall()
+    except sqlite3.OperationalError as e:
+        print(f"[DB Error] {e}")
+        return []
+
+# ------------------------
+# Document lifecycle: list, delete, compact, clear
+# ------------------------
+def list_documents():
+    """Stored documents as {"file_path", "chunks"}, by file path."""
+    with get_connection() as conn:
+        rows = conn.execute("""
+            SELECT d.file_path, COUNT(c.id)
+            FROM documents d
+            LEFT JOIN chunks c ON c.document_id = d.id
+            GROUP BY d.id
+            ORDER BY d.file_path
+        """).fetchall()
+    return [{"file_path": file_path, "chunks": chunks} for file_path, chunks in rows]
+
+def list_document_paths():
+    """Stored documents' file paths, sorted (no chunk counts: cheap enough to poll)."""
+    with get_connection() as conn:
+        rows = conn.execute("SELECT file_path FROM documents ORDER BY file_path").fetchall()
+    return [file_path for (file_path,) in rows]
+
+def delete_document(file_path):
+    """
+    Delete a document with its chunks and their FTS entries. Vector rows
+    no other chunk shares are tombstoned in the loaded index at once and
+    reclaimed by compact(). Returns the number of chunks deleted (None if
+    the document is unknown).
+    """
+    with _write_lock:
+        conn = get_connection()
+        try:
+            cur = conn.cursor()
+            cur.execute("BEGIN IMMEDIATE")
+            row = cur.execute("SELECT id FROM documents WHERE file_path = ?", (file_path,)).fetchone()
+            if row is None:
+                conn.rollback()
+                return None
+            cur.execute("SELECT vec_row FROM chunks WHERE document_id = ?", row)
+            old_rows = [r for (r,) in cur.fetchall()]
+            _delete_chunks(cur, "document_id = ?", row)
+            cur.execute("DELETE FROM documents WHERE id = ?", row)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    _sync_index_rows([r for r in old_rows if r is not None])
+    _bump_corpus_version()
+    return len(old_rows)
+
+# newest chunk id of a document (0 if none); a re-ingest appends its chunks after it
+def get_document_watermark(file_path):
+    with get_connection() as conn:
+        row = conn.execute(
+            "SELECT COALESCE(MAX(c.id), 0) FROM chunks c JOIN documents d ON d.id = c.document_id WHERE d.file_path = ?",
+            (file_path,)
+        ).fetchone()
+    return row[0]
+
+def _drop_document_chunks(file_path, where, watermark, content_hash=None):
+    where = f"document_id = (SELECT id FROM documents WHERE file_path = ?) AND id {where} ?"
+    with _write_lock:
+        conn = get_connection()
+        try:
+            cur = conn.cursor()
+            cur.execute("BEGIN IMMEDIATE")
+            cur.execute(f"SELECT vec_row FROM chunks WHERE {where} AND vec_row IS NOT NULL", (file_path, watermark))
+            old_rows = [r for (r,) in cur.fetchall()]
+            _delete_chunks(cur, where, (file_path, watermark))
+            if content_hash is not None:
+                cur.execute("UPDATE documents SET content_hash = ? WHERE file_path = ?", (content_hash, file_path))
+            else:
+                # a first ingest that failed leaves no empty document behind
+                cur.execute("DELETE FROM documents WHERE file_path = ? AND content_hash IS NULL AND NOT EXISTS "
+                            "(SELECT 1 FROM chunks WHERE document_id = documents.id)", (file_path,))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    _sync_index_rows(old_rows)
+    _bump_corpus_version()
+
+def finish_document(file_path, watermark, content_hash):
+    """
+    End a re-ingest that appended the new version's chunks (replace=False)
+    after `watermark` (get_document_watermark before the first batch): the
+    previous version's chunks are dropped and `content_hash` recorded in one
+    transaction. Until then the old chunks stay, so every batch reuses their
+    vectors by hash.
+    """
+    _drop_document_chunks(file_path, "<=", watermark, content_hash)
+
+def abort_document(file_path, watermark):
+    """Drop the chunks a failed re-ingest appended after `watermark`; the previous version stays."""
+    _drop_document_chunks(file_path, ">", watermark)
+
+def storage_stats():
+    """Vector rows (live = pointed at by a chunk, dead = reclaimable) and free SQLite pages."""
+    store = get_vector_store()
+    with get_connection() as conn:
+        live = conn.execute("SELECT COUNT(DISTINCT vec_row) FROM chunks WHERE vec_row IS NOT NULL").fetchone()[0]
+        pages = conn.execute("PRAGMA page_count").fetchone()[0]
+        free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    rows = len(store) if store is not None else 0
+    return {"vector_rows": rows, "live_rows": live, "dead_rows": rows - live,
+            "db_pages": pages, "free_pages": free}
+
+def _remove_files(paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            # e.g. still memory-mapped on Windows; removed on the next start
+            print(f"[DB Error] could not remove {path}: {e}")
+
+# vector files (and their code files) other than the current one, e.g. left by compaction
+def _remove_stale_vector_files():
+    with get_connection() as conn:
+        if _get_meta(conn.cursor(), "vector_file") is None:
+            return
+        current = _vectors_path(conn.cursor())
+    base = os.path.splitext(DB_PATH)[0] + ".vectors"
+    _remove_files(path for path in glob.glob(glob.escape(base) + "*")
+                  if path != current and not path.startswith(current + "."))
+
+def _drop_vector_store():
+    global _vector_store
+    with _vector_store_lock:
+        _vector_store = None
+    invalidate_vector_index()
+
+def _rewrite_vectors(store, live):
+    """Copy the `live` rows to a new vector file and renumber chunks.vec_row in one transaction."""
+    generation = uuid.uuid4().hex
+    path = os.path.splitext(DB_PATH)[0] + f".vectors.{generation[:12]}.f32"
+    matrix = store.matrix()
+    with open(path, "wb") as f:
+        for start in range(0, len(live), 65536):
+            np.asarray(matrix[live[start:start + 65536]]).tofile(f)
+        f.flush()
+        os.fsync(f.fileno())
+
+    # the switch to the new file is the commit below; until then the old file stays valid
+    conn = get_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute("BEGIN IMMEDIATE")
+        cur.execute("CREATE TEMP TABLE IF NOT EXISTS vec_map (old INTEGER PRIMARY KEY, new INTEGER)")
+        cur.execute("DELETE FROM vec_map")
+        cur.executemany("INSERT INTO vec_map (old, new) VALUES (?, ?)", zip(live.tolist(), range(len(live))))
+        cur.execute("""
+            UPDATE chunks SET vec_row = (SELECT new FROM vec_map WHERE old = chunks.vec_row)
+            WHERE vec_row IS NOT NULL
+        """)
+        cur.execute("DELETE FROM vec_map")
+        _set_meta(cur, "vector_file", os.path.basename(path))
+        _set_meta(cur, "vector_generation", generation)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        _remove_files([path])
+        raise
+    _drop_vector_store()
+    _remove_stale_vector_files()
+
+def _vacuum():
+    try:
+        get_connection().execute("VACUUM")
+    except sqlite3.OperationalError as e:
+        print(f"[DB Error] VACUUM skipped: {e}")
+
+@timed("db.compact")
+def compact(vacuum=True):
+    """
+    Reclaim the space of deleted documents: rewrite the vector file
+    without dead rows (chunks are renumbered, the loaded index and IVF
+    lists are rebuilt on next use), then VACUUM the SQLite file.
+    """
+    with _write_lock:
+        store = get_vector_store()
+        reclaimed = 0
+        if store is not None:
+            with get_connection() as conn:
+                live = np.array([r for (r,) in conn.execute(
+                    "SELECT DISTINCT vec_row FROM chunks WHERE vec_row IS NOT NULL ORDER BY vec_row"
+                )], dtype=np.int64)
+            reclaimed = len(store) - len(live)
+            if reclaimed:
+                _rewrite_vectors(store, live)
+        if vacuum:
+            _vacuum()
+    return {"reclaimed_rows": reclaimed, **storage_stats()}
+
+def maybe_compact(dead_ratio=COMPACT_DEAD_RATIO):
+    """Compact once dead vector rows or free DB pages reach `dead_ratio`; returns compact()'s stats or None."""
+    stats = storage_stats()
+    dead = stats["dead_rows"] / stats["vector_rows"] if stats["vector_rows"] else 0.0
+    free = stats["free_pages"] / stats["db_pages"] if stats["db_pages"] else 0.0
+    if dead < dead_ratio and free < dead_ratio:
+        return None
+    return compact()
+
+def start_compactor(interval=COMPACT_INTERVAL):
+    """Background thread running maybe_compact() every `interval` seconds (0 disables it)."""
+    if interval <= 0:
+        return None
+
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                maybe_compact()
+            except Exception as e:
+                print(f"[DB Error] compaction failed: {e}")
+
+    thread = threading.Thread(target=run, name="db-compactor", daemon=True)
+    thread.start()
+    return thread
+
+def clear_all():
+    """Delete every document, chunk and vector, and shrink the DB file."""
+    with _write_lock:
+        with get_connection() as conn:
+            cur = conn.cursor()
+            if _fts_enabled(cur):
+                cur.execute("INSERT INTO chunks_fts (chunks_fts) VALUES ('delete-all')")
+            cur.execute("DELETE FROM chunks")
+            cur.execute("DELETE FROM documents")
+            cur.execute("DELETE FROM meta WHERE key IN ('vector_dim', 'vector_file', 'vector_generation')")
+        _drop_vector_store()
+        # the vector files, and the IVF lists built over them (retriever.IVF_PATH)
+        base = os.path.splitext(DB_PATH)[0]
+        _remove_files(glob.glob(glob.escape(base + ".vectors") + "*") + glob.glob(glob.escape(base + ".ivf.npz") + "*"))
+        _vacuum()
+
+# load the vector index: a memmap over the store plus a row -> chunk id map
+@timed("db.load_vector_index")
+def load_vector_index():
+    store = get_vector_store()
+    if store is None:
+        # nothing saved yet; an empty index stands in until the first save
+        return VectorIndex()
+    ids = np.full(len(store), -1, dtype=np.int64)
+    with get_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT id, vec_row FROM chunks WHERE vec_row IS NOT NULL")
+        while True:
+            rows = cur.fetchmany(65536)
+            if not rows:
+                break
+            chunk_ids, vec_rows = np.array(rows, dtype=np.int64).T
+            ids[vec_rows] = chunk_ids
+    return MappedVectorIndex(store, ids, candidates=COARSE_CANDIDATES)
+
+# shared index, loaded on first use
+def get_vector_index():
+    global _vector_index
+    if _vector_index is None:
+        with _vector_index_lock:
+            if _vector_index is None:
+                _vector_index = load_vector_index()
+    return _vector_index
+
+# drop the loaded index (call after deleting chunks); reloaded on next use
+def invalidate_vector_index():
+    global _vector_index
+    with _vector_index_lock:
+        _vector_index = None
+    _bump_corpus_version()
+
+def _bump_corpus_version():
+    global _corpus_version
+    _corpus_version += 1
+
+# changes whenever documents are saved or deleted
+def corpus_version():
+    return _corpus_version
 
 # export database to JSON
 def export_to_json(json_path="database.json"):
     with get_connection() as conn:
         cur = conn.cursor()
         cur.execute("""
-            SELECT d.file_path, c.chunk_text, e.vector
+            SELECT d.file_path, c.chunk_text, c.vec_row, c.page, c.slide, c.row_start, c.row_end
             FROM documents d
             JOIN chunks c ON d.id = c.document_id
-            JOIN embeddings e ON c.id = e.chunk_id
+            WHERE c.vec_row IS NOT NULL
         """)
         rows = cur.fetchall()
 
+    matrix = get_vector_store().matrix() if rows else None
     data = [
         {
             "file_path": file_path,
             "chunk_text": chunk_text,
-            "vector": np.frombuffer(vec, dtype=np.float32).tolist()
+            # only the location fields known for this chunk
+            **{k: v for k, v in zip(LOCATION_COLUMNS, location) if v is not None},
+            "vector": matrix[vec_row].tolist()
         }
-        for file_path, chunk_text, vec in rows
+        for file_path, chunk_text, vec_row, *location in rows
     ]
 
     with open(json_path, "w", encoding="utf-8") as f:
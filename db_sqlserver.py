@@ -1,7 +1,15 @@
-import pyodbc
+import sqlite3
 import pandas as pd
+from config import SQL_BACKEND, SQL_SQLITE_PATH, SQL_POOL_SIZE, SQL_POOL_TIMEOUT, SQL_POOL_IDLE_TIMEOUT
+from pool import ConnectionPool
+from metrics import timed
 
-def get_connection():
+def _connect():
+    # local SQLite stand-in (for testing without SQL Server)
+    if SQL_BACKEND == "sqlite":
+        return sqlite3.connect(SQL_SQLITE_PATH, check_same_thread=False)
+
+    import pyodbc
     conn = pyodbc.connect(
         'DRIVER={SQL Server};'
         'SERVER=DESKTOP-MA33VD7\AHMED;'
@@ -10,14 +18,33 @@ def get_connection():
         )
     return conn
 
+# shared, bounded pool (see pool.get_pool_metrics() for sizing)
+_pool = ConnectionPool(
+    "sqlserver", _connect,
+    max_size=SQL_POOL_SIZE, timeout=SQL_POOL_TIMEOUT, idle_timeout=SQL_POOL_IDLE_TIMEOUT
+)
+
+# checkout a pooled connection: `with get_connection() as conn: ...` (returned to the pool on exit)
+def get_connection():
+    return _pool.connection()
+
+# close the idle pooled connections (at shutdown)
+def close_pool():
+    _pool.close_all()
+
+@timed("sql.fetch_data")
 def fetch_data(query):
-    conn = get_connection()
-    df = pd.read_sql(query, conn)
+    with get_connection() as conn:
+        df = pd.read_sql(query, conn)
 
     return df
 
 # ================== Get All Tables ==================
 def get_all_tables():
+    if SQL_BACKEND == "sqlite":
+        query = "SELECT name AS TABLE_NAME FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'"
+        return fetch_data(query)["TABLE_NAME"].tolist()
+
     query = """
     SELECT TABLE_NAME 
     FROM INFORMATION_SCHEMA.TABLES 
@@ -26,12 +53,22 @@ def get_all_tables():
     df = fetch_data(query)
     return df["TABLE_NAME"].tolist()
 
+# ================== Change Signature ==================
+def get_table_signature(table):
+    """Cheap fingerprint of a table's contents; changes when rows are added, removed or updated."""
+    if SQL_BACKEND == "sqlite":
+        # the stand-in only tracks inserts/deletes (row count + max rowid)
+        query = f"SELECT COUNT(*) AS n, MAX(rowid) AS max_id FROM [{table}]"
+    else:
+        query = f"SELECT COUNT_BIG(*) AS n, CHECKSUM_AGG(BINARY_CHECKSUM(*)) AS chk FROM [{table}]"
+    return tuple(fetch_data(query).iloc[0].tolist())
+
 # read data from conn
 def get_students():
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM Students")
-    rows = cursor.fetchall()
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM Students")
+        rows = cursor.fetchall()
 
     #for row in rows:
     #    print(row)
@@ -43,16 +80,16 @@ def get_courses():
     print(fetch_data("SELECT * FROM Courses"))
 
 def create_table():
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        """
-        CREATE TABLE Names (
-        name VARCHAR(50),
-        name_id INT PRIMARY KEY
-        )
-        """)
-    conn.commit()
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            CREATE TABLE Names (
+            name VARCHAR(50),
+            name_id INT PRIMARY KEY
+            )
+            """)
+        conn.commit()
     print("Table 'Names' created successfully.")
 
 
@@ -0,0 +1,167 @@
+# modules
+import time
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import Future
+import numpy as np
+from models import embedding_model
+from metrics import observe
+from config import EMBED_MAX_BATCH, EMBED_MAX_WAIT_MS
+
+# request priorities: chat queries go before bulk (ingest) work
+INTERACTIVE = 0
+BULK = 1
+
+
+class _Request:
+    """One encode call; its texts may be split into several slices."""
+
+    def __init__(self, texts, n_slices):
+        self.texts = texts
+        self.vectors = [None] * len(texts)
+        self.remaining = n_slices
+        self.future = Future()
+
+
+# ------------------------
+# Micro-batching embedding service
+# ------------------------
+class EmbeddingService:
+    """
+    Runs every encode of the (lazily loaded) embedding model on one worker thread.
+    Interactive texts that arrive within `max_wait` seconds of each other
+    are encoded together in one forward pass (up to `max_batch` texts);
+    bulk requests are cut into slices and only run when no interactive
+    request is waiting, so an upload can't starve chat queries.
+    """
+
+    def __init__(self, model, max_batch=EMBED_MAX_BATCH, max_wait=EMBED_MAX_WAIT_MS / 1000):
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queues = {INTERACTIVE: deque(), BULK: deque()}  # (request, start, end)
+        self._cond = threading.Condition()
+        self._stats = {"batches": 0, "texts": 0, "interactive_texts": 0, "bulk_texts": 0, "seconds": 0.0}
+        self._worker = threading.Thread(target=self._run, name="embedding-service", daemon=True)
+        self._worker.start()
+
+    # -- callers --
+    def submit(self, texts, priority=INTERACTIVE, batch_size=None):
+        """Queue `texts` (list of str); returns a Future of their vectors (2-D array)."""
+        texts = list(texts)
+        step = max(1, min(batch_size or self.max_batch, self.max_batch))
+        slices = [(start, min(start + step, len(texts))) for start in range(0, len(texts), step)]
+        request = _Request(texts, len(slices))
+        if not slices:
+            request.future.set_result(np.zeros((0, 0), dtype=np.float32))
+            return request.future
+        with self._cond:
+            self._queues[priority].extend((request, start, end) for start, end in slices)
+            self._cond.notify()
+        return request.future
+
+    def encode(self, sentences, priority=INTERACTIVE, batch_size=None, **kwargs):
+        """Drop-in for SentenceTransformer.encode (numpy output): str -> 1-D, list -> 2-D."""
+        single = isinstance(sentences, str)
+        vectors = self.submit([sentences] if single else sentences, priority, batch_size).result()
+        return vectors[0] if single else vectors
+
+    async def aencode(self, sentences, priority=INTERACTIVE):
+        single = isinstance(sentences, str)
+        vectors = await asyncio.wrap_future(self.submit([sentences] if single else sentences, priority))
+        return vectors[0] if single else vectors
+
+    def client(self, priority):
+        """An object with `.encode` that submits at `priority` (e.g. ingest.model)."""
+        return EmbeddingClient(self, priority)
+
+    def stats(self):
+        with self._cond:
+            return dict(self._stats, queued_interactive=len(self._queues[INTERACTIVE]),
+                        queued_bulk=len(self._queues[BULK]))
+
+    # -- worker --
+    def _pending(self, queue):
+        return sum(end - start for _, start, end in queue)
+
+    def _next_batch(self):
+        with self._cond:
+            while not self._queues[INTERACTIVE] and not self._queues[BULK]:
+                self._cond.wait()
+            interactive = self._queues[INTERACTIVE]
+            if not interactive:
+                return [self._queues[BULK].popleft()], BULK
+
+            # give other queries a moment to join the batch
+            deadline = time.monotonic() + self.max_wait
+            while self._pending(interactive) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            batch, size = [], 0
+            while interactive and size + interactive[0][2] - interactive[0][1] <= self.max_batch:
+                item = interactive.popleft()
+                batch.append(item)
+                size += item[2] - item[1]
+            return batch, INTERACTIVE
+
+    def _run(self):
+        while True:
+            batch, priority = self._next_batch()
+            # skip the rest of a request that already failed
+            batch = [item for item in batch if not item[0].future.done()]
+            if not batch:
+                continue
+            texts = [text for request, start, end in batch for text in request.texts[start:end]]
+            started = time.perf_counter()
+            try:
+                vectors = np.asarray(self.model.encode(texts, batch_size=len(texts), convert_to_numpy=True))
+            except Exception as e:
+                for request, _, _ in batch:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+                continue
+
+            seconds = time.perf_counter() - started
+            # one histogram per priority: query batches vs bulk (ingest) slices
+            observe("embed.interactive" if priority == INTERACTIVE else "embed.bulk", seconds)
+            with self._cond:
+                self._stats["batches"] += 1
+                self._stats["texts"] += len(texts)
+                self._stats["interactive_texts" if priority == INTERACTIVE else "bulk_texts"] += len(texts)
+                self._stats["seconds"] += seconds
+
+            offset = 0
+            for request, start, end in batch:
+                request.vectors[start:end] = vectors[offset:offset + end - start]
+                offset += end - start
+                request.remaining -= 1
+                if request.remaining == 0:
+                    request.future.set_result(np.vstack(request.vectors))
+
+
+class EmbeddingClient:
+    """SentenceTransformer-like view of the service at a fixed priority."""
+
+    def __init__(self, service, priority):
+        self.service = service
+        self.priority = priority
+
+    def encode(self, sentences, batch_size=None, **kwargs):
+        return self.service.encode(sentences, self.priority, batch_size)
+
+
+# one service per process, shared by chat and ingest
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_embedding_service():
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = EmbeddingService(embedding_model)
+        return _service
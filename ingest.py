@@ -1,143 +1,386 @@
 # modules
 import os
-from PyPDF2 import PdfReader
-from pptx import Presentation
-import docx
-import pandas as pd
-import pytesseract
-from PIL import Image
-from sentence_transformers import SentenceTransformer
+import time
+import queue
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 import database
-from config import MODEL_NAME
-
-database.init_db()
-
-model = SentenceTransformer(MODEL_NAME)
-
-# read .pdf
-def read_pdf(file_path):
-    reader = PdfReader(file_path)
-    text = []
-    for page in reader.pages:
-        page_text = page.extract_text()
-        if page_text:  # make sure it's not None
-            text.append(page_text.strip())
-    return " ".join(text)
-
-# read .pptx
-def read_pptx(file_path):
-    prs = Presentation(file_path)
-    text = []
-    for slide in prs.slides:
-        for shape in slide.shapes:
-            if shape.has_text_frame:  # check if shape contains text
-                for paragraph in shape.text_frame.paragraphs:
-                    for run in paragraph.runs:
-                        text.append(run.text.strip())
-    return " ".join(text).strip()
-
-# read .txt
-def read_txt(file_path):
-    text = []
-    with open(file_path, "r", encoding="utf-8") as file:
-        for line in file:
-            if line.strip():  # skip empty lines
-                text.append(line.strip())
-    return " ".join(text)
-
-# read .docx
-def read_docx(file_path):
-    doc = docx.Document(file_path)
-    text = []
-    for para in doc.paragraphs:
-        if para.text.strip():  # skip empty paragraphs
-            text.append(para.text.strip())
-    return " ".join(text)
-
-# read excel_file .csv or xlsx
-def read_excel(file_path):
-    if file_path.endswith(".csv"):
-        df = pd.read_csv(file_path)
-    elif file_path.endswith((".xlsx", ".xls")):
-        df = pd.read_excel(file_path)
-    else:
-        raise ValueError("Unsupported file format. Use .csv, .xlsx, or .xls")
-
-    text = []
-    for _, row in df.iterrows():
-        # Convert all values in the row to strings and join them
-        row_text = " ".join(str(value).strip() for value in row if pd.notna(value))
-        text.append(row_text)
-    
-    return " ".join(text)
-
-# read image
-def read_image(file_path, lang="eng"):
-    img = Image.open(file_path)
-    text = pytesseract.image_to_string(img, lang=lang)
-    return " ".join(text.split()) # clean up extra whitespace and return
-
-# chunks
-def chunk_text(text, chunk_size=150):
-    """Split text into chunks of up to `chunk_size` words (not characters)."""
-    words = text.split()
-    chunks = []
-    for i in range(0, len(words), chunk_size):
-        chunk = " ".join(words[i:i + chunk_size])
-        chunks.append(chunk)
-    return chunks
+import retriever
+from embedding import get_embedding_service, BULK
+from metrics import observe, timed, recording
+from config import INGEST_WORKERS, EMBED_BATCH_SIZE, INGEST_QUEUE_SIZE, INGEST_CHUNK_BATCH
+from chunker import chunk_batches
+from readers import iter_segments
+
+# shared embedding service, behind chat queries
+model = get_embedding_service().client(BULK)
+
+# tables are created on the first ingest, not at import
+_db_ready = False
+
+def _ensure_db():
+    global _db_ready
+    if not _db_ready:
+        database.init_db()
+        _db_ready = True
+
+# chunk hashes and the indices of chunks whose vectors are not stored (or being embedded) yet
+def plan_embeddings(chunks, in_flight=()):
+    chunk_hashes = [database.hash_text(chunk) for chunk in chunks]
+    known = database.get_vec_rows_by_hash(chunk_hashes)
+    first = {}
+    for i, chunk_hash in enumerate(chunk_hashes):
+        if chunk_hash not in known and chunk_hash not in in_flight:
+            first.setdefault(chunk_hash, i)
+    return chunk_hashes, list(first.values())
+
+# read + chunk a file as a stream of (chunks, locations) batches
+def chunk_file(file_path, chunk_size):
+    return chunk_batches(iter_segments(file_path), chunk_size, batch_size=INGEST_CHUNK_BATCH)
+
+# chunk_file, timed as read.<ext> and ingest.read (reading and chunking only, not the caller's work on each batch)
+def _timed_batches(file_path, chunk_size):
+    stage = "read." + (os.path.splitext(file_path)[1].lower().lstrip(".") or "unknown")
+    batches = chunk_file(file_path, chunk_size)
+    busy = 0.0
+    while True:
+        start = time.perf_counter()
+        batch = next(batches, None)
+        busy += time.perf_counter() - start
+        if batch is None:
+            break
+        yield batch
+    observe(stage, busy)
+    observe("ingest.read", busy)
+
+# embed the batch's new chunks and save it next to the document's previous chunks
+def _save_batch(file_path, chunks, locations):
+    chunk_hashes, embed_idx = plan_embeddings(chunks)
+    vectors = [None] * len(chunks)
+    if embed_idx:
+        encoded = model.encode([chunks[i] for i in embed_idx], batch_size=32, show_progress_bar=True)
+        for i, vector in zip(embed_idx, encoded):
+            vectors[i] = vector
+    _, _, stats = database.save_document(file_path, chunks, vectors, None, chunk_hashes, locations, replace=False)
+    return stats
+
+# a failed re-ingest keeps the previous version: drop the chunks it appended
+def _abort(file_path, watermark):
+    try:
+        database.abort_document(file_path, watermark)
+    except Exception as e:
+        print(f"[DB Error] {e}")
+
+def _add_stats(total, stats):
+    if total is None:
+        return dict(stats)
+    total = {key: total[key] + stats[key] for key in ("rows", "embedded", "seconds")}
+    total["rows_per_sec"] = total["rows"] / total["seconds"] if total["seconds"] else 0.0
+    return total
 
 # ingest file
+@timed("ingest.file")
 def ingest_file(file_path, chunk_size):
     """
-    Read file at file_path, create chunks, embed and save to DB.
+    Read file at file_path, create chunks of up to `chunk_size` tokens, embed and save to DB.
+    The file is read, chunked and saved in batches, so memory stays bounded for large files.
     IMPORTANT: this function DOES NOT copy the file - it expects the file is already at file_path.
     """
     if not os.path.exists(file_path):
         raise FileNotFoundError(file_path)
+    _ensure_db()
+
+    # unchanged files are skipped entirely
+    content_hash = database.hash_file(file_path)
+    if content_hash == database.get_document_hash(file_path):
+        return f"{file_path} unchanged, skipped."
 
-    ext = os.path.splitext(file_path)[1].lower()
-    readers = {
-        ".pdf": read_pdf,
-        ".pptx": read_pptx,
-        ".txt": read_txt,
-        ".docx": read_docx,
-        ".csv": read_excel,
-        ".xlsx": read_excel,
-        ".xls": read_excel,
-    }
-
-    if ext in readers:
-        text = readers[ext](file_path)
-    elif ext in [".png", ".jpg", ".jpeg", ".tiff", ".bmp"]:
-        text = read_image(file_path)
-    else:
-        raise ValueError(f"Unsupported file type: {ext}")
-
-    chunks = chunk_text(text, chunk_size)
-    if not chunks:
+    # only chunks whose hash is not stored yet are embedded; the previous
+    # version's chunks stay (and share their vectors) until the last batch is saved
+    watermark = database.get_document_watermark(file_path)
+    stats = None
+    try:
+        for chunks, locations in _timed_batches(file_path, chunk_size):
+            stats = _add_stats(stats, _save_batch(file_path, chunks, locations))
+    except Exception:
+        _abort(file_path, watermark)
+        raise
+    if stats is None:
         return f"No text found in {file_path}"
+    # hash recorded with the swap: a file interrupted half-way is re-ingested next time
+    database.finish_document(file_path, watermark, content_hash)
+    retriever.update_retriever()
+
+    return _ingested_message(file_path, stats)
+
+def _ingested_message(file_path, stats):
+    return (f"{file_path} ingested with {stats['rows']} chunks, {stats['embedded']} newly embedded "
+            f"({stats['rows_per_sec']:.0f} rows/s).")
+
+# outcome of one file in a pipeline run; status is done | skipped | empty | failed,
+# seconds is the time from submitting the file to its result (None when it was never read)
+def _result(file_path, status, message, stats=None):
+    return {"file_path": file_path, "status": status, "message": message, "stats": stats, "seconds": None}
+
+# ------------------------
+# Parallel ingest pipeline
+# ------------------------
+_reader_pool = None
+_manager = None
+_reader_pool_lock = threading.Lock()
+_DONE = object()
+
+def _get_reader_pool():
+    """Long-lived process pool for the CPU-bound parsers, OCR and chunking (+ a manager for its queues)."""
+    global _reader_pool, _manager
+    with _reader_pool_lock:
+        if _manager is None:
+            _manager = multiprocessing.Manager()
+        if _reader_pool is None:
+            _reader_pool = ProcessPoolExecutor(max_workers=INGEST_WORKERS)
+    return _reader_pool, _manager
+
+def _replace_reader_pool(broken):
+    """A pool whose worker process died (BrokenProcessPool) takes no more work: start a new one."""
+    global _reader_pool
+    with _reader_pool_lock:
+        if _reader_pool is broken:
+            _reader_pool = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+# (future, pool) of a _read_worker call
+def _submit_read(file_path, chunk_size, out_q):
+    pool, _ = _get_reader_pool()
+    try:
+        return pool.submit(_read_worker, file_path, chunk_size, out_q), pool
+    except BrokenProcessPool:
+        _replace_reader_pool(pool)
+        pool, _ = _get_reader_pool()
+        return pool.submit(_read_worker, file_path, chunk_size, out_q), pool
+
+def _read_worker(file_path, chunk_size, out_q):
+    """
+    Reader process: stream the file's chunk batches to the parent through
+    the bounded `out_q`. "done" carries the (stage, seconds) timed here
+    (read.<ext>, ingest.read, ocr.page; time blocked on the queue
+    excluded) for the parent to record, as its histograms don't see this
+    process.
+    """
+    try:
+        with recording() as samples:
+            for chunks, locations in _timed_batches(file_path, chunk_size):
+                out_q.put(("chunks", file_path, chunks, locations))
+    except Exception as e:
+        out_q.put(("error", file_path, str(e), None))
+        return
+    out_q.put(("done", file_path, samples, None))
+
+def _embed_stage(in_q, out_q, batch_size):
+    """
+    Encode chunks batched across files. Batches are passed on in arrival order,
+    so a chunk shared with an earlier batch is always saved by that batch first.
+    """
+    pending = []  # (batch job, chunk index) waiting to be encoded
+    jobs = deque()  # batches not yet passed on, in arrival order
+
+    def flush():
+        while jobs and jobs[0]["remaining"] == 0:
+            out_q.put(jobs.popleft())
+
+    done = False
+    while not done or pending:
+        # block only when there is nothing to encode, and never on a job
+        # that is ready (nothing to embed, control jobs)
+        if not pending:
+            flush()
+        try:
+            item = in_q.get(block=not pending)
+        except queue.Empty:
+            item = None
+        if item is _DONE:
+            done = True
+        elif item is not None:
+            item["vectors"] = [None] * len(item["chunks"])
+            item["remaining"] = len(item["embed_idx"])
+            jobs.append(item)
+            pending.extend((item, i) for i in item["embed_idx"])
+            if item["embed_idx"] and len(pending) < batch_size and not done:
+                continue
+
+        batch, pending = pending[:batch_size], pending[batch_size:]
+        if batch:
+            try:
+                vectors = model.encode([job["chunks"][i] for job, i in batch], batch_size=batch_size)
+            except Exception as e:
+                for job, _ in batch:
+                    job["error"] = e
+                vectors = [None] * len(batch)
+            for (job, i), vector in zip(batch, vectors):
+                job["vectors"][i] = vector
+                job["remaining"] -= 1
+        flush()
+    out_q.put(_DONE)
+
+# chunks a batch left to an earlier batch's copy (in flight in this run) whose
+# vector was never stored, because that batch failed: embed them here instead
+def _fill_missing_vectors(job):
+    missing = [i for i, vector in enumerate(job["vectors"]) if vector is None]
+    if not missing:
+        return
+    known = database.get_vec_rows_by_hash([job["chunk_hashes"][i] for i in missing])
+    lost = {}
+    for i in missing:
+        if job["chunk_hashes"][i] not in known:
+            lost.setdefault(job["chunk_hashes"][i], i)
+    if lost:
+        encoded = model.encode([job["chunks"][i] for i in lost.values()], batch_size=EMBED_BATCH_SIZE)
+        for i, vector in zip(lost.values(), encoded):
+            job["vectors"][i] = vector
+
+def _write_stage(in_q, results):
+    """
+    Save each batch in one bulk transaction next to the file's previous
+    chunks; once its last batch is saved, swap out the previous version
+    and report the file.
+    """
+    files = {}  # file_path -> {"stats", "failed"}
+    while True:
+        job = in_q.get()
+        if job is _DONE:
+            break
+        file_path = job["file_path"]
+        state = files.setdefault(file_path, {"stats": None, "failed": False})
+        if state["failed"]:
+            continue
+        try:
+            if "error" in job:
+                raise job["error"]
+            if job["last"]:
+                if state["stats"] is None:
+                    results.put(_result(file_path, "empty", f"No text found in {file_path}"))
+                else:
+                    database.finish_document(file_path, job["watermark"], job["content_hash"])
+                    results.put(_result(file_path, "done", _ingested_message(file_path, state["stats"]),
+                                        state["stats"]))
+                del files[file_path]
+                continue
+            _fill_missing_vectors(job)
+            _, _, stats = database.save_document(
+                file_path, job["chunks"], job["vectors"], None, job["chunk_hashes"], job["locations"], replace=False
+            )
+            state["stats"] = _add_stats(state["stats"], stats)
+        except Exception as e:
+            state["failed"] = True
+            _abort(file_path, job["watermark"])
+            results.put(_result(file_path, "failed", f"[ingest error] {os.path.basename(file_path)}: {e}"))
+    retriever.update_retriever()
+    # one writer thread per run: its SQLite connection goes with it
+    database.close_connection()
+    results.put(_DONE)
+
+def ingest_results(file_paths, chunk_size):
+    """
+    Ingest several files through a staged pipeline and yield one result
+    (see _result) per file as it finishes: parsers/OCR and the chunker run in a
+    process pool and stream chunk batches back through a bounded queue, a
+    single embedding stage batches chunks across files and a writer thread
+    saves each batch in one transaction. Memory stays bounded by the queue
+    sizes, not by the size of the files.
+    """
+    _ensure_db()
+    embed_q = queue.Queue(maxsize=INGEST_QUEUE_SIZE)
+    write_q = queue.Queue(maxsize=INGEST_QUEUE_SIZE)
+    results = queue.Queue()
+    threading.Thread(target=_embed_stage, args=(embed_q, write_q, EMBED_BATCH_SIZE), daemon=True).start()
+    threading.Thread(target=_write_stage, args=(write_q, results), daemon=True).start()
+
+    submitted = {}  # file -> submit time, for the per-file duration
+
+    def drain(until_done=False):
+        """Yield the results so far (or, at the end, all of them until the writer is done)."""
+        while True:
+            try:
+                result = results.get() if until_done else results.get_nowait()
+            except queue.Empty:
+                return
+            if result is _DONE:
+                return
+            started = submitted.pop(result["file_path"], None)
+            if started is not None:
+                result["seconds"] = time.perf_counter() - started
+                observe("ingest.file", result["seconds"])
+            yield result
+
+    def control_job(file_path, **fields):
+        # passes through the embed stage in order, after the file's batches
+        return dict(dict(file_path=file_path, chunks=[], embed_idx=[], last=False,
+                         watermark=watermarks[file_path]), **fields)
+
+    _, manager = _get_reader_pool()
+    chunk_q = manager.Queue(maxsize=INGEST_QUEUE_SIZE)
+    futures = {}
+    content_hashes = {}
+    watermarks = {}  # file -> its newest chunk id before this run (see database.finish_document)
+    for file_path in dict.fromkeys(file_paths):
+        if not os.path.exists(file_path):
+            results.put(_result(file_path, "failed", f"[ingest error] {os.path.basename(file_path)}: file not found"))
+            continue
+        # unchanged files are skipped before parsing
+        content_hash = database.hash_file(file_path)
+        if content_hash == database.get_document_hash(file_path):
+            results.put(_result(file_path, "skipped", f"{file_path} unchanged, skipped."))
+            continue
+        content_hashes[file_path] = content_hash
+        watermarks[file_path] = database.get_document_watermark(file_path)
+        submitted[file_path] = time.perf_counter()
+        future, pool = _submit_read(file_path, chunk_size, chunk_q)
+        futures[future] = (file_path, pool)
+
+    yield from drain()
+    reading = set(content_hashes)
+    in_flight = set()  # chunk hashes already queued for embedding in this run
+    while reading:
+        try:
+            kind, file_path, chunks, locations = chunk_q.get(timeout=1.0)
+        except queue.Empty:
+            # a reader process that died never reports back
+            for future, (file_path, pool) in futures.items():
+                if file_path in reading and future.done() and future.exception() is not None:
+                    reading.discard(file_path)
+                    embed_q.put(control_job(file_path, error=future.exception()))
+                    if isinstance(future.exception(), BrokenProcessPool):
+                        _replace_reader_pool(pool)
+            yield from drain()
+            continue
+
+        if kind == "chunks":
+            try:
+                chunk_hashes, embed_idx = plan_embeddings(chunks, in_flight)
+                in_flight.update(chunk_hashes[i] for i in embed_idx)
+                job = dict(file_path=file_path, chunks=chunks, locations=locations, chunk_hashes=chunk_hashes,
+                           embed_idx=embed_idx, last=False, watermark=watermarks[file_path])
+            except Exception as e:
+                job = control_job(file_path, error=e)
+        elif kind == "error":
+            reading.discard(file_path)
+            job = control_job(file_path, error=ValueError(chunks))
+        else:
+            reading.discard(file_path)
+            # durations timed in the reader process
+            for stage, seconds in chunks:
+                observe(stage, seconds)
+            job = control_job(file_path, last=True, content_hash=content_hashes[file_path])
+        # blocks when the embedder is behind, bounding memory
+        embed_q.put(job)
+        yield from drain()
 
-    conn = database.get_connection()
-    cur = conn.cursor()
-    cur.execute("INSERT OR IGNORE INTO documents (file_path) VALUES (?)", (file_path,))
-    conn.commit()
-    cur.execute("SELECT id FROM documents WHERE file_path=?", (file_path,))
-    document_id = cur.fetchone()[0]
-    conn.close()
-
-    vectors = model.encode(chunks, batch_size=32, show_progress_bar=True)
-    database.save_chunks(document_id, chunks, vectors)
-    
-    # i = 1
-    # for chunk in chunks:
-    #     print(f"chunk {i}: ")
-    #     print(chunk)
-    #     i += 1
-
-    return f"{file_path} ingested with {len(chunks)} chunks."
+    embed_q.put(_DONE)
+    yield from drain(until_done=True)
 
 # main
 if __name__ == "__main__":
     sample = r"uploads/Session 1.pptx"
-    print(ingest_file(sample, chunk_size=150))
+    print(ingest_file(sample, chunk_size=512))
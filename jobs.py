@@ -0,0 +1,147 @@
+# modules
+import time
+import queue
+import threading
+import database
+from ingest import ingest_results
+from config import JOB_HISTORY
+
+# job states; files additionally end as "skipped" (unchanged) or "empty" (no text)
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+UNFINISHED = (QUEUED, RUNNING)
+
+
+# ------------------------
+# jobs / job_files tables
+# ------------------------
+def create_job(file_paths, chunk_size):
+    with database.get_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("INSERT INTO jobs (status, chunk_size, created_at) VALUES (?, ?, ?)",
+                    (QUEUED, chunk_size, time.time()))
+        job_id = cur.lastrowid
+        cur.executemany("INSERT INTO job_files (job_id, file_path, status) VALUES (?, ?, ?)",
+                        [(job_id, file_path, QUEUED) for file_path in file_paths])
+    return job_id
+
+def _set_job(job_id, **fields):
+    columns = ", ".join(f"{name} = ?" for name in fields)
+    with database.get_connection() as conn:
+        conn.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+def _set_file(job_id, file_path, **fields):
+    columns = ", ".join(f"{name} = ?" for name in fields)
+    with database.get_connection() as conn:
+        conn.execute(f"UPDATE job_files SET {columns} WHERE job_id = ? AND file_path = ?",
+                     (*fields.values(), job_id, file_path))
+
+def _fail_unfinished_files(job_id, message):
+    placeholders = ",".join("?" * len(UNFINISHED))
+    with database.get_connection() as conn:
+        conn.execute(f"UPDATE job_files SET status = ?, message = ? WHERE job_id = ? AND status IN ({placeholders})",
+                     (FAILED, message, job_id, *UNFINISHED))
+
+def unfinished_jobs():
+    """Ids of jobs a previous run queued or was running, oldest first."""
+    placeholders = ",".join("?" * len(UNFINISHED))
+    with database.get_connection() as conn:
+        rows = conn.execute(f"SELECT id FROM jobs WHERE status IN ({placeholders}) ORDER BY id",
+                            UNFINISHED).fetchall()
+    return [row[0] for row in rows]
+
+def get_jobs(job_ids=None, limit=JOB_HISTORY):
+    """The given jobs (default: the `limit` most recent), newest first, each with its files."""
+    with database.get_connection() as conn:
+        if job_ids is None:
+            rows = conn.execute("SELECT id, status, chunk_size, created_at, started_at, finished_at "
+                                "FROM jobs ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+        else:
+            placeholders = ",".join("?" * len(job_ids))
+            rows = conn.execute("SELECT id, status, chunk_size, created_at, started_at, finished_at "
+                                f"FROM jobs WHERE id IN ({placeholders}) ORDER BY id DESC",
+                                list(job_ids)).fetchall()
+        jobs = [dict(zip(("id", "status", "chunk_size", "created_at", "started_at", "finished_at"), row))
+                for row in rows]
+        for job in jobs:
+            files = conn.execute("SELECT file_path, status, chunks, embedded, seconds, message "
+                                 "FROM job_files WHERE job_id = ? ORDER BY id", (job["id"],)).fetchall()
+            job["files"] = [dict(zip(("file_path", "status", "chunks", "embedded", "seconds", "message"), f))
+                            for f in files]
+    return jobs
+
+
+# ------------------------
+# Background job queue
+# ------------------------
+class JobQueue:
+    """
+    Runs ingest jobs one at a time on a background thread (the pipeline
+    inside a job is already parallel). Every job and file state change is
+    written to the jobs/job_files tables, so callers poll instead of
+    waiting, and jobs left unfinished by a restart are picked up again on
+    `start()`; files finished before the restart are skipped by their
+    content hash.
+    """
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the worker (once) and re-queue unfinished jobs."""
+        with self._lock:
+            if self._worker is not None:
+                return
+            for job_id in unfinished_jobs():
+                self._queue.put(job_id)
+            self._worker = threading.Thread(target=self._run, name="ingest-jobs", daemon=True)
+            self._worker.start()
+
+    def submit(self, file_paths, chunk_size):
+        """Record a job for `file_paths` and queue it; returns the job id."""
+        self.start()
+        job_id = create_job(file_paths, chunk_size)
+        self._queue.put(job_id)
+        return job_id
+
+    def _run(self):
+        while True:
+            job_id = self._queue.get()
+            try:
+                self._run_job(job_id)
+            except Exception as e:
+                print(f"[Job Error] job {job_id}: {e}")
+                # files left queued/running would otherwise look in progress forever
+                _fail_unfinished_files(job_id, f"[ingest error] job failed: {e}")
+                _set_job(job_id, status=FAILED, finished_at=time.time())
+
+    def _run_job(self, job_id):
+        job = get_jobs([job_id])[0]
+        # files of a resumed job that were running are run again
+        file_paths = [f["file_path"] for f in job["files"] if f["status"] in UNFINISHED]
+        _set_job(job_id, status=RUNNING, started_at=time.time())
+        for file_path in file_paths:
+            _set_file(job_id, file_path, status=RUNNING)
+
+        failed = False
+        pending = set(file_paths)
+        for result in ingest_results(file_paths, job["chunk_size"]):
+            stats = result["stats"] or {}
+            _set_file(job_id, result["file_path"], status=result["status"], message=result["message"],
+                      chunks=stats.get("rows"), embedded=stats.get("embedded"), seconds=result["seconds"])
+            failed = failed or result["status"] == FAILED
+            pending.discard(result["file_path"])
+        # a file the pipeline never reported on
+        for file_path in pending:
+            _set_file(job_id, file_path, status=FAILED, message=f"[ingest error] {file_path}: no result")
+            failed = True
+        failed = failed or any(f["status"] == FAILED for f in job["files"])
+        _set_job(job_id, status=FAILED if failed else DONE, finished_at=time.time())
+
+
+# one queue per process, started by the app (or by the first submit)
+job_queue = JobQueue()
@@ -0,0 +1,86 @@
+# modules
+import time
+import asyncio
+from config import GEMINI_API_KEY, LLM_BACKEND, GEMINI_MODEL
+
+
+# ------------------------
+# Gemini
+# ------------------------
+class GeminiLLM:
+    """Google Gemini; `stream` / `astream` yield text pieces as they arrive."""
+
+    def __init__(self, model_name=GEMINI_MODEL, api_key=GEMINI_API_KEY):
+        import google.generativeai as genai
+        genai.configure(api_key=api_key)
+        self.model = genai.GenerativeModel(model_name)
+
+    def stream(self, prompt):
+        for chunk in self.model.generate_content(prompt, stream=True):
+            # safety-blocked or empty parts have no text
+            try:
+                text = chunk.text
+            except ValueError:
+                continue
+            if text:
+                yield text
+
+    async def astream(self, prompt):
+        response = await self.model.generate_content_async(prompt, stream=True)
+        async for chunk in response:
+            try:
+                text = chunk.text
+            except ValueError:
+                continue
+            if text:
+                yield text
+
+
+# ------------------------
+# Local fake (tests / load tests, no network)
+# ------------------------
+class FakeLLM:
+    """
+    Streams a canned answer word by word after `first_token_delay` seconds,
+    pausing `token_delay` between words. The answer echoes the question so
+    tests can tell responses apart.
+    """
+
+    def __init__(self, first_token_delay=0.2, token_delay=0.02, answer=None):
+        self.first_token_delay = first_token_delay
+        self.token_delay = token_delay
+        self.answer = answer
+
+    def _answer(self, prompt):
+        if self.answer is not None:
+            return self.answer
+        question = prompt.split("User's Question:", 1)[-1].split("**Output format:**", 1)[0].strip()
+        return f"This is a fake answer to: {question}"
+
+    def stream(self, prompt):
+        time.sleep(self.first_token_delay)
+        words = self._answer(prompt).split(" ")
+        for i, word in enumerate(words):
+            if i:
+                time.sleep(self.token_delay)
+            yield word if i == len(words) - 1 else word + " "
+
+    async def astream(self, prompt):
+        await asyncio.sleep(self.first_token_delay)
+        words = self._answer(prompt).split(" ")
+        for i, word in enumerate(words):
+            if i:
+                await asyncio.sleep(self.token_delay)
+            yield word if i == len(words) - 1 else word + " "
+
+
+BACKENDS = {
+    "gemini": GeminiLLM,
+    "fake": FakeLLM,
+}
+
+
+def get_llm(backend=LLM_BACKEND):
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown LLM backend: {backend}. Use one of {list(BACKENDS)}")
+    return BACKENDS[backend]()
@@ -1,72 +1,132 @@
 # modules
 from sqlalchemy import engine
+import asyncio
+import threading
 import database
-from sentence_transformers import SentenceTransformer, util
-import google.generativeai as genai
-from config import GEMINI_API_KEY, MODEL_NAME
-from db_sqlserver import fetch_data, get_all_tables
+import retriever
+from concurrent.futures import ThreadPoolExecutor
+from config import (
+    QUERY_CACHE_SIZE, QUERY_CACHE_TTL,
+    ANSWER_CACHE_SIZE, ANSWER_CACHE_TTL, ANSWER_CACHE_THRESHOLD,
+    EMBED_CONCURRENCY, DB_WORKERS, LLM_CONCURRENCY, CONTEXT_MAX_CHUNKS, RERANK_CANDIDATES,
+)
+from cache import LRUCache, SemanticAnswerCache, normalize_query, get_cache_stats
+from concurrency import Stage, get_stage_stats
+from embedding import get_embedding_service, BULK
+from models import embedding_model, tokenizer, reranker_model, get_model_stats
+from pool import get_pool_metrics
+from metrics import timed, timer, start_trace, in_context, register_collector, StreamTimer
+from context import ContextBudgeter
+from rerank import Reranker
+from sql_context import sql_context_cache, RowRetriever
 from prompts import system_prompt
+from llm import get_llm
 import pyttsx3
 import speech_recognition as sr
 
-# configure API
-genai.configure(api_key=GEMINI_API_KEY)
+# the embedding model loads once, on first use or in warm_up()
+# (queries are micro-batched by the shared embedding service)
+embedder = get_embedding_service()
+gemini = get_llm()
 
-# load models once
-embedder = SentenceTransformer(MODEL_NAME)
-gemini = genai.GenerativeModel("gemini-2.0-flash")
+# document and row retrieval run side by side
+_retrieval_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="retrieval")
+
+# async path: bounded threads + concurrency limit per stage
+embed_stage = Stage("embed", EMBED_CONCURRENCY)
+db_stage = Stage("db", DB_WORKERS, workers=DB_WORKERS)
+llm_stage = Stage("llm", LLM_CONCURRENCY)
+# pyttsx3 and the microphone are single devices
+audio_stage = Stage("audio", 1, workers=1)
+
+# top-k table rows per question (re-embeds only rows that changed, behind chat queries)
+row_retriever = RowRetriever(sql_context_cache, embedder.client(BULK).encode)
+
+# prompt size stays within PROMPT_TOKEN_BUDGET however many chunks/rows are retrieved
+budgeter = ContextBudgeter()
+# optional cross-encoder pass over the dense matches (RERANK_MODEL)
+reranker = Reranker()
+# chunks retrieved per question: extra candidates replace near-duplicates (and feed the re-ranker)
+DOC_CANDIDATES = max(2 * CONTEXT_MAX_CHUNKS, RERANK_CANDIDATES if reranker.enabled else 0)
+
+# caches: normalized question -> vector, and (question vector, context) -> answer
+query_vector_cache = LRUCache("query_vectors", QUERY_CACHE_SIZE, QUERY_CACHE_TTL)
+answer_cache = SemanticAnswerCache("answers", ANSWER_CACHE_SIZE, ANSWER_CACHE_TTL, ANSWER_CACHE_THRESHOLD)
+
+# counters of the app's pools, caches, stages and models, exported next to the stage timings
+register_collector("pool", get_pool_metrics)
+register_collector("cache", get_cache_stats)
+register_collector("stage", get_stage_stats)
+register_collector("model", get_model_stats)
+register_collector("embedding", embedder.stats)
+register_collector("context", budgeter.stats)
+register_collector("rerank", reranker.stats)
 
 # ------------------------
-# Search in DB
+# Startup
 # ------------------------
-def search_context(query, top_k=3):
+def _load_retriever():
     try:
-        chunks, vectors = database.get_chunks_and_vectors()
+        retriever.get_retriever()
     except Exception as e:
         print(f"[DB Error] {e}")
-        return []
 
-    if not chunks:
-        return []
+def warm_up():
+    """Load the embedding model, its tokenizer, the re-ranker, the vector index (retriever) and the table row index in background threads."""
+    threading.Thread(target=_load_retriever, name="warm-up-index", daemon=True).start()
+    row_retriever.warm_up()
+    tokenizer.warm_up()
+    if reranker.enabled:
+        reranker_model.warm_up()
+    return embedding_model.warm_up()
 
-    q_vec = embedder.encode(query, convert_to_numpy=True)
-    scores = util.cos_sim(q_vec, vectors)[0].cpu().numpy()
-    best_idx = scores.argsort()[-top_k:][::-1]
-    return [chunks[i] for i in best_idx]
+# ------------------------
+# Embed a question (cached)
+# ------------------------
+@timed("embed_query")
+def embed_query(query):
+    key = normalize_query(query)
+    q_vec = query_vector_cache.get(key)
+    if q_vec is None:
+        q_vec = embedder.encode(query, convert_to_numpy=True)
+        query_vector_cache.put(key, q_vec)
+    return q_vec
 
 
 # ------------------------
-# Gemini QA
+# Search in DB
 # ------------------------
-def ask_gemini(question):
-    # read all chunks from documents
-    context_chunks = search_context(question, top_k=3)
-    if not context_chunks:
-        return "Database is empty. Please ingest documents first."
+@timed("search")
+def search_chunk_ids(query, top_k=3, q_vec=None):
+    try:
+        backend = retriever.get_retriever()
+    except Exception as e:
+        print(f"[DB Error] {e}")
+        return []
 
-    context_1 = "\n".join(context_chunks)
+    if len(backend.index) == 0:
+        return []
 
-    # select all from database
-    tables = get_all_tables()
-    documents = []
+    if q_vec is None:
+        q_vec = embed_query(query)
+    chunk_ids, _ = backend.search(q_vec, top_k, query=query)
+    return [int(i) for i in chunk_ids]
+
+def search_context(query, top_k=3, q_vec=None):
+    if not reranker.enabled:
+        return database.get_chunks_by_ids(search_chunk_ids(query, top_k, q_vec))
+    # over-fetch, then keep the re-ranker's best top_k
+    candidates = search_chunk_ids(query, max(top_k, RERANK_CANDIDATES), q_vec)
+    chunk_ids, chunks, _ = database.get_chunks_with_vectors(candidates)
+    order = reranker.rerank(query, chunk_ids, chunks)
+    return [chunks[i] for i in order[:top_k]]
 
-    for table in tables:
-        try:
-            df = fetch_data(f"SELECT * FROM {table}")
-            if df.empty:
-                continue
-
-            # Convert each row to readable text
-            for _, row in df.iterrows():
-                row_text = f"{table}: " + ", ".join(
-                    [f"{col}={row[col]}" for col in df.columns]
-                )
-                documents.append(row_text)
-        except Exception as e:
-            documents.append(f"Could not read table {table}: {e}")
 
-    context_2 = '\n'.join(documents)
-    prompt = f"""
+# ------------------------
+# Gemini QA
+# ------------------------
+def build_prompt(context_1, context_2, question):
+    return f"""
     {system_prompt}
 
     **Input format:**
@@ -78,16 +138,160 @@ def ask_gemini(question):
     [Clear, structured response using both sources]
     """
 
+@timed("sql.rows")
+def row_context(question, q_vec):
+    """Table rows for the question, best first."""
     try:
-        response = gemini.generate_content(prompt)
-        return response.text
+        return row_retriever.search(question, q_vec)
     except Exception as e:
-        return f"Error with Gemini API: {e}"
+        return [f"Could not read database: {e}"]
+
+@timed("prompt.assemble")
+def assemble_prompt(question, chunk_ids, rows):
+    """
+    Prompt for the retrieved chunks and rows, fitted to the token budget
+    (see context.ContextBudgeter), best re-ranked chunks first. Returns
+    (prompt, context_key, stats), or None when none of the chunks exist.
+    """
+    chunk_ids, chunks, vectors = database.get_chunks_with_vectors(chunk_ids)
+    if not chunks:
+        return None
+    if reranker.enabled:
+        order = reranker.rerank(question, chunk_ids, chunks)
+        chunks, vectors = [chunks[i] for i in order], vectors[order]
+    chunks, rows, stats = budgeter.fit(build_prompt("", "", question), chunks, rows, vectors)
+    context_1, context_2 = "\n".join(chunks), "\n".join(rows)
+    # answers are cached per exact context sent
+    context_key = hash((context_1, context_2))
+    return build_prompt(context_1, context_2, question), context_key, stats
+
+class _Answer:
+    """
+    One question's answer, the steps shared by ask_gemini and
+    ask_gemini_async (which differ only in how they run the stages and
+    stream the LLM): the trace, the answer cache and the LLM timing.
+    """
+
+    def __init__(self, name, question):
+        self.trace = start_trace(name, question=question)
+        self.reply = None  # the whole answer, when the LLM is not needed
+        self.prompt = None
+        self._timer = None
+        self._pieces = []
+
+    def prepare(self, q_vec, assembled):
+        """Take the assembled prompt (see assemble_prompt); sets `reply` or `prompt`."""
+        if assembled is None:
+            self.reply = "Database is empty. Please ingest documents first."
+            return
+        prompt, self._context_key, stats = assembled
+        self.trace.annotate(prompt_tokens=stats["total_tokens"])
+        # a similar question over the same context was already answered
+        self._q_vec, self._version = q_vec, database.corpus_version()
+        cached = answer_cache.get(q_vec, self._context_key, self._version)
+        if cached is not None:
+            self.trace.annotate(cached=True)
+            self.reply = cached
+            return
+        self.prompt = prompt
+        self._timer = StreamTimer("llm.generate", self.trace)
+
+    def add(self, piece):
+        self._timer.piece()
+        self._pieces.append(piece)
+        return piece
+
+    def failed(self, error):
+        return f"Error with Gemini API: {error}"
+
+    def store(self):
+        """The LLM finished: cache the answer."""
+        answer_cache.put(self._q_vec, self._context_key, "".join(self._pieces), self._version)
+
+    def finish(self):
+        if self._timer is not None:
+            self._timer.done()
+        self.trace.finish()
+
+def ask_gemini(question):
+    """Generator over the answer's text pieces, streamed from the LLM as they arrive."""
+    answer = _Answer("ask_gemini", question)
+    try:
+        with answer.trace.active():
+            # embed the question once for both document and row retrieval
+            q_vec = embed_query(question)
+
+            # document chunks and table rows are retrieved concurrently
+            chunks_future = _retrieval_pool.submit(in_context(search_chunk_ids), question, DOC_CANDIDATES, q_vec)
+            rows_future = _retrieval_pool.submit(in_context(row_context), question, q_vec)
+
+            answer.prepare(q_vec, assemble_prompt(question, chunks_future.result(), rows_future.result()))
+        if answer.reply is not None:
+            yield answer.reply
+            return
+        try:
+            for piece in gemini.stream(answer.prompt):
+                yield answer.add(piece)
+        except Exception as e:
+            yield answer.failed(e)
+        else:
+            answer.store()
+    finally:
+        answer.finish()
+
+def ask_gemini_text(question):
+    """Whole answer as one string (non-streaming callers)."""
+    return "".join(ask_gemini(question))
+
+
+# ------------------------
+# Gemini QA (async)
+# ------------------------
+async def embed_query_async(query):
+    with timer("embed_query"):
+        key = normalize_query(query)
+        q_vec = query_vector_cache.get(key)
+        if q_vec is None:
+            async with embed_stage.slot():
+                q_vec = await embedder.aencode(query)
+            query_vector_cache.put(key, q_vec)
+    return q_vec
+
+async def ask_gemini_async(question):
+    """
+    Async generator with the same output as ask_gemini. Embedding and DB work
+    run on their bounded stages and the LLM streams over asyncio, so a slow
+    answer doesn't hold a worker thread.
+    """
+    answer = _Answer("ask_gemini_async", question)
+    try:
+        with answer.trace.active():
+            q_vec = await embed_query_async(question)
+
+            chunk_ids, rows = await asyncio.gather(
+                db_stage.run(search_chunk_ids, question, DOC_CANDIDATES, q_vec),
+                db_stage.run(row_context, question, q_vec),
+            )
+            answer.prepare(q_vec, await db_stage.run(assemble_prompt, question, chunk_ids, rows))
+        if answer.reply is not None:
+            yield answer.reply
+            return
+        try:
+            async with llm_stage.slot():
+                async for piece in gemini.astream(answer.prompt):
+                    yield answer.add(piece)
+        except Exception as e:
+            yield answer.failed(e)
+        else:
+            answer.store()
+    finally:
+        answer.finish()
 
 
 # ------------------------
 # text to speech
 # ------------------------
+@timed("tts")
 def text_to_speech(text):
     engine = pyttsx3.init()
     return engine.say(f"{text}") , engine.runAndWait()
@@ -96,6 +300,7 @@ def text_to_speech(text):
 # ------------------------
 # speech to text
 # ------------------------
+@timed("stt")
 def speech_to_text():
     r = sr.Recognizer()
     with sr.Microphone() as src:
@@ -0,0 +1,288 @@
+# modules
+import json
+import time
+import threading
+import functools
+import contextvars
+from contextlib import contextmanager
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from config import TRACE_PATH, METRICS_HOST, METRICS_PORT
+
+# histogram bucket upper bounds, in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# every timed stage gets a histogram here, keyed by stage name
+HISTOGRAMS = {}
+_histograms_lock = threading.Lock()
+
+# other registries (pools, caches, ...) exported as gauges: prefix -> function returning their stats
+COLLECTORS = {}
+
+
+# ------------------------
+# Histograms
+# ------------------------
+class Histogram:
+    """Counts of observed durations per bucket, plus their sum (Prometheus histogram semantics)."""
+
+    def __init__(self, name, buckets=BUCKETS):
+        self.name = name
+        self.buckets = buckets
+        self._counts = [0] * (len(buckets) + 1)  # last one is +Inf
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        i = 0
+        while i < len(self.buckets) and seconds > self.buckets[i]:
+            i += 1
+        with self._lock:
+            self._counts[i] += 1
+            self._sum += seconds
+
+    def snapshot(self):
+        """(cumulative bucket counts, sum, count)."""
+        with self._lock:
+            counts, total = list(self._counts), self._sum
+        cumulative, running = [], 0
+        for count in counts:
+            running += count
+            cumulative.append(running)
+        return cumulative, total, running
+
+
+def get_histogram(stage):
+    histogram = HISTOGRAMS.get(stage)
+    if histogram is None:
+        with _histograms_lock:
+            histogram = HISTOGRAMS.setdefault(stage, Histogram(stage))
+    return histogram
+
+
+def observe(stage, seconds, trace=None):
+    """Record one duration of `stage` (and add it to the request's trace, if any)."""
+    get_histogram(stage).observe(seconds)
+    samples = _current_samples.get()
+    if samples is not None:
+        samples.append((stage, seconds))
+    trace = trace or _current_trace.get()
+    if trace is not None:
+        trace.add(stage, seconds)
+
+
+@contextmanager
+def timer(stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - start)
+
+
+def timed(stage):
+    """Decorator: time every call of a (plain, non-generator) function as `stage`."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timer(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+class StreamTimer:
+    """Times a streamed call: `<stage>.first_token` (until the first piece) and `<stage>` (until the end)."""
+
+    def __init__(self, stage, trace=None):
+        self.stage = stage
+        self.trace = trace
+        self._start = time.perf_counter()
+        self.first = None
+
+    def piece(self):
+        if self.first is None:
+            self.first = time.perf_counter() - self._start
+            observe(f"{self.stage}.first_token", self.first, self.trace)
+
+    def done(self):
+        observe(self.stage, time.perf_counter() - self._start, self.trace)
+
+
+# ------------------------
+# Durations timed in worker processes
+# ------------------------
+_current_samples = contextvars.ContextVar("samples", default=None)
+
+
+@contextmanager
+def recording():
+    """
+    Also collect the durations observed inside this block (and in tasks
+    started from it through in_context) as a list of (stage, seconds). A
+    worker process sends the list to the parent, which records it with
+    observe(): the parent's histograms don't see the worker's.
+    """
+    samples = []
+    token = _current_samples.set(samples)
+    try:
+        yield samples
+    finally:
+        _current_samples.reset(token)
+
+
+# ------------------------
+# Per-request traces (JSONL)
+# ------------------------
+_current_trace = contextvars.ContextVar("trace", default=None)
+_trace_file_lock = threading.Lock()
+
+
+class Trace:
+    """
+    Stages timed while the trace is active (in this thread, or in tasks and
+    stage threads started from it) are collected as spans and written as one
+    JSON line to `path` when the trace finishes.
+    """
+
+    def __init__(self, name, path=TRACE_PATH, **fields):
+        self.name = name
+        self.path = path
+        self.fields = fields
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self._spans = []
+        self._lock = threading.Lock()
+        self._finished = False
+
+    def add(self, stage, seconds):
+        offset = time.perf_counter() - seconds - self._start
+        with self._lock:
+            self._spans.append({"stage": stage, "start_ms": round(offset * 1000, 3),
+                                "ms": round(seconds * 1000, 3)})
+
+    def annotate(self, **fields):
+        """Extra fields for the trace record (e.g. prompt tokens, cache hit)."""
+        self.fields.update(fields)
+
+    @contextmanager
+    def active(self):
+        """Attach timers run inside this block to the trace (no yield of a generator inside it)."""
+        token = _current_trace.set(self)
+        try:
+            yield self
+        finally:
+            _current_trace.reset(token)
+
+    def finish(self, **fields):
+        if self._finished:
+            return
+        self._finished = True
+        if not self.path:
+            return
+        with self._lock:
+            spans = sorted(self._spans, key=lambda span: span["start_ms"])
+        record = {"trace": self.name, "started_at": self.started_at,
+                  "total_ms": round((time.perf_counter() - self._start) * 1000, 3),
+                  **self.fields, **fields, "spans": spans}
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        try:
+            with _trace_file_lock, open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        except OSError as e:
+            print(f"[Metrics Error] could not write trace: {e}")
+
+
+def start_trace(name, **fields):
+    return Trace(name, **fields)
+
+
+def in_context(fn):
+    """`fn` bound to the caller's context, for executors (keeps the active trace)."""
+    return functools.partial(contextvars.copy_context().run, fn)
+
+
+# ------------------------
+# Prometheus text format
+# ------------------------
+def register_collector(prefix, collect):
+    """Export `collect()` ({name: {key: number}}, or {key: number}) as gauges rag_<prefix>_<key>."""
+    COLLECTORS[prefix] = collect
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _number(value):
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (int, float)):
+        return value
+    return None
+
+
+def render():
+    """All histograms and collected gauges in the Prometheus text exposition format."""
+    lines = ["# HELP rag_stage_duration_seconds Time spent per pipeline stage.",
+             "# TYPE rag_stage_duration_seconds histogram"]
+    for stage, histogram in sorted(HISTOGRAMS.items()):
+        cumulative, total, count = histogram.snapshot()
+        label = _label(stage)
+        for bound, value in zip(list(histogram.buckets) + ["+Inf"], cumulative):
+            lines.append(f'rag_stage_duration_seconds_bucket{{stage="{label}",le="{bound}"}} {value}')
+        lines.append(f'rag_stage_duration_seconds_sum{{stage="{label}"}} {total}')
+        lines.append(f'rag_stage_duration_seconds_count{{stage="{label}"}} {count}')
+
+    gauges = {}  # metric name -> [(labels, value)]
+    for prefix, collect in list(COLLECTORS.items()):
+        try:
+            stats = collect()
+        except Exception as e:
+            print(f"[Metrics Error] {prefix}: {e}")
+            continue
+        # flat stats belong to one unnamed object (nested values are skipped)
+        if not stats or not all(isinstance(v, dict) for v in stats.values()):
+            stats = {None: stats}
+        for name, values in stats.items():
+            if not isinstance(values, dict):
+                continue
+            for key, value in values.items():
+                value = _number(value)
+                if value is None:
+                    continue
+                labels = f'{{name="{_label(name)}"}}' if name is not None else ""
+                gauges.setdefault(f"rag_{prefix}_{key}", []).append((labels, value))
+    for metric, samples in sorted(gauges.items()):
+        lines.append(f"# TYPE {metric} gauge")
+        lines.extend(f"{metric}{labels} {value}" for labels, value in samples)
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_http_server(port=METRICS_PORT, host=METRICS_HOST):
+    """Serve /metrics on a background thread next to the Gradio app (port 0 disables it)."""
+    if not port:
+        return None
+    try:
+        server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    except OSError as e:
+        # e.g. the port is taken by another instance: the app runs without /metrics
+        print(f"[Metrics Error] could not serve /metrics on {host}:{port}: {e}")
+        return None
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
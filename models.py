@@ -0,0 +1,136 @@
+# modules
+import time
+import zlib
+import threading
+import numpy as np
+from config import MODEL_NAME, EMBED_BACKEND, EMBED_ONNX_FILE, RERANK_MODEL
+
+# every model registers itself here; each is loaded at most once per process
+MODELS = {}
+
+
+# ------------------------
+# Lazily loaded model
+# ------------------------
+class LazyModel:
+    """
+    Loads `loader()` on first use (or in a background `warm_up` thread) and
+    shares the instance with every caller. Concurrent first calls wait for
+    the same load instead of loading twice.
+    """
+
+    def __init__(self, name, loader):
+        self.name = name
+        self.loader = loader
+        self._model = None
+        self._lock = threading.Lock()
+        self._stats = {"loaded": False, "load_seconds": None}
+        MODELS[name] = self
+
+    def get(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    start = time.perf_counter()
+                    self._model = self.loader()
+                    self._stats.update(loaded=True, load_seconds=time.perf_counter() - start)
+        return self._model
+
+    def warm_up(self):
+        """Start loading in a background thread; returns the thread."""
+        thread = threading.Thread(target=self.get, name=f"warm-up-{self.name}", daemon=True)
+        thread.start()
+        return thread
+
+    @property
+    def loaded(self):
+        return self._model is not None
+
+    # SentenceTransformer-style call
+    def encode(self, *args, **kwargs):
+        return self.get().encode(*args, **kwargs)
+
+    def stats(self):
+        return dict(self._stats)
+
+
+# ------------------------
+# Embedding model
+# ------------------------
+def load_sentence_transformer(name=MODEL_NAME, backend=EMBED_BACKEND, onnx_file=EMBED_ONNX_FILE):
+    """
+    SentenceTransformer on the "torch" or "onnx" backend. For ONNX,
+    `onnx_file` picks an exported (e.g. int8-quantized) file from the model
+    repo; falls back to torch if the ONNX runtime is not installed.
+    """
+    from sentence_transformers import SentenceTransformer
+    if backend == "torch":
+        return SentenceTransformer(name)
+    if backend != "onnx":
+        raise ValueError(f"Unknown embedding backend: {backend}. Use 'torch' or 'onnx'")
+    model_kwargs = {"file_name": onnx_file} if onnx_file else None
+    try:
+        return SentenceTransformer(name, backend="onnx", model_kwargs=model_kwargs)
+    except Exception as e:
+        print(f"[Model Error] ONNX backend unavailable ({e}); using torch")
+        return SentenceTransformer(name)
+
+
+# the embedding model's tokenizer alone (for chunking by tokens without loading the model)
+def load_tokenizer(name=MODEL_NAME):
+    from transformers import AutoTokenizer
+    return AutoTokenizer.from_pretrained(name)
+
+
+# cross-encoder scoring (question, chunk) pairs for re-ranking; small enough for the CPU
+def load_cross_encoder(name=RERANK_MODEL):
+    from sentence_transformers import CrossEncoder
+    return CrossEncoder(name, max_length=512, device="cpu")
+
+
+# ------------------------
+# Offline stand-ins (tests / benchmarks, no model download)
+# ------------------------
+class HashEmbedder:
+    """A text's vector is the normalized sum of fixed random vectors of its words."""
+
+    def __init__(self, dim, vocab_rows=8192, seed=0):
+        self.table = np.random.default_rng(seed).normal(size=(vocab_rows, dim)).astype(np.float32)
+        self.encoded = 0  # texts encoded so far
+
+    def encode(self, sentences, batch_size=None, convert_to_numpy=True, **kwargs):
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        self.encoded += len(texts)
+        vectors = np.zeros((len(texts), self.table.shape[1]), dtype=np.float32)
+        for i, text in enumerate(texts):
+            rows = [zlib.crc32(word.encode("utf-8")) % len(self.table) for word in text.lower().split()]
+            if rows:
+                vectors[i] = self.table[rows].sum(axis=0)
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        return vectors[0] if single else vectors
+
+
+class WordTokenizer:
+    """One token per word, called like a Hugging Face tokenizer."""
+
+    def __call__(self, texts, add_special_tokens=False, **kwargs):
+        return {"input_ids": [[zlib.crc32(word.encode("utf-8")) for word in text.split()] for text in texts]}
+
+
+def use_offline_models(dim):
+    """Swap the stand-ins in before anything loads the registered models; returns the embedder."""
+    embedder = HashEmbedder(dim)
+    embedding_model.loader = lambda: embedder
+    tokenizer.loader = WordTokenizer
+    return embedder
+
+
+def get_model_stats():
+    """Load state of every registered model, keyed by model name."""
+    return {name: model.stats() for name, model in MODELS.items()}
+
+
+embedding_model = LazyModel("embedding", load_sentence_transformer)
+tokenizer = LazyModel("tokenizer", load_tokenizer)
+reranker_model = LazyModel("reranker", load_cross_encoder)
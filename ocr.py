@@ -0,0 +1,211 @@
+# modules
+import io
+import os
+import time
+import hashlib
+import sqlite3
+import threading
+from collections import deque
+from contextlib import closing
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pytesseract
+from PIL import Image, ImageSequence
+from metrics import timer, in_context
+from config import OCR_WORKERS, OCR_LANG, OCR_DPI, OCR_MAX_SIDE, OCR_BINARIZE, OCR_MIN_TEXT_CHARS, OCR_CACHE_PATH
+
+# NOTE: imported by readers.py, so it runs in the ingest worker processes too;
+# every process gets its own OCR threads and shares the cache file.
+
+
+# ------------------------
+# Page images: scanned PDF pages, image files
+# ------------------------
+def needs_ocr(page, text, min_chars=OCR_MIN_TEXT_CHARS):
+    """A scanned PDF page: (almost) no text layer, but an image (or form) drawn on it."""
+    if len(text) >= min_chars:
+        return False
+    resources = page.get("/Resources")
+    if resources is None:
+        return False
+    xobjects = resources.get_object().get("/XObject")
+    return xobjects is not None and len(xobjects.get_object()) > 0
+
+
+class PageRasterizer:
+    """
+    Renders PDF pages to grayscale images at `dpi` with pypdfium2 when it is
+    installed; otherwise takes the page's largest embedded image (the scan
+    itself, for scanned documents). Not thread-safe: render pages from one
+    thread and hand the images to the OCR threads.
+    """
+
+    def __init__(self, file_path, dpi=OCR_DPI):
+        self.dpi = dpi
+        try:
+            import pypdfium2 as pdfium
+        except ImportError:
+            self._pdf = None
+        else:
+            self._pdf = pdfium.PdfDocument(file_path)
+
+    def render(self, page, index):
+        if self._pdf is not None:
+            pdf_page = self._pdf[index]
+            try:
+                # copied out of the bitmap's buffer, which is freed with the bitmap
+                return pdf_page.render(scale=self.dpi / 72, grayscale=True).to_pil().copy()
+            finally:
+                pdf_page.close()
+        images = page.images
+        if not images:
+            return None
+        return Image.open(io.BytesIO(max(images, key=lambda image: len(image.data)).data))
+
+    def close(self):
+        if self._pdf is not None:
+            self._pdf.close()
+
+
+def image_pages(file_path):
+    """(page number, image) per frame of a multi-page image (e.g. a TIFF scan); (None, image) for a single image."""
+    with Image.open(file_path) as image:
+        if getattr(image, "n_frames", 1) == 1:
+            yield None, image.copy()
+            return
+        for number, frame in enumerate(ImageSequence.Iterator(image), start=1):
+            yield number, frame.copy()
+
+
+# ------------------------
+# Preprocessing
+# ------------------------
+def otsu_threshold(pixels):
+    """Gray level that best splits `pixels` (uint8) into ink and paper."""
+    hist = np.bincount(pixels.ravel(), minlength=256).astype(np.float64)
+    hist /= hist.sum()
+    weight = np.cumsum(hist)
+    mean = np.cumsum(hist * np.arange(256))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        between = (mean[-1] * weight - mean) ** 2 / (weight * (1 - weight))
+    return int(np.nanargmax(between)) if np.isfinite(between).any() else 127
+
+
+def prepare(image, max_side=OCR_MAX_SIDE, binarize=OCR_BINARIZE):
+    """
+    Grayscale, downscaled so its longest side is at most `max_side` pixels,
+    and binarized with Otsu's threshold: Tesseract gets a small 1-bit image
+    instead of a full-color scan.
+    """
+    image = image.convert("L")
+    scale = max_side / max(image.size)
+    if scale < 1:
+        image = image.resize((max(1, round(image.width * scale)), max(1, round(image.height * scale))),
+                             Image.BILINEAR, reducing_gap=2.0)
+    if binarize:
+        threshold = otsu_threshold(np.asarray(image))
+        image = image.point([0] * (threshold + 1) + [255] * (255 - threshold)).convert("1")
+    return image
+
+
+# ------------------------
+# Page text cache (SQLite file shared by all processes)
+# ------------------------
+_cache_ready = False
+
+def _cache_connection():
+    # short-lived connections: cheap next to OCR, and safe in forked reader processes
+    global _cache_ready
+    conn = sqlite3.connect(OCR_CACHE_PATH, timeout=30)
+    if not _cache_ready:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS ocr_pages (
+            key TEXT PRIMARY KEY,
+            text TEXT NOT NULL,
+            created_at REAL
+        )
+        """)
+        _cache_ready = True
+    return closing(conn)
+
+def page_key(image, lang=OCR_LANG):
+    """Content hash of a page image, plus the settings that change its OCR text."""
+    digest = hashlib.sha256(f"{image.mode}|{image.size}|{lang}|{OCR_MAX_SIDE}|{OCR_BINARIZE}|".encode("utf-8"))
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+def get_cached_text(key):
+    try:
+        with _cache_connection() as conn:
+            row = conn.execute("SELECT text FROM ocr_pages WHERE key = ?", (key,)).fetchone()
+    except sqlite3.Error as e:
+        print(f"[OCR Error] cache: {e}")
+        return None
+    return row[0] if row else None
+
+def put_cached_text(key, text):
+    try:
+        with _cache_connection() as conn, conn:
+            conn.execute("INSERT OR REPLACE INTO ocr_pages (key, text, created_at) VALUES (?, ?, ?)",
+                         (key, text, time.time()))
+    except sqlite3.Error as e:
+        print(f"[OCR Error] cache: {e}")
+
+
+# ------------------------
+# Parallel page OCR
+# ------------------------
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+def _get_pool(workers=OCR_WORKERS):
+    """
+    OCR threads of this process. Each page runs in its own `tesseract`
+    process (pytesseract starts one per call), so threads are enough to
+    keep `workers` pages in flight.
+    """
+    global _pool, _pool_pid
+    with _pool_lock:
+        # a pool inherited through fork has no threads
+        if _pool is None or _pool_pid != os.getpid():
+            if workers > 1:
+                # pages run side by side, so one thread per tesseract process
+                os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+            _pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ocr")
+            _pool_pid = os.getpid()
+    return _pool
+
+def ocr_image(image, lang=OCR_LANG):
+    """Text of one page image (whitespace collapsed), from the cache when the same page was OCR'd before."""
+    key = page_key(image, lang)
+    text = get_cached_text(key)
+    if text is None:
+        with timer("ocr.page"):
+            text = " ".join(pytesseract.image_to_string(prepare(image), lang=lang).split())
+        put_cached_text(key, text)
+    return text
+
+def ocr_pages(pages, lang=OCR_LANG, workers=OCR_WORKERS):
+    """
+    (page number, text) for each (page number, text, image) of `pages`, in
+    order. Pages with an image are OCR'd (up to `workers` at a time, at most
+    2 * `workers` rendered pages held); their text is kept when OCR finds
+    nothing. `pages` is consumed in the calling thread.
+    """
+    pool = _get_pool(workers)
+    pending = deque()  # (page number, text, OCR future or None)
+
+    def resolve(entry):
+        number, text, future = entry
+        return number, (future.result() if future is not None else "") or text
+
+    for number, text, image in pages:
+        # in_context: page timings reach the caller's metrics.recording() (in a reader process)
+        future = pool.submit(in_context(ocr_image), image, lang) if image is not None else None
+        pending.append((number, text, future))
+        while pending and (pending[0][2] is None or pending[0][2].done() or len(pending) > 2 * workers):
+            yield resolve(pending.popleft())
+    while pending:
+        yield resolve(pending.popleft())
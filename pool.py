@@ -0,0 +1,186 @@
+# modules
+import time
+import threading
+from contextlib import contextmanager
+
+# every pool registers itself here so metrics can be reported in one place
+POOLS = {}
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+def _ping(conn):
+    cur = conn.cursor()
+    cur.execute("SELECT 1")
+    cur.fetchall()
+
+
+# ------------------------
+# Bounded connection pool
+# ------------------------
+class ConnectionPool:
+    """
+    Thread-safe pool of at most `max_size` connections made by `factory`.
+    Idle connections older than `idle_timeout` are closed, and a connection
+    that fails `health_check` on checkout is replaced by a fresh one.
+    """
+
+    def __init__(self, name, factory, max_size=8, timeout=30.0, idle_timeout=300.0, health_check=_ping):
+        self.name = name
+        self.factory = factory
+        self.max_size = max_size
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.health_check = health_check
+        self._idle = []  # (connection, returned_at)
+        self._size = 0
+        self._cond = threading.Condition()
+        self._metrics = {"created": 0, "closed": 0, "checkouts": 0, "waits": 0, "wait_seconds": 0.0,
+                         "health_failures": 0, "in_use": 0}
+        POOLS[name] = self
+
+    def _close(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        self._metrics["closed"] += 1
+
+    def _reap_idle(self, now):
+        keep = []
+        for conn, returned_at in self._idle:
+            if now - returned_at > self.idle_timeout:
+                self._close(conn)
+                self._size -= 1
+            else:
+                keep.append((conn, returned_at))
+        self._idle = keep
+
+    def acquire(self):
+        deadline = time.monotonic() + self.timeout
+        waited = False
+        with self._cond:
+            while True:
+                self._reap_idle(time.monotonic())
+                if self._idle:
+                    conn, _ = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    conn = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeout(f"{self.name}: no connection free after {self.timeout}s")
+                if not waited:
+                    self._metrics["waits"] += 1
+                    waited = True
+                start = time.monotonic()
+                self._cond.wait(remaining)
+                self._metrics["wait_seconds"] += time.monotonic() - start
+            self._metrics["checkouts"] += 1
+            self._metrics["in_use"] += 1
+
+        # connect / health-check outside the lock
+        try:
+            if conn is not None and self.health_check is not None:
+                try:
+                    self.health_check(conn)
+                except Exception:
+                    self._metrics["health_failures"] += 1
+                    self._close(conn)
+                    conn = None
+            if conn is None:
+                conn = self.factory()
+                self._metrics["created"] += 1
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._metrics["in_use"] -= 1
+                self._cond.notify()
+            raise
+        return conn
+
+    def release(self, conn, broken=False):
+        with self._cond:
+            self._metrics["in_use"] -= 1
+            if broken:
+                self._close(conn)
+                self._size -= 1
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        broken = False
+        try:
+            yield conn
+        except Exception:
+            # roll back whatever the caller left open; a failed rollback means a dead connection
+            try:
+                conn.rollback()
+            except Exception:
+                broken = True
+            raise
+        finally:
+            self.release(conn, broken)
+
+    def close_all(self):
+        with self._cond:
+            for conn, _ in self._idle:
+                self._close(conn)
+            self._size -= len(self._idle)
+            self._idle = []
+
+    def metrics(self):
+        with self._cond:
+            return dict(self._metrics, size=self._size, idle=len(self._idle), max_size=self.max_size)
+
+
+# ------------------------
+# One connection per thread (SQLite)
+# ------------------------
+class ThreadLocalConnections:
+    """
+    Reuses one connection per thread, for drivers such as sqlite3 whose
+    connections must stay on the thread that created them.
+    """
+
+    def __init__(self, name, factory):
+        self.name = name
+        self.factory = factory
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._metrics = {"created": 0, "checkouts": 0}
+        POOLS[name] = self
+
+    def get(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self.factory()
+            self._local.conn = conn
+            with self._lock:
+                self._metrics["created"] += 1
+        with self._lock:
+            self._metrics["checkouts"] += 1
+        return conn
+
+    def close(self):
+        """Close the calling thread's connection (e.g. before a worker thread exits)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def metrics(self):
+        with self._lock:
+            return dict(self._metrics)
+
+
+def get_pool_metrics():
+    """Metrics of every registered pool, keyed by pool name."""
+    return {name: pool.metrics() for name, pool in POOLS.items()}
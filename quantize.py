@@ -0,0 +1,104 @@
+"""
+Quantized embedding codes for the coarse search pass.
+
+The store encodes missing codes from its float32 vectors when it opens, so
+a new EMBEDDING_PRECISION takes effect on the next start (no re-embedding).
+"""
+# modules
+import numpy as np
+
+# rows converted to float32 at a time while scoring
+SCORE_BLOCK = 1024
+
+# popcount of every byte value (fallback for numpy < 2.0)
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+# ------------------------
+# Codecs
+# ------------------------
+class Float16Codec:
+    """Half-precision copy of the vectors (2x smaller)."""
+    name = "float16"
+    dtype = np.float16
+
+    def code_width(self, dim):
+        return dim
+
+    def encode(self, vectors):
+        return np.asarray(vectors, dtype=np.float16)
+
+    def score(self, codes, query):
+        q = np.asarray(query, dtype=np.float32)
+        out = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), SCORE_BLOCK):
+            block = codes[start:start + SCORE_BLOCK].astype(np.float32)
+            out[start:start + SCORE_BLOCK] = block @ q
+        return out
+
+
+class Int8Codec:
+    """
+    Symmetric scalar quantization (4x smaller). Stored vectors are
+    L2-normalized, so every component is within [-1, 1] and one fixed scale
+    of 1/127 never clips, whatever vectors the store starts with.
+    """
+    name = "int8"
+    dtype = np.int8
+    scale = 1 / 127
+
+    def code_width(self, dim):
+        return dim
+
+    def encode(self, vectors):
+        codes = np.rint(np.asarray(vectors, dtype=np.float32) / self.scale)
+        return np.clip(codes, -127, 127).astype(np.int8)
+
+    def score(self, codes, query):
+        q = np.asarray(query, dtype=np.float32) * self.scale
+        out = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), SCORE_BLOCK):
+            block = codes[start:start + SCORE_BLOCK].astype(np.float32)
+            out[start:start + SCORE_BLOCK] = block @ q
+        return out
+
+
+class BinaryCodec:
+    """1-bit sign codes scored by Hamming distance (32x smaller)."""
+    name = "binary"
+    dtype = np.uint8
+
+    def code_width(self, dim):
+        return (dim + 7) // 8
+
+    def encode(self, vectors):
+        return np.packbits(np.asarray(vectors) > 0, axis=-1)
+
+    def score(self, codes, query):
+        q = self.encode(query).reshape(-1)
+        out = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), SCORE_BLOCK):
+            diff = np.bitwise_xor(codes[start:start + SCORE_BLOCK], q)
+            if hasattr(np, "bitwise_count"):
+                hamming = np.bitwise_count(diff).sum(axis=1, dtype=np.int32)
+            else:
+                hamming = _POPCOUNT[diff].sum(axis=1, dtype=np.int32)
+            # fewer differing bits = more similar
+            out[start:start + SCORE_BLOCK] = -hamming
+        return out
+
+
+CODECS = {
+    "float16": Float16Codec,
+    "int8": Int8Codec,
+    "binary": BinaryCodec,
+}
+
+
+def get_codec(precision):
+    """Codec for `precision`, or None for full float32."""
+    if precision in (None, "", "float32"):
+        return None
+    if precision not in CODECS:
+        raise ValueError(f"Unknown embedding precision: {precision}. Use float32 or one of {list(CODECS)}")
+    return CODECS[precision]()
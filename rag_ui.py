@@ -1,19 +1,26 @@
 # modules
 import os
+import time
 import shutil
 import gradio as gr
-from ingest import ingest_file
-from config import CHUNK_SIZE
-from main import text_to_speech, speech_to_text, ask_gemini
+import database
+import db_sqlserver
+import metrics
+from jobs import job_queue, get_jobs, UNFINISHED
+from config import CHUNK_SIZE, GRADIO_CONCURRENCY_LIMIT, GRADIO_MAX_QUEUE_SIZE, EMBED_WARMUP, JOB_POLL_SECONDS
+from main import text_to_speech, speech_to_text, ask_gemini_async, audio_stage, warm_up
+
+# uploads are copied here before ingestion
+UPLOAD_DIR = "uploads"
 
 
 # ------------------------
 # Ingest files
 # ------------------------
 def ingest_and_save(file_paths, uploaded_state):
-    uploaded = uploaded_state or []
+    """Copy uploads and queue them as a background ingest job (see poll_jobs for progress)."""
     if not file_paths:
-        return gr.update(choices=uploaded or [""], value=None), "No file uploaded", uploaded
+        return gr.update(), "No file uploaded", uploaded_state
 
     if isinstance(file_paths, (list, tuple)):
         paths = file_paths
@@ -21,7 +28,8 @@ def ingest_and_save(file_paths, uploaded_state):
         paths = [file_paths]
 
     messages = []
-    save_dir = "uploads"
+    saved_paths = []
+    save_dir = UPLOAD_DIR
     os.makedirs(save_dir, exist_ok=True)
 
     for p in paths:
@@ -35,72 +43,140 @@ def ingest_and_save(file_paths, uploaded_state):
             messages.append(f"[copy error] {filename}: {e}")
             continue
 
-        if filename not in uploaded:
-            uploaded.append(filename)
+        saved_paths.append(saved_path)
+
+    if saved_paths:
+        job_id = job_queue.submit(saved_paths, chunk_size=CHUNK_SIZE)
+        messages.append(f"Job #{job_id} queued: {len(saved_paths)} file(s). Progress is shown under Ingest Jobs.")
+    return gr.update(), "\n".join(messages), uploaded_state
+
+def format_job(job):
+    icons = {"queued": "🕒", "running": "⏳", "done": "✅", "skipped": "⏭️", "empty": "⚠️", "failed": "❌"}
+    finished = sum(f["status"] not in UNFINISHED for f in job["files"])
+    end = job["finished_at"] or time.time()
+    elapsed = f" in {end - job['started_at']:.1f}s" if job["started_at"] else ""
+    lines = [f"{icons.get(job['status'], '')} Job #{job['id']} {job['status']}: "
+             f"{finished}/{len(job['files'])} file(s){elapsed}"]
+    for f in job["files"]:
+        detail = f" - {f['chunks']} chunks, {f['seconds']:.1f}s" if f["chunks"] is not None else ""
+        if f["status"] in ("failed", "empty"):
+            detail = f" - {f['message']}"
+        lines.append(f"   {icons.get(f['status'], '')} {os.path.basename(f['file_path'])}{detail}")
+    return "\n".join(lines)
+
+def poll_jobs(uploaded_state):
+    """
+    Status of the most recent ingest jobs, read from the jobs table (polled
+    by a timer); the file list is refreshed when finished jobs changed it.
+    """
+    jobs = get_jobs()
+    status = "\n".join(format_job(job) for job in jobs) if jobs else "No ingest jobs yet"
+    paths = stored_files()
+    if paths == (uploaded_state or []):
+        return status, gr.update(), uploaded_state
+    return status, file_choices(paths), paths
 
-        try:
-            msg = ingest_file(saved_path, chunk_size=CHUNK_SIZE)
-            messages.append(msg)
-        except Exception as e:
-            messages.append(f"[ingest error] {filename}: {e}")
 
-    out_msg = "\n".join(messages) if messages else "Done"
-    return gr.update(choices=uploaded or [""], value=None), out_msg, uploaded
+# ------------------------
+# Stored files (the documents table is the source of truth)
+# ------------------------
+def stored_files():
+    return database.list_document_paths()
+
+def file_choices(paths):
+    """Dropdown update listing `paths` by file name (the value is the stored path)."""
+    return gr.update(choices=[(os.path.basename(p), p) for p in paths], value=None)
+
+def refresh_files():
+    paths = stored_files()
+    return file_choices(paths), paths
 
 
 # ------------------------
 # Delete files
 # ------------------------
-def delete_file(selected_filename, uploaded_state):
-    uploaded = uploaded_state or []
-    if not selected_filename:
-        return gr.update(choices=uploaded or [""], value=None), "No file selected", uploaded
+def delete_file(selected_path, uploaded_state):
+    """Delete the document's chunks, vectors and index entries, and its copy in uploads/."""
+    if not selected_path:
+        return gr.update(), "No file selected", uploaded_state
 
-    if selected_filename not in uploaded:
-        return gr.update(choices=uploaded or [""], value=None), f"File not in list: {selected_filename}", uploaded
-
-    file_path = os.path.join("uploads", selected_filename)
+    filename = os.path.basename(selected_path)
     try:
-        if os.path.exists(file_path):
-            os.remove(file_path)
+        deleted = database.delete_document(selected_path)
+        upload = os.path.join(UPLOAD_DIR, filename)
+        if os.path.abspath(upload) == os.path.abspath(selected_path) and os.path.exists(upload):
+            os.remove(upload)
     except Exception as e:
-        return gr.update(choices=uploaded or [""], value=None), f"Error deleting file: {e}", uploaded
+        return gr.update(), f"Error deleting file: {e}", uploaded_state
 
-    uploaded = [f for f in uploaded if f != selected_filename]
-    return gr.update(choices=uploaded or [""], value=None), f"Deleted: {selected_filename}", uploaded
+    choices, paths = refresh_files()
+    if deleted is None:
+        return choices, f"File not in database: {filename}", paths
+    return choices, f"Deleted: {filename} ({deleted} chunks removed)", paths
+
+def clear_all_files():
+    """Empty the document store and uploads/."""
+    try:
+        count = len(database.list_document_paths())
+        database.clear_all()
+        if os.path.isdir(UPLOAD_DIR):
+            for name in os.listdir(UPLOAD_DIR):
+                path = os.path.join(UPLOAD_DIR, name)
+                if os.path.isfile(path):
+                    os.remove(path)
+    except Exception as e:
+        return gr.update(), f"Error clearing files: {e}", stored_files()
+    return file_choices([]), f"All files cleared ({count} documents deleted)", []
 
 
 # ------------------------
 # Chatbot (no auto-TTS)
 # ------------------------
 def rag_chat(message: str, history: list):
-    """Call your LLM / RAG function to get a textual reply."""
-    return ask_gemini(message)
+    """Call your LLM / RAG function; async-yields the reply as streamed text pieces."""
+    return ask_gemini_async(message)
+
+def play_choices(history):
+    """Choices for the "play" dropdown (indexed, one per bot reply)."""
+    return [f"{i+1} 🔊 " + h[1].strip().replace("\n", " ")[:80] for i, h in enumerate(history)]
 
-def handle_send(message: str, history_state: list):
+async def handle_send(message: str, history_state: list):
     """
     When user sends a message:
-    - call rag_chat -> get textual response
+    - stream rag_chat -> show the reply in the chatbot as it arrives
     - append to history
     - update the dropdown choices (one per bot reply) for playing audio on demand
+    - report time-to-first-token in the Session Info box
     """
     history = history_state or []
     if not message or not message.strip():
         # Nothing to send
-        choices = [f"{i+1} 🔊 {h[1].strip().replace('\\n', ' ')[:80]}" for i, h in enumerate(history)]
-        return history, "", history, gr.update(choices=choices, value=(choices[-1] if choices else None))
-
-    # Get the textual response (no TTS here)
-    response = rag_chat(message, history)
+        choices = play_choices(history)
+        yield history, "", history, gr.update(choices=choices, value=(choices[-1] if choices else None)), gr.update()
+        return
+
+    # Stream the textual response (no TTS here)
+    start = time.perf_counter()
+    first_token = None
+    response = ""
+    async for piece in rag_chat(message, history):
+        if first_token is None:
+            first_token = time.perf_counter() - start
+        response += piece
+        partial = history + [(message, response)]
+        yield partial, "", partial, gr.update(), f"⏳ Answering... (first token {first_token:.2f}s)"
+
+    total = time.perf_counter() - start
     history = history + [(message, response)]
 
     # Build choices for the "play" dropdown (indexed)
-    choices = [f"{i+1} 🔊 {h[1].strip().replace('\\n', ' ')[:80]}" for i, h in enumerate(history)]
+    choices = play_choices(history)
+    info = f"✅ First token: {first_token or total:.2f}s | Total: {total:.2f}s"
 
-    # Outputs: chatbot history, cleared input box, updated history state, updated dropdown choices
-    return history, "", history, gr.update(choices=choices, value=choices[-1])
+    # Outputs: chatbot history, cleared input box, updated history state, updated dropdown choices, session info
+    yield history, "", history, gr.update(choices=choices, value=choices[-1]), info
 
-def play_selected(choice: str, history_state: list):
+async def play_selected(choice: str, history_state: list):
     """
     When user clicks Play:
     - parse selected index from dropdown choice
@@ -125,9 +201,13 @@ def play_selected(choice: str, history_state: list):
         return None
 
     # Generate audio file (on-demand). text_to_speech should return a filepath (wav/mp3)
-    audio_path = text_to_speech(bot_text)
+    audio_path = await audio_stage.run(text_to_speech, bot_text)
     return audio_path
 
+async def listen():
+    """Speech to text on the audio stage (one microphone)."""
+    return await audio_stage.run(speech_to_text)
+
 def stop_audio():
     """Stop audio playback"""
     return None
@@ -207,7 +287,7 @@ with gr.Blocks(theme=gr.themes.Soft(), css=custom_css) as demo:
                     clear_files_btn = gr.Button("🗑️ Clear All", variant="secondary")
                 
             with gr.Column(scale=2, elem_classes="file-manager"):
-                gr.Markdown("**📋 Uploaded Files**")
+                gr.Markdown("**📋 Stored Files**")
                 file_list = gr.Dropdown(
                     choices=[], 
                     label="Select file to delete",
@@ -224,7 +304,16 @@ with gr.Blocks(theme=gr.themes.Soft(), css=custom_css) as demo:
             lines=2,
             max_lines=4
         )
+
+        job_status = gr.Textbox(
+            label="⏳ Ingest Jobs",
+            interactive=False,
+            lines=4,
+            max_lines=12
+        )
+        job_timer = gr.Timer(JOB_POLL_SECONDS)
         
+        # stored file paths currently listed in file_list
         uploaded_state = gr.State([])
 
     with gr.Tab("💬 Chatbot", elem_classes="tab"):
@@ -295,12 +384,19 @@ with gr.Blocks(theme=gr.themes.Soft(), css=custom_css) as demo:
     # ============================
 
     # File Management Tab
+    # ingestion runs as a background job; the timer polls its status
     ingest_btn.click(
         fn=ingest_and_save,
         inputs=[file_input, uploaded_state],
         outputs=[file_list, output_status, uploaded_state]
     )
 
+    job_timer.tick(
+        fn=poll_jobs,
+        inputs=[uploaded_state],
+        outputs=[job_status, file_list, uploaded_state]
+    )
+
     delete_btn.click(
         fn=delete_file,
         inputs=[file_list, uploaded_state],
@@ -308,31 +404,36 @@ with gr.Blocks(theme=gr.themes.Soft(), css=custom_css) as demo:
     )
 
     refresh_btn.click(
-        fn=lambda x: gr.update(choices=x or [""]),
-        inputs=[uploaded_state],
-        outputs=[file_list]
+        fn=refresh_files,
+        outputs=[file_list, uploaded_state]
     )
 
     clear_files_btn.click(
-        fn=lambda: ([], gr.update(choices=[], value=None), "All files cleared"),
-        outputs=[uploaded_state, file_list, output_status]
+        fn=clear_all_files,
+        outputs=[file_list, output_status, uploaded_state]
+    )
+
+    # list the stored documents when the page loads
+    demo.load(
+        fn=refresh_files,
+        outputs=[file_list, uploaded_state]
     )
 
     # Chatbot Tab
     send_btn.click(
         fn=handle_send,
         inputs=[msg, history_state],
-        outputs=[chatbot, msg, history_state, play_dropdown]
+        outputs=[chatbot, msg, history_state, play_dropdown, session_info]
     )
 
     msg.submit(
         fn=handle_send,
         inputs=[msg, history_state],
-        outputs=[chatbot, msg, history_state, play_dropdown]
+        outputs=[chatbot, msg, history_state, play_dropdown, session_info]
     )
 
     mic_btn.click(
-        fn=speech_to_text,
+        fn=listen,
         inputs=None,
         outputs=msg
     )
@@ -355,7 +456,7 @@ with gr.Blocks(theme=gr.themes.Soft(), css=custom_css) as demo:
     )
 
     refresh_audio_btn.click(
-        fn=lambda hist: gr.update(choices=[f"{i+1} 🔊 {h[1].strip().replace('\\n', ' ')[:80]}" for i, h in enumerate(hist)] if hist else []),
+        fn=lambda hist: gr.update(choices=play_choices(hist) if hist else []),
         inputs=[history_state],
         outputs=[play_dropdown]
     )
@@ -364,4 +465,20 @@ with gr.Blocks(theme=gr.themes.Soft(), css=custom_css) as demo:
 # Launch App
 # ============================
 if __name__ == "__main__":
-    demo.launch()
+    database.init_db()
+    # resume ingest jobs a previous run left unfinished
+    job_queue.start()
+    # periodically reclaim the space of deleted documents
+    database.start_compactor()
+    # Prometheus /metrics next to the app (METRICS_PORT=0 disables it)
+    metrics.start_http_server()
+    # models load in the background while the UI comes up
+    if EMBED_WARMUP:
+        warm_up()
+    # chat handlers are async; per-stage limits (main.py) bound the real work
+    demo.queue(default_concurrency_limit=GRADIO_CONCURRENCY_LIMIT, max_size=GRADIO_MAX_QUEUE_SIZE)
+    try:
+        demo.launch()
+    finally:
+        db_sqlserver.close_pool()
+        database.close_connection()
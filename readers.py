@@ -0,0 +1,154 @@
+# modules
+import os
+from PyPDF2 import PdfReader
+from pptx import Presentation
+import docx
+import numpy as np
+import pandas as pd
+from config import READ_BATCH_ROWS, OCR_LANG
+from ocr import needs_ocr, PageRasterizer, image_pages, ocr_pages
+
+# NOTE: keep this module free of the embedding model / DB so it is cheap to
+# import in the ingest worker processes.
+
+# Every reader has a *_segments generator yielding (text, location) pieces one
+# page / slide / paragraph / row batch at a time, where location records where
+# the text came from: {"page": n}, {"slide": n}, {"row": first row} or {}.
+# The chunker consumes them as a stream, keeps pages and slides apart and
+# stores the locations with each chunk.
+
+# read .pdf: pages without a text layer (scans) are rendered and OCR'd, several at a time
+def _pdf_pages(file_path):
+    reader = PdfReader(file_path)
+    rasterizer = None
+    try:
+        for number, page in enumerate(reader.pages, start=1):
+            page_text = (page.extract_text() or "").strip()  # make sure it's not None
+            image = None
+            if needs_ocr(page, page_text):
+                rasterizer = rasterizer or PageRasterizer(file_path)
+                image = rasterizer.render(page, number - 1)
+            yield number, page_text, image
+    finally:
+        if rasterizer is not None:
+            rasterizer.close()
+
+def pdf_segments(file_path):
+    for number, page_text in ocr_pages(_pdf_pages(file_path)):
+        if page_text:
+            yield page_text, {"page": number}
+
+# read .pptx
+def pptx_segments(file_path):
+    prs = Presentation(file_path)
+    for number, slide in enumerate(prs.slides, start=1):
+        paragraphs = []
+        for shape in slide.shapes:
+            if shape.has_text_frame:  # check if shape contains text
+                for paragraph in shape.text_frame.paragraphs:
+                    text = " ".join(run.text.strip() for run in paragraph.runs if run.text.strip())
+                    if text:
+                        paragraphs.append(text)
+        if paragraphs:
+            # one line per paragraph so bullets split like sentences
+            yield "\n".join(paragraphs), {"slide": number}
+
+# read .txt (blank lines separate paragraphs; very long ones are cut every `max_lines`)
+def txt_segments(file_path, max_lines=1000):
+    lines = []
+    with open(file_path, "r", encoding="utf-8") as file:
+        for line in file:
+            if line.strip():
+                lines.append(line.strip())
+            if lines and (not line.strip() or len(lines) >= max_lines):
+                yield " ".join(lines), {}
+                lines = []
+    if lines:
+        yield " ".join(lines), {}
+
+# read .docx
+def docx_segments(file_path):
+    doc = docx.Document(file_path)
+    for para in doc.paragraphs:
+        if para.text.strip():  # skip empty paragraphs
+            yield para.text.strip(), {}
+
+# row text: the row's non-empty values joined by spaces (vectorized per column)
+def rows_text(df):
+    text = None
+    for col in df.columns:
+        values = df[col]
+        part = values.astype(str).str.replace(r"\s+", " ", regex=True).str.strip().where(values.notna(), "")
+        if text is None:
+            text = part
+        else:
+            sep = np.where((text != "") & (part != ""), " ", "")
+            text = text + sep + part
+    return [] if text is None else text.tolist()
+
+# row batches of a spreadsheet as DataFrames, without loading the whole file
+def _table_batches(file_path, batch_rows):
+    if file_path.endswith(".csv"):
+        yield from pd.read_csv(file_path, chunksize=batch_rows)
+    elif file_path.endswith(".xlsx"):
+        # openpyxl's read-only mode streams rows from the first sheet (like pd.read_excel)
+        from openpyxl import load_workbook
+        workbook = load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            rows = workbook.worksheets[0].iter_rows(values_only=True)
+            header = next(rows, None)
+            batch = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) == batch_rows:
+                    yield pd.DataFrame(batch, columns=header)
+                    batch = []
+            if batch:
+                yield pd.DataFrame(batch, columns=header)
+        finally:
+            workbook.close()
+    elif file_path.endswith(".xls"):
+        df = pd.read_excel(file_path)
+        for start in range(0, len(df), batch_rows):
+            yield df.iloc[start:start + batch_rows]
+    else:
+        raise ValueError("Unsupported file format. Use .csv, .xlsx, or .xls")
+
+# read excel_file .csv or xlsx: one segment per batch of rows, one row per line,
+# location = number of the batch's first row (rows are numbered from 1)
+def excel_segments(file_path, batch_rows=READ_BATCH_ROWS):
+    first_row = 1
+    for df in _table_batches(file_path, batch_rows):
+        texts = rows_text(df)
+        if any(texts):
+            yield "\n".join(texts), {"row": first_row}
+        first_row += len(texts)
+
+# read image (OCR; each frame of a multi-page TIFF is a page)
+def image_segments(file_path, lang=OCR_LANG):
+    pages = ((number, "", image) for number, image in image_pages(file_path))
+    for number, text in ocr_pages(pages, lang):
+        if text:
+            yield text, {"page": number} if number else {}
+
+IMAGE_EXTENSIONS = [".png", ".jpg", ".jpeg", ".tiff", ".bmp"]
+
+SEGMENT_READERS = {
+    ".pdf": pdf_segments,
+    ".pptx": pptx_segments,
+    ".txt": txt_segments,
+    ".docx": docx_segments,
+    ".csv": excel_segments,
+    ".xlsx": excel_segments,
+    ".xls": excel_segments,
+}
+
+# stream any supported file as (text, location) segments
+def iter_segments(file_path):
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext in SEGMENT_READERS:
+        return SEGMENT_READERS[ext](file_path)
+    elif ext in IMAGE_EXTENSIONS:
+        return image_segments(file_path)
+    else:
+        raise ValueError(f"Unsupported file type: {ext}")
@@ -0,0 +1,89 @@
+# modules
+import time
+import threading
+from cache import LRUCache, normalize_query
+from database import hash_text
+from metrics import observe
+from models import reranker_model
+from config import RERANK_MODEL, RERANK_BATCH_SIZE, RERANK_BUDGET_MS, RERANK_CACHE_SIZE
+
+
+# ------------------------
+# Cross-encoder re-ranker
+# ------------------------
+class Reranker:
+    """
+    Re-orders retrieved chunks by a cross-encoder's (question, chunk)
+    relevance score. Pairs are scored in batches of `batch_size`, and scores
+    are cached per (question hash, chunk id): chunk ids are never reused and
+    a chunk's text never changes, so a cached score stays valid. The
+    dense order is kept when the model is not loaded yet (loading starts
+    in the background) or when the next batch would run past `budget`
+    seconds; scores computed so far stay cached for the next time.
+    """
+
+    def __init__(self, model=reranker_model, enabled=RERANK_MODEL is not None, batch_size=RERANK_BATCH_SIZE,
+                 budget=RERANK_BUDGET_MS / 1000, cache_size=RERANK_CACHE_SIZE):
+        self.model = model
+        self.enabled = enabled
+        self.batch_size = batch_size
+        self.budget = budget
+        self.cache = LRUCache("rerank_scores", cache_size)
+        self._warming = False
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "reranked": 0, "not_loaded": 0, "over_budget": 0,
+                       "pairs_scored": 0, "pairs_cached": 0}
+
+    def _count(self, key, n=1):
+        with self._lock:
+            self._stats[key] += n
+
+    def _warm_up(self):
+        with self._lock:
+            if self._warming:
+                return
+            self._warming = True
+        self.model.warm_up()
+
+    def rerank(self, question, chunk_ids, chunks):
+        """Indices into `chunks`, best first (their dense order when reranking is off or out of time)."""
+        dense = list(range(len(chunks)))
+        if not self.enabled or len(chunks) < 2:
+            return dense
+        self._count("requests")
+        if not self.model.loaded:
+            self._warm_up()
+            self._count("not_loaded")
+            return dense
+
+        start = time.perf_counter()
+        deadline = start + self.budget
+        question_key = hash_text(normalize_query(question))
+        scores = [self.cache.get((question_key, chunk_id)) for chunk_id in chunk_ids]
+        missing = [i for i, score in enumerate(scores) if score is None]
+        self._count("pairs_cached", len(chunks) - len(missing))
+        batch_seconds = 0.0
+        for begin in range(0, len(missing), self.batch_size):
+            # stop before a batch that would not finish in time
+            if time.perf_counter() + batch_seconds > deadline:
+                self._count("over_budget")
+                observe("rerank", time.perf_counter() - start)
+                return dense
+            batch = missing[begin:begin + self.batch_size]
+            batch_start = time.perf_counter()
+            predicted = self.model.get().predict([(question, chunks[i]) for i in batch],
+                                                 batch_size=len(batch), show_progress_bar=False)
+            batch_seconds = time.perf_counter() - batch_start
+            for i, score in zip(batch, predicted):
+                scores[i] = float(score)
+                self.cache.put((question_key, chunk_ids[i]), scores[i])
+            self._count("pairs_scored", len(batch))
+
+        self._count("reranked")
+        observe("rerank", time.perf_counter() - start)
+        # ties keep the dense order
+        return sorted(dense, key=lambda i: -scores[i])
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, enabled=self.enabled, loaded=self.model.loaded)
@@ -0,0 +1,269 @@
+# modules
+import os
+import threading
+import numpy as np
+import database
+from bm25 import reciprocal_rank_fusion
+from vector_index import normalize, top_k_indices
+from config import (
+    DB_PATH, RETRIEVER, IVF_NLIST, IVF_NPROBE,
+    RETRIEVAL_MODE, HYBRID_CANDIDATES, BM25_PREFILTER_CANDIDATES,
+)
+
+# IVF index file lives next to the SQLite DB
+IVF_PATH = os.path.splitext(DB_PATH)[0] + ".ivf.npz"
+
+# below this many points per list, k-means is not worth it
+MIN_POINTS_PER_LIST = 39
+
+_retriever = None
+_retriever_lock = threading.Lock()
+
+
+# ------------------------
+# Exact (brute-force) backend
+# ------------------------
+class ExactRetriever:
+    """Scores the query against every row of the vector index."""
+    name = "exact"
+
+    def __init__(self, index):
+        self.index = index
+
+    def search(self, query_vector, top_k=3, query=None):
+        return self.index.search(query_vector, top_k)
+
+    def update(self):
+        pass
+
+
+# ------------------------
+# IVF (approximate) backend
+# ------------------------
+def kmeans(vectors, n_clusters, n_iter=15, seed=0):
+    """Spherical k-means on normalized vectors; returns normalized centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), n_clusters, replace=False)].copy()
+    for _ in range(n_iter):
+        assign = assign_to_centroids(vectors, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, vectors)
+        counts = np.bincount(assign, minlength=n_clusters)
+        empty = counts == 0
+        # re-seed empty clusters with random points
+        if empty.any():
+            sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()), replace=False)]
+        centroids = normalize(sums)
+    return centroids
+
+
+def assign_to_centroids(vectors, centroids, batch_size=16384):
+    assign = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), batch_size):
+        scores = vectors[start:start + batch_size] @ centroids.T
+        assign[start:start + batch_size] = scores.argmax(axis=1)
+    return assign
+
+
+class IVFRetriever:
+    """
+    Inverted-file index: a k-means coarse quantizer splits the vectors into
+    `nlist` lists and a query only scores the rows in its `nprobe` closest
+    lists. Rows appended to the vector index after the last `update()` are
+    still scored exhaustively, so results never miss fresh chunks. Rows of
+    deleted chunks stay in their lists as tombstones (id -1, never returned)
+    until compaction rewrites the vector file and the lists are rebuilt.
+    """
+    name = "ivf"
+
+    def __init__(self, index, path=IVF_PATH, nlist=IVF_NLIST, nprobe=IVF_NPROBE):
+        self.index = index
+        self.path = path
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.centroids = None
+        self._assign = np.empty(0, dtype=np.int32)
+        self._lists = []
+        self._lock = threading.Lock()
+        if not self._load():
+            self.train()
+
+    @property
+    def trained(self):
+        return self.centroids is not None
+
+    def _n_assigned(self):
+        return len(self._assign)
+
+    def _build_lists(self):
+        order = np.argsort(self._assign, kind="stable")
+        bounds = np.searchsorted(self._assign[order], np.arange(len(self.centroids) + 1))
+        self._lists = [order[bounds[i]:bounds[i + 1]].astype(np.int64) for i in range(len(self.centroids))]
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return False
+        try:
+            data = np.load(self.path)
+            centroids, ids, assign = data["centroids"], data["ids"], data["assign"]
+            saved_generation = str(data["generation"]) if "generation" in data.files else None
+        except Exception as e:
+            print(f"[IVF] could not load {self.path}: {e}")
+            return False
+        # the saved assignment must describe a prefix of the current index
+        if len(assign) > len(self.index):
+            return False
+        generation = self.index.generation
+        if generation is not None:
+            # store rows never change (deletes only tombstone ids), until the file is rewritten
+            if saved_generation != generation:
+                return False
+        elif not np.array_equal(ids, self.index.ids[:len(ids)]):
+            return False
+        self.centroids, self._assign = centroids, assign.astype(np.int32)
+        self._build_lists()
+        self.update()
+        return True
+
+    def save(self):
+        if not self.trained:
+            return
+        tmp_path = self.path + ".tmp.npz"
+        np.savez(tmp_path, centroids=self.centroids, ids=self.index.ids[:self._n_assigned()],
+                 assign=self._assign, generation=str(self.index.generation or ""))
+        os.replace(tmp_path, self.path)
+
+    def train(self, sample_size=None):
+        """(Re)build the coarse quantizer from the current vectors."""
+        matrix = self.index.matrix
+        if len(matrix) < self.nlist * MIN_POINTS_PER_LIST:
+            return False
+        sample_size = sample_size or self.nlist * 256
+        if len(matrix) > sample_size:
+            rows = np.random.default_rng(0).choice(len(matrix), sample_size, replace=False)
+            sample = matrix[np.sort(rows)]
+        else:
+            sample = matrix
+        with self._lock:
+            self.centroids = kmeans(sample, self.nlist)
+            self._assign = assign_to_centroids(matrix, self.centroids)
+            self._build_lists()
+        self.save()
+        return True
+
+    def update(self):
+        """Assign rows added since the last update to their lists and persist."""
+        if not self.trained:
+            return self.train()
+        matrix = self.index.matrix
+        start = self._n_assigned()
+        if start >= len(matrix):
+            return False
+        new_assign = assign_to_centroids(matrix[start:], self.centroids)
+        with self._lock:
+            for c in np.unique(new_assign):
+                rows = start + np.flatnonzero(new_assign == c)
+                self._lists[c] = np.concatenate([self._lists[c], rows])
+            self._assign = np.concatenate([self._assign, new_assign])
+        self.save()
+        return True
+
+    def search(self, query_vector, top_k=3, query=None):
+        if not self.trained:
+            return self.index.search(query_vector, top_k)
+        q = normalize(query_vector).reshape(-1)
+        with self._lock:
+            probes = top_k_indices(self.centroids @ q, self.nprobe)
+            rows = [self._lists[c] for c in probes]
+            # rows not yet assigned to a list are scored exhaustively
+            rows.append(np.arange(self._n_assigned(), len(self.index)))
+        return self.index.search_rows(q, np.concatenate(rows), top_k)
+
+
+# ------------------------
+# Keyword (FTS5 BM25) + dense
+# ------------------------
+class HybridRetriever:
+    """
+    Adds SQLite FTS5 keyword matches to a dense backend, for exact
+    identifiers (course codes, student IDs) that embeddings blur.
+    "hybrid" fuses the BM25 and dense rankings with reciprocal rank fusion;
+    "bm25_prefilter" scores vectors only for the top BM25 matches, topped up
+    from the dense backend when fewer than top_k chunks match.
+    """
+    name = "hybrid"
+
+    def __init__(self, dense, mode=RETRIEVAL_MODE, candidates=HYBRID_CANDIDATES,
+                 prefilter=BM25_PREFILTER_CANDIDATES):
+        self.dense = dense
+        self.index = dense.index
+        self.mode = mode
+        self.candidates = candidates
+        self.prefilter = prefilter
+
+    def update(self):
+        return self.dense.update()
+
+    def _keyword_rows(self, query, limit):
+        """Index rows of the BM25 matches, best first (one per stored vector)."""
+        ids = self.index.ids
+        rows = [vec_row for _, vec_row in database.search_fts(query, limit)
+                if vec_row < len(ids) and ids[vec_row] >= 0]
+        # chunks sharing a vector come back as the row's canonical chunk id
+        return np.array(list(dict.fromkeys(rows)), dtype=np.int64)
+
+    def search(self, query_vector, top_k=3, query=None):
+        if not query:
+            return self.dense.search(query_vector, top_k)
+        if self.mode == "bm25_prefilter":
+            rows = self._keyword_rows(query, self.prefilter)
+            if len(rows) == 0:
+                return self.dense.search(query_vector, top_k)
+            ids, scores = self.index.search_rows(query_vector, np.sort(rows), top_k)
+            if len(ids) < top_k:
+                # too few keyword matches: fill up with the best dense hits
+                more_ids, more_scores = self.dense.search(query_vector, top_k + len(ids))
+                keep = ~np.isin(more_ids, ids)
+                ids = np.concatenate([ids, more_ids[keep]])[:top_k]
+                scores = np.concatenate([scores, more_scores[keep]])[:top_k]
+            return ids, scores
+
+        fetch_k = max(top_k, self.candidates)
+        dense_ids, _ = self.dense.search(query_vector, fetch_k)
+        keyword_ids = self.index.ids[self._keyword_rows(query, fetch_k)]
+        ids, scores = reciprocal_rank_fusion([dense_ids.tolist(), keyword_ids.tolist()],
+                                             top_k=top_k, with_scores=True)
+        return np.array(ids, dtype=np.int64), np.array(scores, dtype=np.float32)
+
+
+# ------------------------
+# Retriever factory
+# ------------------------
+BACKENDS = {
+    "exact": ExactRetriever,
+    "ivf": IVFRetriever,
+}
+
+MODES = ("dense", "hybrid", "bm25_prefilter")
+
+
+def get_retriever():
+    """Shared retriever over the current vector index (rebuilt if the index was invalidated)."""
+    global _retriever
+    index = database.get_vector_index()
+    if _retriever is None or _retriever.index is not index:
+        with _retriever_lock:
+            if _retriever is None or _retriever.index is not index:
+                if RETRIEVER not in BACKENDS:
+                    raise ValueError(f"Unknown retriever: {RETRIEVER}. Use one of {list(BACKENDS)}")
+                if RETRIEVAL_MODE not in MODES:
+                    raise ValueError(f"Unknown retrieval mode: {RETRIEVAL_MODE}. Use one of {list(MODES)}")
+                backend = BACKENDS[RETRIEVER](index)
+                _retriever = backend if RETRIEVAL_MODE == "dense" else HybridRetriever(backend)
+    return _retriever
+
+
+def update_retriever():
+    """Fold newly saved chunks into the loaded retriever (no-op if none is loaded)."""
+    if _retriever is not None:
+        _retriever.update()
@@ -0,0 +1,219 @@
+# modules
+import time
+import threading
+import numpy as np
+import db_sqlserver
+from bm25 import BM25Index, reciprocal_rank_fusion
+from vector_index import VectorIndex, top_k_indices
+from config import SQL_CONTEXT_TTL, SQL_ROW_RETRIEVAL, SQL_TOP_K_ROWS
+
+
+# ------------------------
+# Row rendering
+# ------------------------
+def render_rows(table, df):
+    """Render every row as 'table: col=value, ...' with vectorized string ops."""
+    if df.empty:
+        return []
+    text = None
+    for col in df.columns:
+        # newer pandas keeps missing values as NaN through astype(str)
+        part = f"{col}=" + df[col].astype(str).fillna("nan")
+        text = part if text is None else text + ", " + part
+    return (f"{table}: " + text).tolist()
+
+
+# ------------------------
+# Table snapshot cache
+# ------------------------
+class TableSnapshot:
+    def __init__(self, table, signature, rows, error=False):
+        self.table = table
+        self.signature = signature
+        self.rows = rows
+        self.error = error  # rows is the read error, as text
+        self.checked_at = time.monotonic()
+
+
+class SqlContextCache:
+    """
+    In-process snapshots of the structured tables. A snapshot is served
+    as-is for `ttl` seconds; after that a cheap signature query
+    (db_sqlserver.get_table_signature) decides whether the table is
+    re-read, so unchanged tables cost one small query per TTL.
+    """
+
+    def __init__(self, ttl=SQL_CONTEXT_TTL):
+        self.ttl = ttl
+        self._tables = None
+        self._tables_checked_at = 0.0
+        self._snapshots = {}
+        self._lock = threading.Lock()
+
+    def _table_names(self, now):
+        if self._tables is None or now - self._tables_checked_at >= self.ttl:
+            self._tables = db_sqlserver.get_all_tables()
+            self._tables_checked_at = now
+        return self._tables
+
+    def _refresh(self, table, now):
+        snapshot = self._snapshots.get(table)
+        if snapshot is not None and now - snapshot.checked_at < self.ttl:
+            return snapshot
+        signature = db_sqlserver.get_table_signature(table)
+        if snapshot is not None and not snapshot.error and snapshot.signature == signature:
+            snapshot.checked_at = now
+            return snapshot
+        df = db_sqlserver.fetch_data(f"SELECT * FROM [{table}]")
+        snapshot = TableSnapshot(table, signature, render_rows(table, df))
+        self._snapshots[table] = snapshot
+        return snapshot
+
+    def snapshots(self):
+        """Current snapshots (refreshing stale ones); unreadable tables are reported as text."""
+        now = time.monotonic()
+        with self._lock:
+            tables = self._table_names(now)
+            result = []
+            for table in tables:
+                try:
+                    result.append(self._refresh(table, now))
+                except Exception as e:
+                    # kept for the TTL too, so an unreadable table is not retried on every question
+                    snapshot = TableSnapshot(table, None, [f"Could not read table {table}: {e}"], error=True)
+                    self._snapshots[table] = snapshot
+                    result.append(snapshot)
+            # forget dropped tables
+            for table in set(self._snapshots) - set(tables):
+                del self._snapshots[table]
+        return result
+
+
+# ------------------------
+# Row-level retrieval
+# ------------------------
+class RowIndex:
+    """Indexes over one set of table snapshots (replaced whole, never mutated)."""
+
+    def __init__(self, snapshots, rows, tables, bm25):
+        self.snapshots = snapshots
+        self.key = tuple(id(snapshot) for snapshot in snapshots)
+        self.rows = rows
+        self.tables = tables  # [(offset of the table's first row, VectorIndex)]
+        self.bm25 = bm25
+
+
+class RowRetriever:
+    """
+    Indexes the rendered table rows so only the rows relevant to a question
+    go into the prompt. The index is built off the request path: by
+    warm_up(), then by a background refresh when a snapshot changes, and
+    questions use the last index built meanwhile. Each table has its own
+    vector index, so a changed table embeds only its new or modified rows
+    and the other tables' indexes are kept.
+    """
+
+    def __init__(self, cache, encode, mode=SQL_ROW_RETRIEVAL, top_k=SQL_TOP_K_ROWS):
+        if mode not in ("dense", "bm25", "hybrid", "all"):
+            raise ValueError(f"Unknown row retrieval mode: {mode}")
+        self.cache = cache
+        self.encode = encode
+        self.mode = mode
+        self.top_k = top_k
+        self._index = None
+        self._table_indexes = {}  # table -> (snapshot, VectorIndex)
+        self._refreshing = False
+        self._lock = threading.Lock()
+
+    def _snapshots(self):
+        # unreadable tables have no rows to index
+        return [snapshot for snapshot in self.cache.snapshots() if not snapshot.error]
+
+    def _table_index(self, snapshot):
+        old_snapshot, old_index = self._table_indexes.get(snapshot.table, (None, None))
+        if old_snapshot is snapshot:
+            return old_index
+        # rows the table already had keep their vectors
+        known = dict(zip(old_snapshot.rows, old_index.matrix)) if old_snapshot is not None else {}
+        new_rows = [row for row in dict.fromkeys(snapshot.rows) if row not in known]
+        if new_rows:
+            vectors = self.encode(new_rows, batch_size=64, convert_to_numpy=True)
+            known.update(zip(new_rows, vectors))
+        index = VectorIndex()
+        if snapshot.rows:
+            index.add(np.arange(len(snapshot.rows)), np.vstack([known[row] for row in snapshot.rows]))
+        return index
+
+    def _build(self, snapshots):
+        rows = [row for snapshot in snapshots for row in snapshot.rows]
+        tables = []
+        if self.mode in ("dense", "hybrid"):
+            table_indexes, offset = {}, 0
+            for snapshot in snapshots:
+                index = self._table_index(snapshot)
+                table_indexes[snapshot.table] = (snapshot, index)
+                tables.append((offset, index))
+                offset += len(snapshot.rows)
+            # dropped tables are forgotten
+            self._table_indexes = table_indexes
+        bm25 = BM25Index(rows) if self.mode in ("bm25", "hybrid") else None
+        return RowIndex(snapshots, rows, tables, bm25)
+
+    def refresh(self):
+        """Bring the index up to date with the table snapshots (blocking)."""
+        try:
+            snapshots = self._snapshots()
+            index = self._index
+            if index is None or index.key != tuple(id(snapshot) for snapshot in snapshots):
+                self._index = self._build(snapshots)
+        except Exception as e:
+            print(f"[DB Error] row index: {e}")
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def warm_up(self):
+        """Build (or update) the index in a background thread; at most one build runs at a time."""
+        if self.mode == "all":
+            return
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self.refresh, name="row-index", daemon=True).start()
+
+    def search(self, question, query_vector=None, top_k=None):
+        """Rows most relevant to `question` (every row in 'all' mode)."""
+        top_k = top_k or self.top_k
+        if self.mode == "all":
+            return [row for snapshot in self.cache.snapshots() for row in snapshot.rows]
+        # hybrid over-fetches from each side before fusing
+        fetch_k = top_k * 3 if self.mode == "hybrid" else top_k
+        snapshots = self._snapshots()
+        index = self._index
+        if index is None or index.key != tuple(id(snapshot) for snapshot in snapshots):
+            self.warm_up()
+        if index is None:
+            # nothing built yet: rank the current rows by keywords meanwhile
+            rows = [row for snapshot in snapshots for row in snapshot.rows]
+            return [rows[i] for i in BM25Index(rows).search(question, top_k)[0].tolist()]
+
+        rankings = []
+        if any(len(table) for _, table in index.tables):
+            if query_vector is None:
+                query_vector = self.encode(question, convert_to_numpy=True)
+            ids, scores = [], []
+            for offset, table in index.tables:
+                table_ids, table_scores = table.search(query_vector, fetch_k)
+                ids.append(table_ids + offset)
+                scores.append(table_scores)
+            ids, scores = np.concatenate(ids), np.concatenate(scores)
+            rankings.append(ids[top_k_indices(scores, fetch_k)].tolist())
+        if index.bm25 is not None:
+            rankings.append(index.bm25.search(question, fetch_k)[0].tolist())
+        hits = reciprocal_rank_fusion(rankings, top_k=top_k) if len(rankings) > 1 else (rankings or [[]])[0]
+        return [index.rows[i] for i in hits]
+
+
+# shared cache for the app
+sql_context_cache = SqlContextCache()
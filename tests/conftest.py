@@ -0,0 +1,30 @@
+# modules
+import os
+import sys
+import tempfile
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# everything the app writes goes to a scratch dir; set before config is imported
+TEST_DIR = tempfile.mkdtemp(prefix="rag-tests-")
+os.environ["DB_PATH"] = os.path.join(TEST_DIR, "test.db")
+os.environ["OCR_CACHE_PATH"] = os.path.join(TEST_DIR, "ocr_cache.db")
+os.environ["EMBED_WARMUP"] = "0"
+os.environ["CHUNK_OVERLAP"] = "4"
+os.environ["INGEST_WORKERS"] = "2"
+# small batches, so test files are saved in several
+os.environ["INGEST_CHUNK_BATCH"] = "8"
+sys.path.insert(0, ROOT)
+
+import models
+
+# offline embedding model and tokenizer, swapped in before anything loads them
+embedder = models.use_offline_models(64)
+
+
+@pytest.fixture
+def encoded():
+    """Number of texts embedded since the fixture was requested: call it to read."""
+    start = embedder.encoded
+    return lambda: embedder.encoded - start
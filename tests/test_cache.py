@@ -0,0 +1,40 @@
+# modules
+import numpy as np
+import cache
+from cache import LRUCache, SemanticAnswerCache, normalize_query
+
+
+def test_lru_evicts_the_least_recently_used_and_expires_old_entries(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    lru = LRUCache("test_lru", max_size=2, ttl=10, register=False)
+    lru.put("a", 1)
+    lru.put("b", 2)
+    assert lru.get("a") == 1
+    lru.put("c", 3)
+    # "b" was used least recently
+    assert lru.get("b") is None
+    assert (lru.get("a"), lru.get("c")) == (1, 3)
+
+    now[0] = 11.0
+    assert lru.get("a") is None
+    stats = lru.stats()
+    assert (stats["evictions"], stats["expired"], stats["size"]) == (1, 1, 1)
+
+
+def test_question_keys_ignore_case_and_spacing():
+    assert normalize_query("  What is   CS101?\n") == normalize_query("what is cs101?")
+
+
+def test_answer_is_reused_for_a_similar_question_over_the_same_context():
+    answers = SemanticAnswerCache("test_answers", threshold=0.95)
+    question = np.array([1.0, 0.0, 0.0])
+    answers.put(question, "context", "answer", version=1)
+
+    assert answers.get(np.array([1.0, 0.05, 0.0]), "context", version=1) == "answer"
+    # another question, or the same one over other context
+    assert answers.get(np.array([0.0, 1.0, 0.0]), "context", version=1) is None
+    assert answers.get(question, "other context", version=1) is None
+    # documents were ingested or deleted since
+    assert answers.get(question, "context", version=2) is None
+    assert answers.stats()["invalidations"] == 1
@@ -0,0 +1,44 @@
+# modules
+from chunker import TokenChunker, split_sentences
+
+
+def _words(texts):
+    return [len(text.split()) for text in texts]
+
+
+def _sentence(i, words=5):
+    return " ".join(f"s{i}w{j}" for j in range(words - 1)) + f" s{i}end."
+
+
+def test_chunks_pack_whole_sentences_with_overlap():
+    text = " ".join(_sentence(i) for i in range(20))
+    chunks = list(TokenChunker(max_tokens=20, overlap=5, min_tokens=0, count=_words).chunks([(text, {})]))
+
+    assert all(len(chunk.split()) <= 20 for chunk, _ in chunks)
+    # every chunk is made of whole sentences
+    assert all(chunk.startswith("s") and chunk.endswith("end.") for chunk, _ in chunks)
+    # the last sentence of a chunk starts the next one
+    for (previous, _), (chunk, _) in zip(chunks, chunks[1:]):
+        assert chunk.startswith(split_sentences(previous)[-1])
+    assert all(f"s{i}end." in " ".join(chunk for chunk, _ in chunks) for i in range(20))
+
+
+def test_chunks_never_cross_pages():
+    segments = [(_sentence(1) + " " + _sentence(2), {"page": 1}), (_sentence(3), {"page": 2})]
+    chunks = list(TokenChunker(max_tokens=50, overlap=5, min_tokens=0, count=_words).chunks(segments))
+    assert chunks == [(_sentence(1) + " " + _sentence(2), {"page": 1}), (_sentence(3), {"page": 2})]
+
+
+def test_table_rows_stay_whole_and_keep_their_range():
+    rows = "\n".join(f"id={i}, name=n{i}, city=c{i}" for i in range(10))
+    chunks = list(TokenChunker(max_tokens=6, overlap=0, min_tokens=0, count=_words).chunks([(rows, {"row": 100})]))
+    assert [location for _, location in chunks] == [
+        {"row_start": 100 + i, "row_end": 101 + i} for i in range(0, 10, 2)]
+    assert chunks[0][0] == "id=0, name=n0, city=c0 id=1, name=n1, city=c1"
+
+
+def test_long_sentence_is_cut_and_tiny_tail_is_folded():
+    long_sentence = " ".join(f"w{i}" for i in range(45)) + "."
+    chunks = list(TokenChunker(max_tokens=20, overlap=0, min_tokens=8, count=_words).chunks([(long_sentence, {})]))
+    assert [len(chunk.split()) for chunk, _ in chunks] == [20, 25]
+    assert " ".join(chunk for chunk, _ in chunks) == long_sentence
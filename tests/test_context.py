@@ -0,0 +1,44 @@
+# modules
+import numpy as np
+from context import ContextBudgeter
+
+
+def _words(texts):
+    return [len(text.split()) for text in texts]
+
+
+def _text(word, n):
+    return " ".join([word] * n)
+
+
+def test_context_fits_the_budget_in_priority_order():
+    budgeter = ContextBudgeter(budget=200, priority="documents,rows", max_chunks=5, max_row_tokens=10,
+                               dedup_threshold=0.99, count=_words)
+    chunks = [_text("a", 60), _text("b", 60), _text("c", 60), _text("d", 60)]
+    vectors = np.eye(4, dtype=np.float32)
+    vectors[1] = vectors[0]  # chunk b repeats chunk a
+    rows = [_text("r", 20), _text("s", 5)]
+
+    kept_chunks, kept_rows, stats = budgeter.fit(_text("fixed", 20), chunks, rows, vectors)
+    assert stats["chunks_duplicate"] == 1
+    # 180 tokens left: a, c and d fill them exactly
+    assert kept_chunks == chunks[:1] + chunks[2:]
+    # documents took the whole budget, so no rows are left
+    assert kept_rows == []
+    assert stats["total_tokens"] == 200
+
+    budgeter.priority = ["rows", "documents"]
+    kept_chunks, kept_rows, stats = budgeter.fit(_text("fixed", 20), chunks, rows, vectors)
+    # long rows are cut to max_row_tokens
+    assert kept_rows == [_text("r", 10), _text("s", 5)]
+    assert stats["rows_truncated"] == 1
+    assert [len(chunk.split()) for chunk in kept_chunks] == [60, 60, 45]
+    assert stats["total_tokens"] <= 200
+
+
+def test_a_chunk_too_small_to_cut_is_dropped():
+    budgeter = ContextBudgeter(budget=100, priority="documents,rows", dedup_threshold=1, count=_words)
+    kept_chunks, _, stats = budgeter.fit("", [_text("a", 80), _text("b", 80)], [])
+    # only 20 tokens are left for b, below MIN_TRUNCATED_TOKENS
+    assert kept_chunks == [_text("a", 80)]
+    assert stats["chunks_over_budget"] == 1
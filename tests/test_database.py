@@ -0,0 +1,55 @@
+# modules
+import os
+import glob
+import ingest
+import database
+import retriever
+from models import embedding_model
+from config import DB_PATH
+
+
+def _ingest(tmp_path, name, word):
+    path = tmp_path / name
+    path.write_text("\n".join(" ".join(f"{word}{i}x{j}" for j in range(10)) + "." for i in range(30)),
+                    encoding="utf-8")
+    results = list(ingest.ingest_results([str(path)], 32))
+    assert results[0]["status"] == "done"
+    return str(path)
+
+def _search(text, top_k=5):
+    chunk_ids, _ = retriever.get_retriever().search(embedding_model.encode(text), top_k)
+    return database.get_chunks_by_ids([int(i) for i in chunk_ids])
+
+
+def test_deleted_document_is_not_found_and_compact_reclaims_its_vectors(tmp_path):
+    kept = _ingest(tmp_path, "kept.txt", "keptword")
+    deleted = _ingest(tmp_path, "deleted.txt", "gone")
+    assert any("gone3x" in chunk for chunk in _search("gone3x0 gone3x1"))
+
+    assert database.delete_document(deleted) > 0
+    assert database.delete_document(deleted) is None
+    assert deleted not in database.list_document_paths()
+    # tombstoned in the loaded index at once
+    assert not any("gone" in chunk for chunk in _search("gone3x0 gone3x1", top_k=50))
+    dead = database.storage_stats()["dead_rows"]
+    assert dead > 0
+
+    stats = database.compact()
+    assert stats["reclaimed_rows"] == dead
+    assert stats["dead_rows"] == 0
+    assert any("keptword3x" in chunk for chunk in _search("keptword3x0 keptword3x1"))
+    assert kept in database.list_document_paths()
+
+
+def test_clear_all_removes_the_vector_files_and_ivf_lists(tmp_path):
+    _ingest(tmp_path, "cleared.txt", "cleared")
+    base = os.path.splitext(DB_PATH)[0]
+    # as left by the IVF retriever
+    open(base + ".ivf.npz", "wb").close()
+    assert glob.glob(base + ".vectors*")
+
+    database.clear_all()
+    assert database.list_document_paths() == []
+    assert glob.glob(base + ".vectors*") == []
+    assert not os.path.exists(base + ".ivf.npz")
+    assert len(retriever.get_retriever().index) == 0
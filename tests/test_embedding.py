@@ -0,0 +1,46 @@
+# modules
+import threading
+import numpy as np
+from embedding import EmbeddingService, INTERACTIVE, BULK
+
+
+class Model:
+    """Records the texts of every encode call; a text's vector is [its length]."""
+
+    def __init__(self):
+        self.calls = []
+        self.entered = threading.Event()
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def encode(self, texts, batch_size=None, convert_to_numpy=True):
+        self.calls.append(list(texts))
+        self.entered.set()
+        self.gate.wait()
+        return np.array([[len(text)] for text in texts], dtype=np.float32)
+
+
+def test_concurrent_queries_are_encoded_in_one_batch():
+    model = Model()
+    service = EmbeddingService(model, max_batch=3, max_wait=5)
+    futures = [service.submit([text]) for text in ("a", "bb", "ccc")]
+    assert [future.result(5).tolist() for future in futures] == [[[1]], [[2]], [[3]]]
+    assert model.calls == [["a", "bb", "ccc"]]
+    # a lone query waits at most max_wait for company
+    service.max_wait = 0
+    assert service.encode("dddd").tolist() == [4]
+
+
+def test_queries_go_before_the_rest_of_a_bulk_request():
+    model = Model()
+    model.gate.clear()
+    service = EmbeddingService(model, max_batch=8, max_wait=0)
+    bulk = service.submit(["b1", "b2", "b3"], BULK, batch_size=1)
+    # the first bulk slice is being encoded when the query arrives
+    assert model.entered.wait(5)
+    query = service.submit(["query"], INTERACTIVE)
+    model.gate.set()
+
+    assert query.result(5).tolist() == [[5]]
+    assert bulk.result(5).tolist() == [[2], [2], [2]]
+    assert model.calls == [["b1"], ["query"], ["b2"], ["b3"]]
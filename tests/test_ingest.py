@@ -0,0 +1,189 @@
+# modules
+import os
+import queue
+import threading
+from concurrent.futures.process import BrokenProcessPool
+import ingest
+import database
+import metrics
+
+
+def _chunk_job(file_path, chunks):
+    chunk_hashes, embed_idx = ingest.plan_embeddings(chunks)
+    return dict(file_path=file_path, chunks=chunks, locations=[{}] * len(chunks),
+                chunk_hashes=chunk_hashes, embed_idx=embed_idx, last=False,
+                watermark=database.get_document_watermark(file_path))
+
+
+def _write(path, text):
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+def _document(word, sentences, edited=None):
+    # one sentence of distinct words per line; `edited` rewrites one of them
+    # (vectors are shared across documents, so each test uses its own `word`)
+    lines = [" ".join(f"{word}{i}x{j}" for j in range(10)) + "." for i in range(sentences)]
+    if edited is not None:
+        lines[edited] = " ".join(f"edited{word}{j}" for j in range(10)) + "."
+    return "\n".join(lines)
+
+def _stored_chunks(file_path):
+    with database.get_connection() as conn:
+        return [text for (text,) in conn.execute(
+            "SELECT c.chunk_text FROM chunks c JOIN documents d ON d.id = c.document_id "
+            "WHERE d.file_path = ? ORDER BY c.id", (file_path,))]
+
+
+# ------------------------
+# Pipeline stages
+# ------------------------
+def test_file_done_is_reported_without_further_input(tmp_path):
+    ingest._ensure_db()
+    file_path = str(tmp_path / "streamed.txt")
+    embed_q, embedded_q, write_q, results = queue.Queue(), queue.Queue(), queue.Queue(), queue.Queue()
+    threading.Thread(target=ingest._embed_stage, args=(embed_q, embedded_q, 32), daemon=True).start()
+    threading.Thread(target=ingest._write_stage, args=(write_q, results), daemon=True).start()
+
+    # the file's final job arrives once the stages are idle, and then nothing (no _DONE)
+    embed_q.put(_chunk_job(file_path, ["alpha beta gamma", "delta epsilon"]))
+    write_q.put(embedded_q.get(timeout=10))
+    embed_q.put(dict(file_path=file_path, chunks=[], embed_idx=[], last=True, content_hash="h1",
+                    watermark=0))
+    write_q.put(embedded_q.get(timeout=10))
+
+    result = results.get(timeout=10)
+    assert result["file_path"] == file_path
+    assert result["status"] == "done"
+    assert result["stats"]["rows"] == 2
+    assert database.get_document_hash(file_path) == "h1"
+    embed_q.put(ingest._DONE)
+
+
+def test_batch_of_known_chunks_is_not_held_back(tmp_path):
+    ingest._ensure_db()
+    file_path = str(tmp_path / "known.txt")
+    ingest.ingest_file(_write(tmp_path / "seed.txt", "zeta eta theta"), chunk_size=32)
+    embed_q, write_q = queue.Queue(), queue.Queue()
+    threading.Thread(target=ingest._embed_stage, args=(embed_q, write_q, 32), daemon=True).start()
+
+    job = _chunk_job(file_path, ["zeta eta theta"])
+    assert job["embed_idx"] == []
+    embed_q.put(job)
+    assert write_q.get(timeout=10) is job
+    embed_q.put(ingest._DONE)
+    assert write_q.get(timeout=10) is ingest._DONE
+
+
+def test_chunk_shared_with_a_failed_file_is_embedded_again(tmp_path):
+    ingest._ensure_db()
+    failed_path, ok_path = str(tmp_path / "failed.txt"), str(tmp_path / "ok.txt")
+    write_q, results = queue.Queue(), queue.Queue()
+    threading.Thread(target=ingest._write_stage, args=(write_q, results), daemon=True).start()
+
+    # both files have "shared chunk words"; only the first file's batch was to embed it
+    failed = _chunk_job(failed_path, ["shared chunk words"])
+    ok = _chunk_job(ok_path, ["shared chunk words", "only in the second file"])
+    ok["embed_idx"] = [1]
+    failed.update(vectors=[None], error=RuntimeError("encoder crashed"))
+    ok["vectors"] = [None, ingest.model.encode(["only in the second file"])[0]]
+    write_q.put(failed)
+    write_q.put(ok)
+    write_q.put(dict(file_path=ok_path, chunks=[], embed_idx=[], last=True, content_hash="h2", watermark=0))
+
+    assert results.get(timeout=10)["status"] == "failed"
+    result = results.get(timeout=10)
+    assert (result["file_path"], result["status"]) == (ok_path, "done"), result["message"]
+    assert _stored_chunks(ok_path) == ["shared chunk words", "only in the second file"]
+    write_q.put(ingest._DONE)
+
+
+# ------------------------
+# Re-ingesting a file saved in several batches
+# ------------------------
+def test_reingest_reuses_vectors_across_batches(tmp_path, encoded):
+    file_path = _write(tmp_path / "notes.txt", _document("notes", 120))
+    ingest.ingest_file(file_path, chunk_size=24)
+    first = _stored_chunks(file_path)
+    assert len(first) > 3 * ingest.INGEST_CHUNK_BATCH
+
+    # one sentence changed: only the chunks around it are embedded again
+    _write(tmp_path / "notes.txt", _document("notes", 120, edited=60))
+    before = encoded()
+    ingest.ingest_file(file_path, chunk_size=24)
+    assert 0 < encoded() - before <= 3
+    second = _stored_chunks(file_path)
+    assert len(second) == len(first)
+    assert any("editednotes" in chunk for chunk in second)
+    assert not any("notes60x5" in chunk for chunk in second)
+
+
+def test_reingest_pipeline_reuses_vectors_across_batches(tmp_path, encoded):
+    file_path = _write(tmp_path / "report.txt", _document("report", 120))
+    [result] = ingest.ingest_results([file_path], chunk_size=24)
+    assert result["status"] == "done"
+    first = _stored_chunks(file_path)
+    assert len(first) > 3 * ingest.INGEST_CHUNK_BATCH
+
+    _write(tmp_path / "report.txt", _document("report", 120, edited=60))
+    before = encoded()
+    [result] = ingest.ingest_results([file_path], chunk_size=24)
+    assert result["status"] == "done", result["message"]
+    assert 0 < encoded() - before <= 3
+    second = _stored_chunks(file_path)
+    assert len(second) == len(first)
+    assert not any("report60x5" in chunk for chunk in second)
+    assert database.get_document_hash(file_path) == database.hash_file(file_path)
+
+
+def test_failed_reingest_keeps_previous_version(tmp_path, monkeypatch):
+    file_path = _write(tmp_path / "kept.txt", _document("kept", 60))
+    ingest.ingest_file(file_path, chunk_size=24)
+    first = _stored_chunks(file_path)
+    old_hash = database.get_document_hash(file_path)
+
+    _write(tmp_path / "kept.txt", _document("kept", 60, edited=50))
+    save_batch = ingest._save_batch
+    saved = []
+
+    def failing_save(*args):
+        if saved:
+            raise RuntimeError("disk full")
+        saved.append(save_batch(*args))
+        return saved[-1]
+
+    monkeypatch.setattr(ingest, "_save_batch", failing_save)
+    try:
+        ingest.ingest_file(file_path, chunk_size=24)
+    except RuntimeError:
+        pass
+    else:
+        raise AssertionError("ingest_file should fail")
+    assert _stored_chunks(file_path) == first
+    assert database.get_document_hash(file_path) == old_hash
+
+
+# ------------------------
+# Timings from the reader processes
+# ------------------------
+def test_reader_timings_are_recorded_by_the_parent(tmp_path):
+    file_path = _write(tmp_path / "timed.txt", _document("timed", 20))
+    counts = {stage: metrics.get_histogram(stage).snapshot()[2] for stage in ("read.txt", "ingest.read")}
+    [result] = ingest.ingest_results([file_path], chunk_size=24)
+    assert result["status"] == "done"
+    for stage, count in counts.items():
+        assert metrics.get_histogram(stage).snapshot()[2] == count + 1
+
+
+# ------------------------
+# Reader processes
+# ------------------------
+def test_ingest_recovers_from_a_crashed_reader_process(tmp_path):
+    pool, _ = ingest._get_reader_pool()
+    # a worker process that dies breaks the whole pool
+    try:
+        pool.submit(os._exit, 1).result(timeout=30)
+    except BrokenProcessPool:
+        pass
+    file_path = _write(tmp_path / "after_crash.txt", _document("crash", 10))
+    [result] = ingest.ingest_results([file_path], chunk_size=24)
+    assert result["status"] == "done", result["message"]
@@ -0,0 +1,43 @@
+# modules
+import time
+import jobs
+import ingest
+
+
+def _wait(job_id, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = jobs.get_jobs([job_id])[0]
+        if job["status"] not in jobs.UNFINISHED:
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def test_job_records_each_file(tmp_path):
+    ingest._ensure_db()
+    paths = []
+    for i in range(2):
+        path = tmp_path / f"job{i}.txt"
+        path.write_text(" ".join(f"job{i}word{j}." for j in range(50)), encoding="utf-8")
+        paths.append(str(path))
+    job = _wait(jobs.JobQueue().submit(paths + [str(tmp_path / "missing.txt")], 24))
+    assert job["status"] == jobs.FAILED
+    done, _, missing = job["files"]
+    assert done["status"] == "done" and done["chunks"] > 0
+    assert 0 < done["seconds"] < 10
+    assert missing["status"] == jobs.FAILED and missing["seconds"] is None
+
+
+def test_crashed_job_fails_its_files(tmp_path, monkeypatch):
+    ingest._ensure_db()
+
+    def crash(file_paths, chunk_size):
+        raise RuntimeError("pipeline crashed")
+        yield
+
+    monkeypatch.setattr(jobs, "ingest_results", crash)
+    job = _wait(jobs.JobQueue().submit([str(tmp_path / "a.txt"), str(tmp_path / "b.txt")], 24))
+    assert job["status"] == jobs.FAILED
+    assert [f["status"] for f in job["files"]] == [jobs.FAILED, jobs.FAILED]
+    assert "pipeline crashed" in job["files"][0]["message"]
@@ -0,0 +1,19 @@
+# modules
+import socket
+import metrics
+
+
+def test_metrics_server_skipped_when_port_is_taken(capsys):
+    with socket.socket() as taken:
+        taken.bind(("127.0.0.1", 0))
+        taken.listen()
+        port = taken.getsockname()[1]
+        assert metrics.start_http_server(port=port, host="127.0.0.1") is None
+    assert "[Metrics Error]" in capsys.readouterr().out
+
+
+def test_worker_durations_are_collected():
+    with metrics.recording() as samples:
+        metrics.observe("test.stage", 0.25)
+    metrics.observe("test.stage", 0.5)
+    assert samples == [("test.stage", 0.25)]
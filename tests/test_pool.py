@@ -0,0 +1,75 @@
+# modules
+import threading
+import pytest
+from pool import ConnectionPool, ThreadLocalConnections, PoolTimeout
+
+
+class Connection:
+    def __init__(self):
+        self.closed = False
+        self.alive = True
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+def _check(conn):
+    if not conn.alive:
+        raise RuntimeError("connection lost")
+
+
+def _pool(**kwargs):
+    made = []
+
+    def factory():
+        made.append(Connection())
+        return made[-1]
+    return ConnectionPool("test", factory, health_check=_check, **kwargs), made
+
+
+def test_pool_reuses_connections_and_waits_when_full():
+    pool, made = _pool(max_size=1, timeout=0.05)
+    with pool.connection() as conn:
+        # the only connection is checked out
+        with pytest.raises(PoolTimeout):
+            pool.acquire()
+    with pool.connection() as again:
+        assert again is conn
+    assert len(made) == 1
+    assert pool.metrics()["waits"] == 1
+
+
+def test_pool_replaces_dead_and_expired_connections():
+    pool, made = _pool(max_size=2, idle_timeout=60)
+    with pool.connection() as conn:
+        pass
+    conn.alive = False
+    with pool.connection() as conn:
+        assert conn is made[1]
+    assert made[0].closed
+
+    pool.idle_timeout = 0
+    with pool.connection() as conn:
+        assert conn is made[2]
+    pool.close_all()
+    assert all(conn.closed for conn in made)
+    assert pool.metrics()["size"] == 0
+
+
+def test_thread_local_connections_stay_on_their_thread():
+    connections = ThreadLocalConnections("test_local", Connection)
+    main = connections.get()
+    assert connections.get() is main
+
+    seen = []
+    def worker():
+        seen.append(connections.get())
+        connections.close()
+    thread = threading.Thread(target=worker)
+    thread.start()
+    thread.join()
+    assert seen[0] is not main and seen[0].closed
+    assert not main.closed
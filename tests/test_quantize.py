@@ -0,0 +1,43 @@
+# modules
+import numpy as np
+import pytest
+from quantize import get_codec
+from vector_store import VectorStore
+from vector_index import MappedVectorIndex
+
+
+def _corpus(n=5000, dim=384, queries=100, seed=0):
+    # clustered unit vectors, queried with slightly perturbed copies of stored ones
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(50, dim))
+    vectors = centers[rng.integers(0, 50, n)] + rng.normal(size=(n, dim))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    picked = vectors[rng.choice(n, queries)] + rng.normal(size=(queries, dim)) * 0.02
+    return vectors.astype(np.float32), (picked / np.linalg.norm(picked, axis=1, keepdims=True)).astype(np.float32)
+
+
+def _recall(found, expected):
+    return np.mean([len(set(f) & set(e)) / len(e) for f, e in zip(found, expected)])
+
+
+def test_int8_codes_do_not_depend_on_the_first_batch():
+    vectors, queries = _corpus()
+    codec = get_codec("int8")
+    # a store whose first save is a single chunk must encode later vectors as well
+    codes = np.vstack([codec.encode(vectors[:1]), codec.encode(vectors[1:])])
+    assert np.abs(codes.astype(np.int16)).max() < 127
+    exact = [np.argsort(-(vectors @ q))[:3] for q in queries]
+    coarse = [np.argsort(-codec.score(codes, q))[:3] for q in queries]
+    assert _recall(coarse, exact) >= 0.9
+
+
+@pytest.mark.parametrize("precision", ["float16", "int8", "binary"])
+def test_two_stage_search_recall(tmp_path, precision):
+    vectors, queries = _corpus()
+    store = VectorStore(str(tmp_path / "test.vectors.f32"), vectors.shape[1], codec=get_codec(precision))
+    store.append(vectors[:1])
+    store.append(vectors[1:])
+    index = MappedVectorIndex(store, ids=np.arange(len(vectors)), candidates=100)
+    exact = [np.argsort(-(vectors @ q))[:3] for q in queries]
+    found = [index.search(q, 3)[0] for q in queries]
+    assert _recall(found, exact) >= 0.95
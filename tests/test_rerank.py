@@ -0,0 +1,55 @@
+# modules
+from rerank import Reranker
+
+
+class CrossEncoder:
+    """Scores a pair by how often the question's first word appears in the chunk."""
+
+    def __init__(self):
+        self.pairs = 0
+
+    def predict(self, pairs, batch_size=None, show_progress_bar=False):
+        self.pairs += len(pairs)
+        return [chunk.split().count(question.split()[0]) for question, chunk in pairs]
+
+
+class Model:
+    """LazyModel stand-in: loaded once warm_up() was called."""
+
+    def __init__(self):
+        self.encoder = CrossEncoder()
+        self.loaded = False
+
+    def warm_up(self):
+        self.loaded = True
+
+    def get(self):
+        return self.encoder
+
+
+CHUNKS = ["x y", "cat x", "cat cat", "y"]
+
+
+def test_chunks_are_reordered_by_score_and_scores_are_cached():
+    model = Model()
+    reranker = Reranker(model, enabled=True, batch_size=2, budget=10, cache_size=100)
+    # the model loads in the background: the dense order is kept meanwhile
+    assert reranker.rerank("cat please", [1, 2, 3, 4], CHUNKS) == [0, 1, 2, 3]
+    assert model.loaded
+
+    assert reranker.rerank("cat please", [1, 2, 3, 4], CHUNKS) == [2, 1, 0, 3]
+    assert model.encoder.pairs == 4
+    # the same question, cased and spaced differently, reuses the scores
+    assert reranker.rerank("Cat   please", [1, 2, 3, 4], CHUNKS) == [2, 1, 0, 3]
+    assert model.encoder.pairs == 4
+    # new chunks (ids never seen) are scored
+    assert reranker.rerank("cat please", [1, 5], ["x y", "cat"]) == [1, 0]
+    assert model.encoder.pairs == 5
+
+
+def test_dense_order_is_kept_past_the_budget():
+    model = Model()
+    model.loaded = True
+    reranker = Reranker(model, enabled=True, batch_size=2, budget=0, cache_size=100)
+    assert reranker.rerank("cat please", [1, 2, 3, 4], CHUNKS) == [0, 1, 2, 3]
+    assert reranker.stats()["over_budget"] == 1
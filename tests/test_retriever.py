@@ -0,0 +1,54 @@
+# modules
+import numpy as np
+from vector_index import VectorIndex
+from retriever import IVFRetriever
+
+
+def _clustered(n, dim=32, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(16, dim))
+    vectors = centers[rng.integers(0, 16, n)] + 0.3 * rng.normal(size=(n, dim))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def _index(vectors, first_id=0):
+    index = VectorIndex()
+    index.add(np.arange(first_id, first_id + len(vectors)), vectors)
+    return index
+
+
+def test_ivf_search_matches_exact_search(tmp_path):
+    vectors = _clustered(2000)
+    index = _index(vectors)
+    ivf = IVFRetriever(index, path=str(tmp_path / "test.ivf.npz"), nlist=8, nprobe=3)
+    assert ivf.trained
+
+    queries = vectors[::100]
+    hits = sum(len(set(ivf.search(q, 5)[0]) & set(index.search(q, 5)[0])) for q in queries)
+    assert hits / (5 * len(queries)) >= 0.9
+
+
+def test_ivf_finds_rows_added_since_the_last_update(tmp_path):
+    vectors = _clustered(1000)
+    index = _index(vectors[:800])
+    ivf = IVFRetriever(index, path=str(tmp_path / "test.ivf.npz"), nlist=4, nprobe=1)
+
+    # appended rows are scored exhaustively until update() assigns them to lists
+    index.add(np.arange(800, 1000), vectors[800:])
+    assert all(ivf.search(v, 1)[0][0] == i for i, v in zip(range(800, 1000, 20), vectors[800::20]))
+    ivf.update()
+    assert all(ivf.search(v, 1)[0][0] == i for i, v in zip(range(800, 1000, 20), vectors[800::20]))
+
+
+def test_ivf_lists_are_loaded_instead_of_trained_again(tmp_path, monkeypatch):
+    path = str(tmp_path / "test.ivf.npz")
+    vectors = _clustered(1000)
+    ivf = IVFRetriever(_index(vectors), path=path, nlist=4, nprobe=2)
+
+    monkeypatch.setattr(IVFRetriever, "train", lambda self, sample_size=None: False)
+    loaded = IVFRetriever(_index(vectors), path=path, nlist=4, nprobe=2)
+    assert loaded.trained
+    assert np.array_equal(loaded.centroids, ivf.centroids)
+    # a file saved for other chunks is not used
+    other = IVFRetriever(_index(vectors, first_id=5000), path=path, nlist=4, nprobe=2)
+    assert not other.trained
@@ -0,0 +1,97 @@
+# modules
+import numpy as np
+import pandas as pd
+import db_sqlserver
+from sql_context import SqlContextCache, RowRetriever
+
+
+class FakeServer:
+    """db_sqlserver stand-in: the Students table reads fine, Grades always fails."""
+
+    def __init__(self):
+        self.reads = {"Students": 0, "Grades": 0}
+
+    def get_all_tables(self):
+        return ["Students", "Grades"]
+
+    def get_table_signature(self, table):
+        return (table, 1)
+
+    def fetch_data(self, query):
+        table = query.split("[")[1].rstrip("]")
+        self.reads[table] += 1
+        if table == "Grades":
+            raise RuntimeError("permission denied")
+        return pd.DataFrame({"Name": ["Ada", "Alan"], "Major": ["Math", "Physics"]})
+
+
+def _server(monkeypatch):
+    server = FakeServer()
+    for name in ("get_all_tables", "get_table_signature", "fetch_data"):
+        monkeypatch.setattr(db_sqlserver, name, getattr(server, name))
+    return server
+
+
+def test_unreadable_table_is_cached_for_the_ttl(monkeypatch):
+    server = _server(monkeypatch)
+    cache = SqlContextCache(ttl=300)
+    first = cache.snapshots()
+    second = cache.snapshots()
+    assert [snapshot.error for snapshot in first] == [False, True]
+    assert first[1] is second[1]
+    assert server.reads == {"Students": 1, "Grades": 1}
+
+    cache.ttl = 0
+    cache.snapshots()
+    # a failed table is read again once stale, an unchanged one is not
+    assert server.reads == {"Students": 1, "Grades": 2}
+
+
+def test_row_retriever_skips_unreadable_tables(monkeypatch):
+    _server(monkeypatch)
+    rows = RowRetriever(SqlContextCache(ttl=300), encode=None, mode="bm25", top_k=5)
+    hits = rows.search("Ada Math")
+    assert hits[0] == "Students: Name=Ada, Major=Math"
+    assert not any("Could not read" in row for row in hits)
+
+
+class Encoder:
+    """Counts the rows embedded (3-dim one-hot vectors keyed on the last character)."""
+
+    def __init__(self):
+        self.rows = []
+
+    def __call__(self, texts, batch_size=None, convert_to_numpy=True):
+        self.rows.extend(texts)
+        return np.array([[ord(text[-1]) % 3 == i for i in range(3)] for text in texts], dtype=np.float32)
+
+
+def test_row_index_is_built_off_the_request_and_keeps_unchanged_tables(monkeypatch):
+    tables = {"A": ["a1", "a2"], "B": ["b1"]}
+    monkeypatch.setattr(db_sqlserver, "get_all_tables", lambda: list(tables))
+    monkeypatch.setattr(db_sqlserver, "get_table_signature", lambda table: tuple(tables[table]))
+    monkeypatch.setattr(db_sqlserver, "fetch_data",
+                        lambda query: pd.DataFrame({"v": tables[query.split("[")[1].rstrip("]")]}))
+    encode = Encoder()
+    rows = RowRetriever(SqlContextCache(ttl=0), encode, mode="dense", top_k=3)
+    # background builds are run by hand below
+    started = []
+    monkeypatch.setattr(rows, "warm_up", lambda: started.append(True))
+
+    # before the first build a question is answered by keywords, without embedding the rows
+    assert rows.search("a1")[0] == "A: v=a1"
+    assert started and encode.rows == []
+    rows.refresh()
+    assert sorted(encode.rows) == ["A: v=a1", "A: v=a2", "B: v=b1"]
+    kept = rows._table_indexes["A"][1]
+
+    encode.rows.clear()
+    tables["B"] = ["b1", "b2"]
+    # the question is answered from the old index; the refresh embeds only B's new row
+    assert len(rows.search("q", query_vector=np.array([1, 0, 0]))) == 3
+    assert len(started) == 2 and encode.rows == []
+    rows.refresh()
+    assert encode.rows == ["B: v=b2"]
+    assert rows._table_indexes["A"][1] is kept
+    assert len(rows.search("q", query_vector=np.array([1, 0, 0]))) == 3
+    assert "B: v=b2" in rows.search("q", query_vector=np.array([1, 1, 1]), top_k=4)
@@ -0,0 +1,32 @@
+# modules
+import os
+import numpy as np
+from quantize import get_codec
+from vector_store import VectorStore
+
+
+def test_codes_of_other_precisions_are_removed_on_open(tmp_path):
+    path = str(tmp_path / "test.vectors.f32")
+    store = VectorStore(path, 8, codec=get_codec("int8"))
+    store.append(np.random.default_rng(0).normal(size=(5, 8)))
+    assert os.path.exists(path + ".int8")
+
+    store = VectorStore(path, 8, codec=get_codec("float16"))
+    assert len(store.codes()) == 5
+    assert not os.path.exists(path + ".int8")
+
+    VectorStore(path, 8)
+    assert sorted(os.listdir(tmp_path)) == ["test.vectors.f32"]
+
+
+def test_int8_codes_with_fitted_scales_are_encoded_again(tmp_path):
+    path = str(tmp_path / "test.vectors.f32")
+    vectors = np.random.default_rng(0).normal(size=(5, 8))
+    VectorStore(path, 8).append(vectors)
+    # codes and scales as written by older versions
+    np.zeros((5, 8), dtype=np.int8).tofile(path + ".int8")
+    np.save(path + ".int8.scales.npy", np.full(8, 1e-5, dtype=np.float32))
+
+    store = VectorStore(path, 8, codec=get_codec("int8"))
+    assert not os.path.exists(path + ".int8.scales.npy")
+    assert np.array_equal(store.codes(), get_codec("int8").encode(store.matrix()))
@@ -0,0 +1,175 @@
+# modules
+import threading
+import numpy as np
+
+
+# ------------------------
+# helpers
+# ------------------------
+def normalize(vectors):
+    """L2-normalize rows (or a single vector) as float32."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.sqrt(np.einsum("...i,...i->...", vectors, vectors))[..., None]
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def top_k_indices(scores, top_k):
+    """Indices of the `top_k` highest scores, best first."""
+    top_k = min(top_k, len(scores))
+    if top_k <= 0:
+        return np.array([], dtype=np.int64)
+    if top_k < len(scores):
+        idx = np.argpartition(-scores, top_k - 1)[:top_k]
+    else:
+        idx = np.arange(len(scores))
+    return idx[np.argsort(-scores[idx])]
+
+
+# ------------------------
+# In-memory vector index
+# ------------------------
+class VectorIndex:
+    """
+    Long-lived, contiguous float32 matrix of L2-normalized embeddings with a
+    parallel array of chunk ids. A query is one matrix-vector product plus
+    argpartition. Rows are appended in place (capacity doubles as needed).
+    """
+
+    # in-memory rows have no persistent identity (see MappedVectorIndex)
+    generation = None
+
+    def __init__(self, dim=None, capacity=1024):
+        self.dim = dim
+        self._lock = threading.Lock()
+        self._size = 0
+        self._ids = np.empty(0, dtype=np.int64)
+        self._matrix = np.empty((0, dim or 0), dtype=np.float32)
+        self._capacity = capacity
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def ids(self):
+        return self._ids[:self._size]
+
+    @property
+    def matrix(self):
+        return self._matrix[:self._size]
+
+    def _reserve(self, n):
+        if self._size + n <= len(self._ids):
+            return
+        capacity = max(self._capacity, len(self._ids))
+        while capacity < self._size + n:
+            capacity *= 2
+        matrix = np.empty((capacity, self.dim), dtype=np.float32)
+        matrix[:self._size] = self._matrix[:self._size]
+        ids = np.empty(capacity, dtype=np.int64)
+        ids[:self._size] = self._ids[:self._size]
+        self._matrix, self._ids = matrix, ids
+
+    def add(self, ids, vectors):
+        """Append chunk ids and their (un-normalized) vectors."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim == 1:
+            vectors = vectors[None, :]
+        if len(vectors) == 0:
+            return
+        with self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                self._matrix = np.empty((0, self.dim), dtype=np.float32)
+            self._reserve(len(vectors))
+            end = self._size + len(vectors)
+            self._matrix[self._size:end] = normalize(vectors)
+            self._ids[self._size:end] = np.asarray(ids, dtype=np.int64)
+            self._size = end
+
+    def search(self, query_vector, top_k=3):
+        """Return (chunk_ids, scores) of the `top_k` most similar rows."""
+        return self.search_rows(query_vector, None, top_k)
+
+    def search_rows(self, query_vector, rows=None, top_k=3):
+        """Like `search`, restricted to the given row positions (None = all rows)."""
+        if len(self) == 0:
+            return np.array([], dtype=np.int64), np.array([], dtype=np.float32)
+        q = normalize(query_vector).reshape(-1)
+        with self._lock:
+            matrix, ids = self.matrix, self.ids
+        if rows is not None:
+            matrix, ids = matrix[rows], ids[rows]
+        scores = np.asarray(matrix @ q)
+        # rows without a live chunk (id -1) never match
+        dead = ids < 0
+        if dead.any():
+            scores[dead] = -np.inf
+            top_k = min(top_k, int((~dead).sum()))
+        idx = top_k_indices(scores, top_k)
+        return ids[idx], scores[idx]
+
+
+# ------------------------
+# Vector index over a memory-mapped VectorStore
+# ------------------------
+class MappedVectorIndex(VectorIndex):
+    """
+    Index whose matrix is the VectorStore memmap (zero-copy). `ids` maps each
+    store row to its chunk id, or -1 for rows no chunk points at.
+
+    When the store keeps quantized codes, search is two-stage: a coarse top
+    `candidates` pass over the in-RAM codes, then exact float re-scoring of
+    the survivors read from the memmap.
+    """
+
+    def __init__(self, store, ids=None, candidates=100):
+        super().__init__(dim=store.dim)
+        self.store = store
+        self.candidates = candidates
+        self._ids = np.full(len(store), -1, dtype=np.int64)
+        if ids is not None:
+            self._ids[:len(ids)] = ids
+        self._size = len(self._ids)
+
+    @property
+    def matrix(self):
+        return self.store.matrix()[:self._size]
+
+    @property
+    def generation(self):
+        return self.store.generation
+
+    def search_rows(self, query_vector, rows=None, top_k=3):
+        codes = self.store.codes()
+        n_rows = len(self) if rows is None else len(rows)
+        if codes is None or n_rows <= max(self.candidates, top_k):
+            return super().search_rows(query_vector, rows, top_k)
+        q = normalize(query_vector).reshape(-1)
+        with self._lock:
+            ids = self.ids
+        if rows is None:
+            rows = np.arange(len(ids))
+            coarse = self.store.codec.score(codes[:len(ids)], q)
+        else:
+            coarse = self.store.codec.score(codes[rows], q)
+        coarse[ids[rows] < 0] = -np.inf
+        survivors = rows[top_k_indices(coarse, max(self.candidates, top_k))]
+        return super().search_rows(q, np.sort(survivors), top_k)
+
+    def add(self, ids, vectors):
+        raise TypeError("Append vectors to the VectorStore and call set_rows()")
+
+    def set_rows(self, rows, ids):
+        """Point store rows at chunk ids (rows must already be in the store)."""
+        rows = np.asarray(rows, dtype=np.int64)
+        if len(rows) == 0:
+            return
+        with self._lock:
+            end = max(self._size, int(rows.max()) + 1)
+            if end > len(self._ids):
+                grown = np.full(max(end, 2 * len(self._ids)), -1, dtype=np.int64)
+                grown[:self._size] = self._ids[:self._size]
+                self._ids = grown
+            self._ids[rows] = np.asarray(ids, dtype=np.int64)
+            self._size = end
@@ -0,0 +1,135 @@
+# modules
+import os
+import threading
+import numpy as np
+from vector_index import normalize
+from quantize import CODECS
+
+DTYPE = np.dtype("<f4")
+
+
+def _open_rows(path, row_bytes):
+    """Create `path` if missing and return its row count, dropping a partial last row."""
+    if not os.path.exists(path):
+        open(path, "wb").close()
+    size = os.path.getsize(path)
+    # a partially written trailing row (e.g. after a crash) is discarded
+    if size % row_bytes:
+        with open(path, "r+b") as f:
+            f.truncate(size - size % row_bytes)
+    return size // row_bytes
+
+
+# ------------------------
+# Append-only memory-mapped vector segment
+# ------------------------
+class VectorStore:
+    """
+    Raw float32 file holding one L2-normalized vector per row. Rows are only
+    ever appended; `chunks.vec_row` points into it. Reads go through an
+    np.memmap so searching never copies the vectors into process memory.
+
+    With a `codec` (see quantize.py) a parallel file of compact codes is kept
+    and held in RAM for the coarse search pass; missing codes are encoded
+    from the float32 rows on open, so changing precision needs no re-embedding.
+
+    `generation` identifies the file's contents (it changes when the file
+    is rewritten by compaction), so saved ANN indexes can tell they are stale.
+    """
+
+    def __init__(self, path, dim, codec=None, generation=None):
+        self.path = path
+        self.dim = dim
+        self.generation = generation
+        self.row_bytes = dim * DTYPE.itemsize
+        self.codec = codec
+        self._lock = threading.Lock()
+        self._mmap = None
+        self._rows = _open_rows(path, self.row_bytes)
+        self._codes = None
+        self._n_codes = 0
+        self._remove_other_codes()
+        if codec is not None:
+            self._load_codes()
+
+    def __len__(self):
+        return self._rows
+
+    @property
+    def codes_path(self):
+        return f"{self.path}.{self.codec.name}"
+
+    def _remove_other_codes(self):
+        # codes of another precision (left by an earlier EMBEDDING_PRECISION) are never read again
+        for name in CODECS:
+            if self.codec is not None and name == self.codec.name:
+                continue
+            for path in (f"{self.path}.{name}", f"{self.path}.{name}.scales.npy"):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def _load_codes(self):
+        codec = self.codec
+        width = codec.code_width(self.dim)
+        row_bytes = width * np.dtype(codec.dtype).itemsize
+        n_codes = _open_rows(self.codes_path, row_bytes)
+        legacy_scales = self.codes_path + ".scales.npy"
+        if os.path.exists(legacy_scales):
+            # int8 codes of older versions used fitted scales: encode them again
+            os.remove(legacy_scales)
+            n_codes = 0
+        if n_codes > self._rows:
+            n_codes = 0
+        if n_codes == 0:
+            open(self.codes_path, "wb").close()
+        codes = np.fromfile(self.codes_path, dtype=codec.dtype, count=n_codes * width)
+        self._codes, self._n_codes = codes.reshape(n_codes, width), n_codes
+        if n_codes < self._rows:
+            matrix = self.matrix()
+            for start in range(n_codes, self._rows, 65536):
+                self._append_codes(np.asarray(matrix[start:start + 65536]))
+
+    def _append_codes(self, vectors):
+        codes = self.codec.encode(vectors)
+        with open(self.codes_path, "ab") as f:
+            codes.tofile(f)
+        end = self._n_codes + len(codes)
+        if end > len(self._codes):
+            grown = np.empty((max(end, 2 * len(self._codes)), codes.shape[1]), dtype=codes.dtype)
+            grown[:self._n_codes] = self._codes[:self._n_codes]
+            self._codes = grown
+        self._codes[self._n_codes:end] = codes
+        self._n_codes = end
+
+    def codes(self):
+        """In-RAM quantized codes, one row per vector (None without a codec)."""
+        if self.codec is None:
+            return None
+        return self._codes[:self._n_codes]
+
+    def append(self, vectors):
+        """Normalize and append vectors; returns their row numbers."""
+        vectors = normalize(vectors).astype(DTYPE, copy=False)
+        if vectors.ndim == 1:
+            vectors = vectors[None, :]
+        if vectors.shape[1] != self.dim:
+            raise ValueError(f"Vector dim {vectors.shape[1]} does not match store dim {self.dim}")
+        with self._lock:
+            with open(self.path, "ab") as f:
+                vectors.tofile(f)
+                f.flush()
+                os.fsync(f.fileno())
+            if self.codec is not None:
+                self._append_codes(vectors)
+            start = self._rows
+            self._rows += len(vectors)
+        return np.arange(start, start + len(vectors), dtype=np.int64)
+
+    def matrix(self):
+        """Read-only memmap over all rows (re-mapped when the file has grown)."""
+        with self._lock:
+            if self._rows == 0:
+                return np.empty((0, self.dim), dtype=DTYPE)
+            if self._mmap is None or len(self._mmap) != self._rows:
+                self._mmap = np.memmap(self.path, dtype=DTYPE, mode="r", shape=(self._rows, self.dim))
+            return self._mmap